@@ -0,0 +1,37 @@
+"""Compares the Golub-Welsch quadrature rules against the dense eigensolver previously used in Parameter."""
+from equadratures import Parameter
+import numpy as np
+import time
+ORDERS = [10, 50, 100, 250, 500, 1000]
+REPEATS = 3
+
+def dense_quadrature(param, order):
+    # The previous implementation: a dense Jacobi matrix and a general eigensolver.
+    order = order + 1
+    ab = param.get_recurrence_coefficients(order+1)
+    JacobiMat = param.get_jacobi_matrix(order, ab)
+    D, V = np.linalg.eig(JacobiMat)
+    i = np.argsort(D)
+    p = D[i].reshape((order, 1))
+    w = ab[0,1] * V[0,i]**2
+    return p, w
+
+def timed(function, *args):
+    best = np.inf
+    for _ in range(0, REPEATS):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+if __name__ == '__main__':
+    distributions = {'uniform': Parameter(distribution='uniform', lower=-1., upper=1., order=1), \
+                     'beta': Parameter(distribution='beta', lower=0., upper=1., shape_parameter_A=2., shape_parameter_B=3., order=1)}
+    print('{:>10s} {:>6s} {:>12s} {:>12s} {:>9s} {:>12s}'.format('parameter', 'order', 'dense (s)', 'tridiag (s)', 'speed-up', 'max diff'))
+    for name, param in distributions.items():
+        param.get_recurrence_coefficients(np.max(ORDERS) + 2)
+        for order in ORDERS:
+            t_dense, (p_dense, w_dense) = timed(dense_quadrature, param, order)
+            t_new, (p_new, w_new) = timed(param._get_local_quadrature_rule, order)
+            difference = max(np.max(np.abs(p_dense - p_new)), np.max(np.abs(w_dense - w_new)))
+            print('{:>10s} {:>6d} {:>12.2e} {:>12.2e} {:>9.1f} {:>12.2e}'.format(name, order, t_dense, t_new, t_dense/t_new, difference))
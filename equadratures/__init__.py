@@ -3,9 +3,11 @@ from equadratures.poly import Poly
 from equadratures.stats import Statistics
 from equadratures.basis import Basis
 from equadratures.polynet import Polynet
-from equadratures.correlations import Correlations
+from equadratures.correlations import Correlations, nearest_correlation_matrix
 from equadratures.optimisation import Optimisation
 from equadratures.subspaces import Subspaces
+from equadratures.cache import ModelCache
+from equadratures.predictor import PolyPredictor
 from equadratures.poly import evaluate_model, evaluate_model_gradients, vector_to_2D_grid
 import numpy as np
 import os, sys
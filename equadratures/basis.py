@@ -1,6 +1,9 @@
 "Rountines for defining the index set associated with multivariate polynomials."
 import numpy as np
 import math as mt
+from scipy.special import comb
+NESTED_GROWTH_RULES = ('clenshaw-curtis', 'gauss-patterson', 'leja')
+TOTAL_ORDER_CHUNK_SIZE = 100000
 
 class Basis(object):
     """
@@ -9,10 +12,20 @@ class Basis(object):
     :param string basis_type: The type of index set to be used. Options include: ``univariate``, ``total-order``, ``tensor-grid``,
         ``sparse-grid``, ``hyperbolic-basis`` [1] and ``euclidean-degree`` [2]; all basis are isotropic.
     :param ndarray orders: List of integers corresponding to the highest polynomial order in each direction.
+    :param int level: The level of a sparse grid. If not provided, the sparse grid only comprises a one-point grid, which can be refined
+        with :meth:`Poly.set_model_adaptively`.
     :param string growth_rule: The type of growth rule associated with sparse grids.
-        Options include: ``linear`` and ``exponential``. This input is only required when using a sparse grid.
+        Options include: ``linear`` and ``exponential``, which use Gauss rules, and ``clenshaw-curtis``, ``gauss-patterson`` and ``leja``,
+        which use nested rules with 1, 3, 5, 9, ..., 1, 3, 7, 15, ... and 1, 3, 5, 7, ... points respectively. Each nested rule is the
+        smallest one that projects at least the orders of the ``linear`` rule. With nested rules, the points of a sparse grid at one level
+        are all contained in the sparse grid at the next level, so model evaluations can be reused. Clenshaw-Curtis rules require a
+        bounded parameter. This input is only required when using a sparse grid.
     :param double q: The ``q`` parameter is used to control the number of basis terms used in a hyperbolic basis (see [1]).
         It varies between 0.0 to 1.0. A value of 1.0 yields a total order basis.
+    :param list weights: Positive weights, one per dimension, for anisotropic ``total-order``, ``hyperbolic-basis`` and ``sparse-grid`` index
+        sets. A multi-index :math:`k` belongs to the total-order set if :math:`\sum_j w_j k_j \leq p`, where :math:`p` is the highest order,
+        and to the hyperbolic set if :math:`(\sum_j (w_j k_j)^q)^{1/q} \leq p`; a weight of 2 thus halves the highest order along its
+        dimension. For sparse grids, the weights apply in the same way to the levels of the tensor grids. By default, all weights are one.
 
 
     **Sample constructor initialisations**::
@@ -25,12 +38,15 @@ class Basis(object):
         mybasis2 = Basis(method='euclidean-degree', orders=[2,2])
         mybasis3 = Basis(method='sparse-grid', growth_rule='linear', level=3)
 
+        # Anisotropic total order basis, with a highest order of 6 along the first dimension and of 2 along the third one
+        mybasis4 = Basis(method='total-order', orders=[6,6,6], weights=[1., 1.5, 3.])
+
     **References**
         1. Blatman, G., Sudret, B., (2011) Adaptive Sparse Polynomial Chaos Expansion Based on Least Angle Regression. Journal of Computational Physics, 230(6), 2345-2367.
         2. Trefethen, L., (2017) Multivariate Polynomial Approximation in the Hypercube. Proceedings of the American Mathematical Society, 145(11), 4837-4844. `Pre-print <https://arxiv.org/pdf/1608.02216v1.pdf>`_.
 
     """
-    def __init__(self, basis_type, orders=None, level=None, growth_rule=None, q=None):
+    def __init__(self, basis_type, orders=None, level=None, growth_rule=None, q=None, weights=None):
         # Required
         self.basis_type = basis_type # string
         # Check for the levels (only for sparse grids)
@@ -48,7 +64,13 @@ class Basis(object):
             self.q = []
         else:
             self.q = q
+        # For anisotropic total-order, hyperbolic and sparse grid index sets, there are per-dimension weights:
+        if weights is None:
+            self.weights = []
+        else:
+            self.weights = weights
         # Orders
+        self._element_rows = None
         if orders is None:
             self.orders = []
         else:
@@ -65,25 +87,77 @@ class Basis(object):
         for i in range(0, len(orders)):
             self.orders.append(orders[i])
         self.dimensions = len(self.orders)
+        if len(self.weights) > 0:
+            if (len(self.weights) != self.dimensions) or np.any(np.asarray(self.weights) <= 0):
+                raise ValueError('Basis: weights must be positive, with one weight per dimension.')
         name = self.basis_type
         if name.lower() == "total-order":
-            basis = total_order_basis(self.orders)
+            basis = total_order_basis(self.orders, self.weights)
         elif name.lower() ==  "univariate":
-            basis = np.reshape( np.linspace(0, self.orders[0], self.orders[0]+1) , (self.orders[0]+1, 1) )
+            basis = np.arange(0, self.orders[0]+1).reshape(self.orders[0]+1, 1)
         elif name.lower() == "sparse-grid":
-            sparse_index, a, SG_set = sparse_grid_basis(self.level, self.growth_rule, self.dimensions) # Note sparse grid rule depends on points!
+            sparse_index, a, SG_set = sparse_grid_basis(self.level, self.growth_rule, self.dimensions, self.weights) # Note sparse grid rule depends on points!
             basis = SG_set
         elif (name.lower() == "tensor-grid") or (name.lower() == "tensor") :
             basis = tensor_grid_basis(self.orders)
         elif name.lower() == "hyperbolic-basis":
-            basis = hyperbolic_basis(self.orders, self.q)
+            basis = hyperbolic_basis(self.orders, self.q, self.weights)
         elif name.lower() == "euclidean-degree":
             basis = euclidean_degree_basis(self.orders)
         else:
             raise(ValueError, 'Basis __init__: invalid value for basis_type!')
             basis = [0]
-        self.elements = basis
+        self.set_elements(basis)
         self.cardinality = len(basis)
+    def set_elements(self, elements):
+        """
+        Sets the multi-index elements of the basis. These are stored as a compact array of small integers, along with a hash index from each
+        multi-index to its row, which is built the first time it is needed.
+
+        :param Basis object: An instance of the Basis class.
+        :param numpy.ndarray elements: The multi-indices, with shape (number_of_elements, dimensions).
+        """
+        self.elements = get_compact_elements(elements)
+        self._element_rows = None
+    def get_index_location(self, indices):
+        """
+        Finds the rows of a set of multi-indices in the basis, with one hash lookup per multi-index.
+
+        :param Basis object: An instance of the Basis class.
+        :param numpy.ndarray indices: The multi-indices to look for, with shape (number_of_indices, dimensions).
+
+        :return:
+            **rows**: A numpy.ndarray of integers with shape (number_of_indices,), with the row of each multi-index in the elements of the basis,
+            or -1 if it does not belong to the basis.
+        """
+        element_rows = self._get_element_rows()
+        indices = np.asarray(indices).reshape(-1, self.elements.shape[1])
+        return np.array([element_rows.get(index, -1) for index in map(tuple, indices.astype(int).tolist())], dtype=int)
+    def __contains__(self, index):
+        return tuple(np.asarray(index).astype(int).reshape(-1).tolist()) in self._get_element_rows()
+    def union(self, indices):
+        """
+        Adds to the basis the multi-indices that do not already belong to it, after its existing elements and in the order given.
+
+        :param Basis object: An instance of the Basis class.
+        :param numpy.ndarray indices: The multi-indices to add, with shape (number_of_indices, dimensions).
+        """
+        element_rows = self._get_element_rows()
+        indices = np.asarray(indices).reshape(-1, self.elements.shape[1])
+        new_rows = []
+        for row, index in enumerate(map(tuple, indices.astype(int).tolist())):
+            if index not in element_rows:
+                element_rows[index] = len(self.elements) + len(new_rows)
+                new_rows.append(row)
+        self.elements = get_compact_elements(np.vstack([self.elements, indices[new_rows, :]]))
+        self._element_rows = (self.elements, element_rows)
+        self.cardinality = len(self.elements)
+    def _get_element_rows(self):
+        # The hash index is rebuilt whenever the elements have been replaced.
+        if (self._element_rows is None) or (self._element_rows[0] is not self.elements):
+            self._element_rows = (self.elements, dict(zip(map(tuple, np.asarray(self.elements).astype(int).tolist()), \
+                                                        range(0, len(self.elements)))))
+        return self._element_rows[1]
     def prune(self, number_of_elements_to_delete):
         """
         Prunes down the number of elements in an index set.
@@ -99,7 +173,7 @@ class Basis(object):
         if new_elements < 0 :
             raise(ValueError, 'In Basis() --> prune(): Number of elements to be deleted must be greater than the total number of elements')
         else:
-            self.elements =  index_entries[0:new_elements, :]
+            self.set_elements(index_entries[0:new_elements, :])
     def sort(self):
         """
         Routine that sorts a multi-index in ascending order based on the total orders. The constructor by default calls this function.
@@ -111,7 +185,7 @@ class Basis(object):
         sorted_elements = np.ones((number_of_elements, self.dimensions))
         elements = self.elements
         for i in range(0, number_of_elements):
-            a = np.sort(elements[i,:])
+            a = np.sort(elements[i,:]).astype(float)
             u = 0
             for j in range(0, self.dimensions):
                 u = 10**(j) * a[j] + u
@@ -123,7 +197,7 @@ class Basis(object):
             for j in range(0, self.dimensions):
                 row_index = sorted_indices[i]
                 sorted_elements[i,j] = elements[row_index, j]
-        self.elements = sorted_elements
+        self.set_elements(sorted_elements)
     def get_basis(self):
         """
         Gets the index set elements for the Basis object.
@@ -135,15 +209,15 @@ class Basis(object):
         """
         name = self.basis_type
         if name == "total-order":
-            basis = total_order_basis(self.orders)
+            basis = total_order_basis(self.orders, self.weights)
         elif name == "tensor-grid":
             basis = tensor_grid_basis(self.orders)
         elif name == "hyperbolic-basis":
-            basis = hyperbolic_basis(self.orders, self.q)
+            basis = hyperbolic_basis(self.orders, self.q, self.weights)
         elif name == "euclidean-degree":
             basis = euclidean_degree_basis(self.orders)
         elif name == "sparse-grid":
-            sparse_index, sparse_weight_factors, sparse_grid_set = sparse_grid_basis(self.level, self.growth_rule, self.dimensions) # Note sparse grid rule depends on points!
+            sparse_index, sparse_weight_factors, sparse_grid_set = sparse_grid_basis(self.level, self.growth_rule, self.dimensions, self.weights) # Note sparse grid rule depends on points!
             return sparse_index, sparse_weight_factors, sparse_grid_set
         else:
             raise(ValueError, 'invalid value for basis_type!')
@@ -163,118 +237,179 @@ class Basis(object):
 # PRIVATE FUNCTIONS
 #---------------------------------------------------------------------------------------------------
 def euclidean_degree_basis(orders):
-    dimensions = len(orders)
-    n_bar = tensor_grid_basis(orders)
-    n_new = []
-    l2norms = np.ones((1, len(n_bar)))
-    for i in range(0, len(n_bar)):
-        array_entry = n_bar[i]**2
-        l2norms[0,i] = np.sum(array_entry)  # dimension correction!
-
-    maxval = np.max(np.array(orders)**2)
-    for i in range(0, len(l2norms[0,:])):
-        if( l2norms[0,i] <= maxval):
-            n_new.append(n_bar[i,:])
-
-    # Now re-cast n_new as a regular array and not a list!
-    euclidean_set = np.ones((len(n_new), dimensions))
-    for i in range(0, len(n_new)):
-        for j in range(0, dimensions):
-            r = n_new[i]
-            euclidean_set[i,j] = r[j]
-
-    return euclidean_set
+    # Multi-indices within the tensor grid whose Euclidean norm is at most the highest order, enumerated directly in lexicographic order.
+    orders = [int(order) for order in orders]
+    costs = [np.arange(0, order + 1)**2 for order in orders]
+    return get_compact_elements(downward_closed_set(costs, np.max(orders)**2))
 
 
 def getIndexLocation(small_index, large_index):
-    index_values = []
-    i = 0
-    while i < len(small_index):
-        for j in range(0, len(large_index)):
-            if np.array_equal(small_index[i,:] , large_index[j,:] ):
-                index_values.append(j)
-        i = i + 1
+    # The rows of large_index are hashed once, so each multi-index of small_index is located with a single lookup.
+    large_rows = dict(zip(map(tuple, np.asarray(large_index).astype(int).tolist()), range(0, len(large_index))))
+    return [large_rows[index] for index in map(tuple, np.asarray(small_index).astype(int).tolist()) if index in large_rows]
 
-    return index_values
+def hyperbolic_basis(orders, q, weights=None):
+    highest_order = int(np.max(orders))
+    dimensions = len(orders)
+    if (weights is None) or (len(weights) == 0):
+        weights = np.ones(dimensions)
+    weights = np.asarray(weights, dtype=float)
+    # Enumerate the set directly, with a small tolerance, and then apply the exact criteria to the candidates.
+    costs = [(weights[j] * np.arange(0, int(np.floor(highest_order / weights[j] + 1e-12)) + 1))**q for j in range(0, dimensions)]
+    candidates = downward_closed_set(costs, highest_order**q * (1.0 + 1e-12))
+    summation = np.sum((weights * candidates)**q, axis=1)**(1.0/(1.0 * q))
+    hyperbolic_set = candidates[(summation <= highest_order) & (np.sum(weights * candidates, axis=1) <= highest_order), :]
+    return get_compact_elements(sort_by_total_order(hyperbolic_set))
+
+def get_index_dtype(highest_order):
+    """
+    Returns the smallest signed integer type that holds multi-indices up to a given order, to keep large index sets compact.
+    """
+    if highest_order <= np.iinfo(np.int16).max:
+        return np.int16
+    return np.int32
+def get_compact_elements(elements):
+    """
+    Returns multi-indices as an array of the smallest signed integer type that holds them.
+    """
+    elements = np.asarray(elements)
+    if elements.size == 0:
+        return elements.astype(np.int16)
+    return elements.astype(get_index_dtype(np.max(elements)))
+def total_order_set(highest_order, dimensions):
+    """
+    Enumerates all the multi-indices with a total order of at most highest_order, sorted by their total order and then lexicographically.
+    The cardinality is known up front, so the set is written into one preallocated array of compact integers: the indices of a given total
+    order over the last m dimensions are assembled from those over the last m-1 dimensions, one dimension at a time, without recursion.
+
+    :param int highest_order: The highest total order.
+    :param int dimensions: The number of dimensions.
+    :return:
+        **elements**: A numpy.ndarray of integers with shape (number_of_elements, dimensions), where number_of_elements is the binomial
+        coefficient (highest_order + dimensions) choose dimensions.
+    """
+    highest_order = int(highest_order)
+    dimensions = int(dimensions)
+    dtype = get_index_dtype(highest_order)
+    elements = np.empty((int(comb(highest_order + dimensions, dimensions, exact=True)), dimensions), dtype=dtype)
+    # tables[n] holds the multi-indices of total order n over the last m dimensions.
+    tables = [np.full((1, 1), n, dtype=dtype) for n in range(0, highest_order + 1)]
+    for m in range(2, dimensions + 1):
+        tables = [_prepend_total_order_dimension(tables, n, m) for n in range(0, highest_order + 1)]
+    start = 0
+    for n in range(0, highest_order + 1):
+        elements[start:start + len(tables[n]), :] = tables[n]
+        start = start + len(tables[n])
+    return elements
+def _prepend_total_order_dimension(tables, n, m):
+    table = np.empty((int(comb(n + m - 1, m - 1, exact=True)), m), dtype=tables[0].dtype)
+    start = 0
+    for j in range(0, n + 1):
+        rows = len(tables[n - j])
+        table[start:start + rows, 0] = j
+        table[start:start + rows, 1:] = tables[n - j]
+        start = start + rows
+    return table
+def get_total_order_chunks(highest_order, dimensions, chunk_size=TOTAL_ORDER_CHUNK_SIZE):
+    """
+    Yields the multi-indices of :func:`total_order_set` in chunks, in the same order, without ever holding the full set in memory. This is
+    useful for index sets that are too large to materialize.
 
-def hyperbolic_basis(orders, q):
+    :param int highest_order: The highest total order.
+    :param int dimensions: The number of dimensions.
+    :param int chunk_size: The maximum number of multi-indices per chunk.
+    :return:
+        A generator of numpy.ndarrays of integers, each with shape (number_of_elements_in_chunk, dimensions).
 
-    # Initialize a few parameters for the setup
-    dimensions = len(orders)
-    n_bar = total_order_basis(orders)
-    n_new = []
-    summation = np.ones((1, len(n_bar)))
-    for i in range(0, len(n_bar)):
-        array_entry = n_bar[i] ** q
-        summation[0,i] = ( np.sum(array_entry)  ) ** (1.0/(1.0 * q)) # dimension correction!
-
-    # Loop!
-    for i in range(0, len(summation[0,:])):
-        if( summation[0,i] <= np.max(orders) ):
-            n_new.append(n_bar[i,:])
-
-    # Now re-cast n_new as a regular array and not a list!
-    hyperbolic_set = np.ones((len(n_new), dimensions))
-    for i in range(0, len(n_new)):
-        for j in range(0, dimensions):
-            r = n_new[i]
-            hyperbolic_set[i,j] = r[j]
-
-    return hyperbolic_set
-
-# Double checked April 7th, 2016 --> Works!
-def getTotalOrderBasisRecursion(highest_order, dimensions):
-   if dimensions == 1:
-       I = np.zeros((1,1))
-       I[0,0] = highest_order
-   else:
-       for j in range(0, highest_order + 1):
-           U = getTotalOrderBasisRecursion(highest_order - j, dimensions - 1)
-           rows, cols = U.shape
-           T = np.zeros((rows, cols + 1) ) # allocate space!
-           T[:,0] = j * np.ones((1, rows))
-           T[:, 1: cols+1] = U
-           if j == 0:
-               I = T
-           elif j >= 0:
-               rows_I, cols_I = I.shape
-               rows_T, cols_T = T.shape
-               Itemp = np.zeros((rows_I + rows_T, cols_I))
-               Itemp[0:rows_I,:] = I
-               Itemp[rows_I : rows_I + rows_T, :] = T
-               I = Itemp
-           del T
-   return I
-
-def total_order_basis(orders):
-    dimensions = len(orders)
-    highest_order = np.max(orders)
-    total_order = np.zeros((1, dimensions))
-    for i in range(1, highest_order+1):
-        R = getTotalOrderBasisRecursion(i, dimensions)
-        total_order = np.vstack((total_order, R))
-    return total_order
-def sparse_grid_basis(level, growth_rule, dimensions):
+    **Sample usage**::
 
+        for elements in get_total_order_chunks(6, 40, chunk_size=100000):
+            number_of_terms = number_of_terms + len(elements)
+    """
+    highest_order = int(highest_order)
+    dimensions = int(dimensions)
+    chunk_size = int(chunk_size)
+    dtype = get_index_dtype(highest_order)
+    offsets = np.cumsum([0] + [int(comb(n + dimensions - 1, dimensions - 1, exact=True)) for n in range(0, highest_order + 1)])
+    for start in range(0, offsets[-1], chunk_size):
+        stop = min(start + chunk_size, offsets[-1])
+        chunk = np.zeros((stop - start, dimensions), dtype=dtype)
+        for n in range(0, highest_order + 1):
+            lower, upper = max(start, offsets[n]), min(stop, offsets[n + 1])
+            if lower < upper:
+                chunk[lower - start:upper - start, :] = _total_order_rows(n, dimensions, np.arange(lower - offsets[n], upper - offsets[n]))
+        yield chunk
+def _total_order_rows(n, dimensions, ranks):
+    # Returns the rows with the given ranks among the multi-indices of total order n, in the order of total_order_set. Each multi-index
+    # places n units in the dimensions, and the rows are sorted by the dimension of the first unit, descending, then of the second one,
+    # and so on; so each unit is placed with one search through the cumulative number of ways of placing the units that follow it.
+    ranks = np.array(ranks, dtype=np.int64)
+    rows = np.arange(0, len(ranks))
+    elements = np.zeros((len(ranks), dimensions), dtype=np.int64)
+    for t in range(1, n + 1):
+        placements = np.array([int(comb(x + n - t, n - t + 1, exact=True)) for x in range(0, dimensions)], dtype=np.int64)
+        x = np.searchsorted(placements, ranks, side='right') - 1
+        ranks -= placements[x]
+        elements[rows, dimensions - 1 - x] += 1
+    return elements
+def total_order_basis(orders, weights=None):
+    if (weights is not None) and (len(weights) > 0):
+        return weighted_total_order_basis(orders, weights)
+    return total_order_set(np.max(orders), len(orders))
+def weighted_total_order_basis(orders, weights):
+    highest_order = int(np.max(orders))
+    weights = np.asarray(weights, dtype=float)
+    costs = [weights[j] * np.arange(0, int(np.floor(highest_order / weights[j] + 1e-12)) + 1) for j in range(0, len(orders))]
+    return get_compact_elements(sort_by_total_order(downward_closed_set(costs, highest_order * (1.0 + 1e-12))))
+def sort_by_total_order(elements):
+    """
+    Sorts multi-indices by their total order, and then lexicographically, which is the order of :func:`total_order_basis`.
+    """
+    elements = np.asarray(elements)
+    keys = [elements[:,j] for j in range(elements.shape[1] - 1, -1, -1)] + [np.sum(elements, axis=1)]
+    return elements[np.lexsort(keys), :]
+def downward_closed_set(costs, budget):
+    """
+    Enumerates, in lexicographic order, all the multi-indices whose total cost is at most a budget, when the cost is a sum of per-dimension
+    costs. The set is built one dimension at a time, so no superset of it is ever formed.
+
+    :param list costs: A list with, for each dimension, a non-decreasing numpy.ndarray of the costs of orders 0, 1, 2, ..., starting at zero.
+        The highest order along a dimension is bounded by the length of its array.
+    :param float budget: The highest total cost.
+    :return:
+        **elements**: A numpy.ndarray of integers with shape (number_of_elements, dimensions).
+    """
+    elements = np.zeros((1, 0), dtype=int)
+    remaining = np.array([budget], dtype=float)
+    for j in range(0, len(costs)):
+        cost = np.asarray(costs[j], dtype=float)
+        counts = np.searchsorted(cost, remaining, side='right')
+        rows = np.repeat(np.arange(0, len(elements)), counts)
+        starts = np.cumsum(counts) - counts
+        entries = np.arange(0, len(rows)) - np.repeat(starts, counts)
+        elements = np.hstack([elements[rows, :], entries.reshape(-1, 1)])
+        remaining = remaining[rows] - cost[entries]
+    return elements
+def sparse_grid_levels(level, dimensions, weights=None):
+    """
+    Returns the level multi-indices (starting at zero) of the tensor grids that make up a sparse grid, along with their combination
+    coefficients.
+    """
+    if (level is None) or (isinstance(level, list) and len(level) == 0):
+        # Without a level, the sparse grid only comprises the one-point grid, which Poly.set_model_adaptively refines.
+        return np.zeros((1, dimensions)), [1.0]
     # Initialize a few parameters for the setup
     level_new = level - 1
     lhs = int(level_new) + 1
     rhs = int(level_new) + dimensions
 
-    # Set up a global tensor grid
-    tensor_elements = np.ones((dimensions))
-    for i in range(0, dimensions):
-        tensor_elements[i] = int(rhs)
-
-    n_bar = tensor_grid_basis(tensor_elements) #+ 1
+    if (weights is not None) and (len(weights) > 0):
+        return weighted_sparse_grid_levels(rhs, weights)
 
-    # Check constraints
-    n_new = [] # list; a dynamic array
+    # Enumerate the multi-indices with a total order of at most rhs, and keep those with a total order of at least lhs
+    n_bar = downward_closed_set([np.arange(0, rhs + 1)] * dimensions, rhs)
     summation = np.sum(n_bar, axis=1)
-    for i in range(0, len(summation)):
-        if(summation[i] <= rhs  and summation[i] >= lhs):
-            value = n_bar[i,:]
-            n_new.append(value)
+    n_new = n_bar[summation >= lhs, :].astype(float)
 
     # Sparse grid coefficients
     summation2 = np.sum(n_new, axis=1)
@@ -284,20 +419,89 @@ def sparse_grid_basis(level, growth_rule, dimensions):
         n = int(dimensions -1)
         value = (-1)**k  * (mt.factorial(n) / (1.0 * mt.factorial(n - k) * mt.factorial(k)) )
         a.append(value)
+    return n_new, a
+def weighted_sparse_grid_levels(budget, weights):
+    """
+    Returns the level multi-indices :math:`i` with :math:`\sum_j w_j i_j \leq` ``budget`` that have a non-zero combination coefficient, along
+    with these coefficients. For unit weights, this is the isotropic Smolyak construction.
+    """
+    weights = np.asarray(weights, dtype=float)
+    budget = budget * (1.0 + 1e-12)
+    dimensions = len(weights)
+    costs = [weights[j] * np.arange(0, int(np.floor(budget / weights[j])) + 1) for j in range(0, dimensions)]
+    n_bar = downward_closed_set(costs, budget)
+    slack = budget - np.dot(n_bar, weights)
+    # The combination coefficient of i is the sum of (-1)^|e| over the e in {0,1}^d for which i + e is in the set, i.e., over the subsets of
+    # dimensions whose weights add up to at most the slack of i. These signed subset sums are accumulated one dimension at a time.
+    sums = np.zeros(1)
+    signs = np.ones(1)
+    for j in range(0, dimensions):
+        sums = np.hstack([sums, sums + weights[j]])
+        signs = np.hstack([signs, -signs])
+        keep = sums <= np.max(slack)
+        unique_sums, inverse = np.unique(np.round(sums[keep], 10), return_inverse=True)
+        merged_signs = np.zeros(len(unique_sums))
+        np.add.at(merged_signs, inverse, signs[keep])
+        sums, signs = unique_sums[merged_signs != 0], merged_signs[merged_signs != 0]
+    coefficients = np.hstack([0.0, np.cumsum(signs)])[np.searchsorted(sums, slack + 1e-10, side='right')]
+    nonzero = coefficients != 0
+    return n_bar[nonzero, :].astype(float), list(coefficients[nonzero])
+def get_nested_rule_size(level, growth_rule):
+    """
+    Returns the number of points of a nested univariate quadrature rule at a given level (starting at one).
+    """
+    level = int(level)
+    if growth_rule == 'clenshaw-curtis':
+        if level == 1:
+            return 1
+        return 2**(level - 1) + 1
+    elif growth_rule == 'gauss-patterson':
+        return 2**level - 1
+    elif growth_rule == 'leja':
+        return 2 * level - 1
+    else:
+        raise ValueError('Basis: growth rule must be one of '+str(NESTED_GROWTH_RULES)+' for nested quadrature rules.')
+def get_nested_rule_order(level, growth_rule):
+    """
+    Returns the highest polynomial order that is projected with a nested univariate quadrature rule at a given level, i.e., half the
+    degree up to which the rule is exact.
+    """
+    number_of_points = get_nested_rule_size(level, growth_rule)
+    if growth_rule == 'gauss-patterson':
+        # A Patterson extension of an n-point rule with n + 1 new points is exact up to degree 3n + 1.
+        return (3 * number_of_points - 1) // 4
+    return (number_of_points - 1) // 2
+def get_nested_rule_level(index, growth_rule):
+    """
+    Returns the level of the nested univariate rule used for an entry of a sparse grid level multi-index. This is the lowest level that
+    projects at least the polynomial order of the ``linear`` growth rule, so successive entries may share the same rule.
+    """
+    level = 1
+    while get_nested_rule_order(level, growth_rule) < index:
+        level = level + 1
+    return level
+def get_sparse_grid_order(index, growth_rule):
+    """
+    Returns the highest polynomial order of the univariate rule used for an entry of a sparse grid level multi-index (starting at zero).
+    """
+    if growth_rule in NESTED_GROWTH_RULES:
+        return get_nested_rule_order(get_nested_rule_level(index, growth_rule), growth_rule)
+    elif index == 1:
+        return 1
+    elif growth_rule == 'exponential':
+        return int(2**(index - 1))
+    elif growth_rule == 'linear':
+        return int(index)
+    else:
+        raise ValueError('Basis: invalid growth rule for sparse grids. Options include: linear, exponential, '+', '.join(NESTED_GROWTH_RULES)+'.')
+def sparse_grid_basis(level, growth_rule, dimensions, weights=None):
+    n_new, a = sparse_grid_levels(level, dimensions, weights)
 
     # Now sort out the growth rules
     sparse_index = np.ones((len(n_new), dimensions))
     for i in range(0, len(n_new)):
         for j in range(0, dimensions):
-            r = n_new[i]
-            if(r[j] - 1 == 0):
-                sparse_index[i,j] = int(1)
-            elif(growth_rule is 'exponential' and  r[j] - 1 != 0 ):
-                sparse_index[i,j] = int(2**(r[j] - 1)  )
-            elif(growth_rule is 'linear'):
-                sparse_index[i,j] = int(r[j])
-            else:
-                raise KeyboardInterrupt
+            sparse_index[i,j] = get_sparse_grid_order(n_new[i][j], growth_rule)
 
     #print sparse_index
     # Ok, but sparse_index just has the tensor order sets to be used. Now we need
@@ -309,33 +513,24 @@ def sparse_grid_basis(level, growth_rule, dimensions):
         SG_indices[i] = tensor_grid_basis(sparse_index[i,:] )
         counter = counter + len(SG_indices[i])
 
-    SG_set = np.zeros((counter, dimensions))
+    SG_set = np.zeros((counter, dimensions), dtype=int)
     counter = 0
     for i in range(0, len(sparse_index)):
         for j in range(0, len(SG_indices[i]) ):
             SG_set[counter,:] = SG_indices[i][j]
             counter = counter + 1
-    return sparse_index, a, SG_set
+    return sparse_index, a, get_compact_elements(SG_set)
 
 def tensor_grid_basis(orders):
-
     dimensions = len(orders) # number of dimensions
-    I = [1.0] # initialize!
-
-    # For loop across each dimension
-    for u in range(0,dimensions):
-
-        # Tensor product of the points
-        vector_of_ones_a = np.ones((int(orders[u]+1), 1))
-        vector_of_ones_b = np.ones((len(I), 1))
-        counting = np.arange(0,orders[u]+1)
-        counting = np.reshape(counting, (len(counting), 1) )
-        left_side = np.array(np.kron(I, vector_of_ones_a))
-        right_side = np.array( np.kron(vector_of_ones_b, counting) )  # make a row-wise vector
-        I =  np.concatenate((left_side, right_side), axis = 1)
-
-    # Ignore the first column of pp
-    basis = I[:,1::]
+    sizes = tuple(int(orders[u]) + 1 for u in range(0, dimensions))
+    basis = np.empty((int(np.prod(sizes)), dimensions), dtype=get_index_dtype(max(sizes) - 1))
+    # The last dimension varies fastest; each column is filled by broadcasting through a C-ordered view of shape sizes.
+    basis_view = basis.reshape(sizes + (dimensions,))
+    for u in range(0, dimensions):
+        shape = [1] * dimensions
+        shape[u] = sizes[u]
+        basis_view[..., u] = np.arange(0, sizes[u]).reshape(shape)
     return basis
 
 def column(matrix, i):
@@ -0,0 +1,162 @@
+"""A persistent store of model evaluations."""
+import numpy as np
+import os
+from scipy.spatial import cKDTree
+
+class ModelCache(object):
+    """
+    The class defines a store of model evaluations keyed by the point at which the model was evaluated and a model identifier. It
+    is used by :func:`evaluate_model` and :meth:`Poly.set_model` so that a model is never evaluated twice at the same point---for
+    instance when a Poly is rebuilt after a crash, or when the order of a tensor grid (or the level of a sparse grid) is increased
+    and only the new nodes need to be run.
+
+    :param str filename: The ``.npz`` file in which the evaluations are stored. If the file exists, previously stored evaluations are
+        loaded. If no filename is provided, the evaluations are only kept in memory.
+    :param str model_id: An identifier for the model. If not provided, it is derived from the module and name of the callable, so it
+        must be set explicitly when the model changes but its name does not. Lambda functions and functions defined inside other
+        functions share their names, so a ValueError is raised for them unless a model_id is provided.
+    :param float tolerance: Two points are deemed to be the same if none of their coordinates differ by more than this value.
+
+    **Sample constructor initialisations**::
+
+        import numpy as np
+        from equadratures import *
+
+        cache = ModelCache('evaluations.npz', model_id='cfd-run-7')
+        param = Parameter(distribution='uniform', lower=-1., upper=1., order=3)
+        poly = Poly([param, param], Basis('tensor-grid'), method='numerical-integration')
+        poly.set_model(expensive_model, cache=cache)
+    """
+    def __init__(self, filename=None, model_id=None, tolerance=1e-12):
+        self.filename = filename
+        self.model_id = model_id
+        self.tolerance = tolerance
+        self._points = {}
+        self._values = {}
+        self._trees = {}
+        if (self.filename is not None) and os.path.isfile(self.filename):
+            self._load()
+    def get_model_id(self, function=None):
+        """
+        Returns the identifier under which the evaluations of a model are stored.
+
+        :param ModelCache self:
+            An instance of the ModelCache class.
+        :param callable function:
+            The model. Only used if no ``model_id`` was provided to the constructor.
+        :return:
+            **model_id**: A string.
+        """
+        if self.model_id is not None:
+            return str(self.model_id)
+        if function is None:
+            return 'model'
+        name = str(getattr(function, '__qualname__', getattr(function, '__name__', type(function).__name__)))
+        if ('<lambda>' in name) or ('<locals>' in name):
+            raise ValueError('The model '+name+' is a lambda or a nested function, whose name does not identify it; provide a model_id to the ModelCache.')
+        return str(getattr(function, '__module__', '')) + '.' + name
+    def lookup(self, points, model_id):
+        """
+        Retrieves stored evaluations.
+
+        :param ModelCache self:
+            An instance of the ModelCache class.
+        :param numpy.ndarray points:
+            An ndarray with shape (number_of_observations, dimensions).
+        :param str model_id:
+            The model identifier.
+        :return:
+            **values**: A numpy.ndarray of shape (number_of_observations, number_of_outputs) with the stored evaluations; rows that
+            were not found are set to NaN. None is returned if nothing is stored for this model.
+
+            **found**: A boolean numpy.ndarray of shape (number_of_observations,) that is True for the points found.
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        found = np.zeros(len(points), dtype=bool)
+        if (model_id not in self._points) or (len(points) == 0):
+            return None, found
+        stored_points = self._points[model_id]
+        stored_values = self._values[model_id]
+        if stored_points.shape[1] != points.shape[1]:
+            return None, found
+        if model_id not in self._trees:
+            self._trees[model_id] = cKDTree(stored_points)
+        distances, indices = self._trees[model_id].query(points, k=1, p=np.inf, distance_upper_bound=self.tolerance)
+        found = distances <= self.tolerance
+        values = np.full((len(points), stored_values.shape[1]), np.nan)
+        values[found, :] = stored_values[indices[found], :]
+        return values, found
+    def add(self, points, values, model_id):
+        """
+        Stores evaluations. Rows of ``values`` with NaNs are not stored, so failed evaluations are attempted again.
+
+        :param ModelCache self:
+            An instance of the ModelCache class.
+        :param numpy.ndarray points:
+            An ndarray with shape (number_of_observations, dimensions).
+        :param numpy.ndarray values:
+            An ndarray with shape (number_of_observations, number_of_outputs).
+        :param str model_id:
+            The model identifier.
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        values = np.asarray(values, dtype=float).reshape(len(points), -1)
+        keep = ~np.any(np.isnan(values), axis=1)
+        if not np.any(keep):
+            return
+        if model_id in self._points:
+            self._points[model_id] = np.vstack([self._points[model_id], points[keep, :]])
+            self._values[model_id] = np.vstack([self._values[model_id], values[keep, :]])
+        else:
+            self._points[model_id] = points[keep, :].copy()
+            self._values[model_id] = values[keep, :].copy()
+        self._trees.pop(model_id, None)
+    def save(self):
+        """
+        Writes the stored evaluations to file. Does nothing if no filename was provided.
+
+        :param ModelCache self:
+            An instance of the ModelCache class.
+        """
+        if self.filename is None:
+            return
+        model_ids = sorted(self._points.keys())
+        arrays = {'model_ids': np.array(model_ids, dtype=str)}
+        for i, model_id in enumerate(model_ids):
+            arrays['points_'+str(i)] = self._points[model_id]
+            arrays['values_'+str(i)] = self._values[model_id]
+        temporary_filename = self.filename + '.tmp.npz'
+        np.savez(temporary_filename, **arrays)
+        if hasattr(os, 'replace'):
+            os.replace(temporary_filename, self.filename)
+        else:
+            # Python 2.7 has no os.replace, and os.rename does not overwrite an existing file on Windows.
+            if (os.name == 'nt') and os.path.isfile(self.filename):
+                os.remove(self.filename)
+            os.rename(temporary_filename, self.filename)
+    def get_number_of_evaluations(self, model_id=None):
+        """
+        Returns the number of evaluations stored.
+
+        :param ModelCache self:
+            An instance of the ModelCache class.
+        :param str model_id:
+            The model identifier. If not provided, the total across all models is returned.
+        """
+        if model_id is None:
+            return int(sum(len(points) for points in self._points.values()))
+        if model_id not in self._points:
+            return 0
+        return len(self._points[model_id])
+    def _load(self):
+        """
+        Private function that loads stored evaluations from file.
+
+        :param ModelCache self:
+            An instance of the ModelCache class.
+        """
+        with np.load(self.filename) as data:
+            model_ids = [str(model_id) for model_id in data['model_ids']]
+            for i, model_id in enumerate(model_ids):
+                self._points[model_id] = data['points_'+str(i)]
+                self._values[model_id] = data['values_'+str(i)]
@@ -2,10 +2,14 @@
 from equadratures.parameter import Parameter
 from equadratures.poly import Poly, evaluate_model, evaluate_model_gradients
 from equadratures.basis import Basis
+from equadratures.cache import ModelCache
 import numpy as np
 from scipy import stats
-from scipy import optimize
 from copy import deepcopy
+import os
+FICTIVE_PAIRS_PER_BATCH = 500
+MINIMUM_UNIQUENESS = 1e-6
+MARGINALS_SIGNATURE_PROBABILITIES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
 
 class Correlations(object):
     """
@@ -14,58 +18,60 @@ class Correlations(object):
 
     :param Poly poly: A polynomial object.
     :param numpy.ndarray correlation_matrix: The correlation matrix associated with the joint distribution.
+    :param bool verbose: If True, the Cholesky factor and the fictive correlation matrix are printed.
+    :param fictive_matrix: The fictive correlation matrix R0 of the underlying standard normal variables. It may be provided as a
+        numpy.ndarray---e.g., one returned by :meth:`get_fictive_matrix`---or as the name of a file. If the file exists, R0 is loaded from
+        it; otherwise R0 is computed and written to it, along with the correlation matrix and a signature of the marginals. Either way,
+        repeated runs skip the computation of R0. A file written for another correlation matrix or other marginals is not used: R0 is
+        computed again and the file is overwritten. If R0 is not positive definite, it is replaced by the nearest correlation matrix; see
+        :func:`nearest_correlation_matrix`.
+    :param int rank: If provided, R0 is approximated by a factor model with ``rank`` latent factors, i.e., R0 = L L^T + diag(psi), where L is
+        of shape (dimension, rank). Mapping N samples then costs O(N dimension rank) operations, instead of O(N dimension^2) with the
+        Cholesky factor of R0.
 
     **References**
         1. Melchers, R. E., (1945) Structural Reliability Analysis and Predictions. John Wiley and Sons, second edition.
 
     """
-    def __init__(self, poly, correlation_matrix, verbose=False):
+    def __init__(self, poly, correlation_matrix, verbose=False, fictive_matrix=None, rank=None):
         self.poly = poly
         D = self.poly.get_parameters()
         self.D = D
         self.R = correlation_matrix
         self.std = Parameter(order=5, distribution='normal',shape_parameter_A = 0.0, shape_parameter_B = 1.0)
-        inf_lim = -8.0
-        sup_lim = - inf_lim
-        p1 = Parameter(distribution = 'uniform', lower = inf_lim, upper = sup_lim, order = 31)
-        myBasis = Basis('tensor-grid')
-        Pols = Poly([p1, p1], myBasis, method='numerical-integration')
-        p = Pols.get_points()
-        w = Pols.get_weights() * (sup_lim - inf_lim)**2
-        p1 = p[:,0]
-        p2 = p[:,1]
-        R0 = np.eye((len(self.D)))
-        for i in range(len(self.D)):
-            for j in range(i+1, len(self.D), 1):
-                if self.R[i,j] == 0:
-                    R0[i,j] = 0.0
-                else:
-                  tp11 = -(np.array(self.D[i].get_icdf(self.std.get_cdf(points=p1))) - self.D[i].mean ) / np.sqrt( self.D[i].variance )
-                  tp22 = -(np.array(self.D[j].get_icdf(self.std.get_cdf(points=p2))) -  self.D[j].mean)/np.sqrt( self.D[j].variance )
-
-                  rho_ij = self.R[i,j]
-                  bivariateNormalPDF = (1.0 / (2.0 * np.pi * np.sqrt(1.0-rho_ij**2)) * np.exp(-1.0/(2.0*(1.0 - rho_ij**2)) * (p1**2 - 2.0 * rho_ij * p1 * p2  + p2**2 )))
-                  coefficientsIntegral = np.flipud(tp11*tp22 * w)
-
-                  def check_difference(rho_ij):
-                      bivariateNormalPDF = (1.0 / (2.0 * np.pi * np.sqrt(1.0-rho_ij**2)) * np.exp(-1.0/(2.0*(1.0 - rho_ij**2)) * (p1**2 - 2.0 * rho_ij * p1 * p2  + p2**2 )))
-                      diff = np.dot(coefficientsIntegral, bivariateNormalPDF)
-                      return diff - self.R[i,j]
-
-                  if (self.D[i].name!='custom') or (self.D[j].name!='custom'):
-                    rho = optimize.newton(check_difference, self.R[i,j], maxiter=50)
-                  else:
-                    res = optimize.least_squares(check_difference, R[i,j], bounds=(-0.999,0.999), ftol=1.e-03)
-                    rho = res.x
-                    print('A Custom Marginal is present')
-
-                  R0[i,j] = rho
-                  R0[j,i] = R0[i,j]
-
-        self.A = np.linalg.cholesky(R0)
+        R0 = None
+        if isinstance(fictive_matrix, str) and os.path.isfile(fictive_matrix):
+            R0 = self._load_fictive_matrix(fictive_matrix)
+        elif (fictive_matrix is not None) and not isinstance(fictive_matrix, str):
+            R0 = np.array(fictive_matrix, dtype=float)
+        store_fictive_matrix = isinstance(fictive_matrix, str) and (R0 is None)
+        if R0 is None:
+            R0 = self._get_fictive_matrix()
+        if R0.shape != (len(self.D), len(self.D)):
+            raise ValueError('The fictive correlation matrix must be of shape '+str((len(self.D), len(self.D)))+'.')
+        if not _is_positive_definite(R0):
+            print('WARNING: The fictive correlation matrix is not positive definite; it is replaced by the nearest correlation matrix.')
+            R0 = nearest_correlation_matrix(R0)
+        # R0 is only written once it has been repaired, so a stored fictive matrix is always positive definite.
+        if store_fictive_matrix:
+            with open(fictive_matrix, 'wb') as fictive_file:
+                np.savez(fictive_file, R0=R0, R=np.asarray(self.R, dtype=float), marginals=self._get_marginals_signature())
+        self.R0 = R0
+        self.rank = rank
+        if self.rank is None:
+            self.A = np.linalg.cholesky(R0)
+        else:
+            self.A = None
+            self._set_factors(self.rank)
         if verbose is True:
-            print('The Cholesky decomposition of fictive matrix R0 is:')
-            print(self.A)
+            if self.rank is None:
+                print('The Cholesky decomposition of fictive matrix R0 is:')
+                print(self.A)
+            else:
+                print('The factor loadings of fictive matrix R0 are:')
+                print(self.loadings)
+                print('The uniquenesses of fictive matrix R0 are:')
+                print(self.uniquenesses)
             print('The fictive matrix is:')
             print(R0)
         list_of_parameters = []
@@ -87,7 +93,87 @@ class Correlations(object):
 
         """
         return self._points
-    def set_model(self, model=None, model_grads=None):
+    def get_fictive_matrix(self):
+        """
+        Returns the fictive correlation matrix R0 of the underlying standard normal variables. It may be stored and passed to the constructor
+        through its ``fictive_matrix`` argument, so that it is not computed again.
+
+        :param Correlations self: An instance of the Correlations object.
+
+        :return:
+            **R0**: A numpy.ndarray of shape (dimension, dimension).
+        """
+        return self.R0
+    def _load_fictive_matrix(self, filename):
+        """
+        Private function that loads the fictive correlation matrix R0 from a file written by the constructor. The correlation matrix and
+        the signature of the marginals stored along with R0 must match those of this object; files that only hold R0 must match the shape
+        of the correlation matrix and its zero off-diagonal entries.
+
+        :param Correlations self: An instance of the Correlations object.
+        :param str filename: The name of the file.
+
+        :return:
+            **R0**: A numpy.ndarray of shape (dimension, dimension), or None if the file does not match this object.
+        """
+        R = np.asarray(self.R, dtype=float)
+        stored = np.load(filename)
+        if isinstance(stored, np.ndarray):
+            R0 = stored
+            valid = (R0.shape == R.shape) and np.array_equal(np.triu(R0, 1) == 0, np.triu(R, 1) == 0)
+        else:
+            with stored:
+                R0 = stored['R0']
+                signature = self._get_marginals_signature()
+                valid = (R0.shape == R.shape) and (stored['R'].shape == R.shape) and np.allclose(stored['R'], R, rtol=0.0, atol=1e-12) \
+                        and (stored['marginals'].shape == signature.shape) and np.allclose(stored['marginals'], signature, rtol=1e-10, atol=1e-10)
+        if not valid:
+            print('WARNING: The fictive correlation matrix in '+filename+' does not match the correlation matrix or the marginals; it is computed again.')
+            return None
+        return R0
+    def _get_marginals_signature(self):
+        """
+        Private function that returns the standardised quantiles of each marginal at a few fixed probabilities. R0 only depends on the
+        marginals through them, so they identify the marginals a stored R0 was computed for, irrespective of their location and scale.
+
+        :param Correlations self: An instance of the Correlations object.
+
+        :return:
+            **signature**: A numpy.ndarray of shape (dimension, number_of_probabilities).
+        """
+        probabilities = np.array(MARGINALS_SIGNATURE_PROBABILITIES)
+        return np.array([(np.ravel(parameter.get_icdf(probabilities)) - parameter.mean) / np.sqrt(parameter.variance) \
+                         for parameter in self.D])
+    def _get_fictive_matrix(self):
+        """
+        Private function that computes the fictive correlation matrix R0. Each marginal is mapped to the standard normal space on a
+        univariate quadrature grid once; the correlations of all pairs are then solved for simultaneously, in batches.
+
+        :param Correlations self: An instance of the Correlations object.
+
+        :return:
+            **R0**: A numpy.ndarray of shape (dimension, dimension).
+        """
+        inf_lim = -8.0
+        sup_lim = - inf_lim
+        p1 = Parameter(distribution = 'uniform', lower = inf_lim, upper = sup_lim, order = 31)
+        myPoly = Poly(p1, Basis('univariate'), method='numerical-integration')
+        x = myPoly.get_points().flatten()
+        w = myPoly.get_weights().flatten() * (sup_lim - inf_lim)
+        u = self.std.get_cdf(points=x)
+        G = np.zeros((len(self.D), len(x)))
+        for i in range(len(self.D)):
+            G[i,:] = w * (np.ravel(self.D[i].get_icdf(u)) - self.D[i].mean) / np.sqrt(self.D[i].variance)
+        R = np.asarray(self.R, dtype=float)
+        R0 = np.eye(len(self.D))
+        rows, columns = np.nonzero(np.triu(R, 1))
+        for k in range(0, len(rows), FICTIVE_PAIRS_PER_BATCH):
+            i = rows[k:k+FICTIVE_PAIRS_PER_BATCH]
+            j = columns[k:k+FICTIVE_PAIRS_PER_BATCH]
+            R0[i,j] = _solve_fictive_correlations(G[i,:], G[j,:], x, R[i,j])
+            R0[j,i] = R0[i,j]
+        return R0
+    def set_model(self, model=None, model_grads=None, batch_size=None, executor=None, cache=None):
         """
         Computes the coefficients of the polynomial.
 
@@ -97,16 +183,24 @@ class Correlations(object):
             The function that needs to be approximated. In the absence of a callable function, the input can be the function evaluated at the quadrature points.
         :param callable model_grads:
             The gradient of the function that needs to be approximated. In the absence of a callable gradient function, the input can be a matrix of gradient evaluations at the quadrature points.
+        :param int batch_size:
+            If provided, the callables are passed blocks of at most ``batch_size`` correlated points at a time; see :meth:`Poly.set_model`.
+        :param executor:
+            If provided, the model evaluations are spread across workers; see :meth:`Poly.set_model`.
+        :param ModelCache cache:
+            If provided, the model is only evaluated at correlated points that have not been evaluated before; see :meth:`Poly.set_model`.
         """
+        if isinstance(cache, str):
+            cache = ModelCache(cache)
         model_values = None
         model_grads_values = None
         if callable(model):
-            model_values = evaluate_model(self._points, model)
+            model_values = evaluate_model(self._points, model, batch_size, executor, cache)
         else:
             model_values = model
         if model_grads is not None:
             if callable(model_grads):
-                model_grads_values = evaluate_model_gradients(self._points, model_grads)
+                model_grads_values = evaluate_model_gradients(self._points, model_grads, 'matrix', batch_size, executor, cache)
             else:
                 model_grads_values = model_grads
         self.polystandard.set_model(model_values, model_grads_values)
@@ -131,24 +225,64 @@ class Correlations(object):
         :return:
             **C**: A numpy.ndarray of shape (N, M), which contains the correlated samples.
         """
-        X = X.T
+        Z = self._get_correlated_standard(np.asarray(X, dtype=float))
+        return self._get_marginals_from_standard(Z)
+    def _get_correlated_standard(self, X):
+        """
+        Private function that maps uncorrelated standard normal samples to standard normal samples with correlation matrix R0 (or its factor
+        model approximation).
 
-        invA = np.linalg.inv(self.A)
-        Z = np.linalg.solve(invA, X)
-        Z = Z.T
+        :param Correlations self: An instance of the Correlations object.
+        :param numpy.ndarray X: Uncorrelated standard normal samples; of shape (N,M)
 
-        xc = np.zeros((len(Z[:,0]), len(self.D)))
-        for i in range(len(self.D)):
-            for j in range(len(Z[:,0])):
-                xc[j,i] = self.std.get_cdf(points=Z[j,i])
-        Xc = np.zeros((len(Z[:,0]),len(self.D)))
-        for i in range(len(self.D)):
-            for j in range(len(Z[:,0])):
-                temporary = np.matrix(xc[j,i])
-                temp = self.D[i].get_icdf(temporary)
+        :return:
+            **Z**: A numpy.ndarray of shape (N, M), which contains the correlated standard normal samples.
+        """
+        if self.A is not None:
+            return np.dot(X, self.A.T)
+        # With R0 = Psi^(1/2) (I + V S^2 V^T) Psi^(1/2), the symmetric square root is Psi^(1/2) (I + V C V^T), where C = sqrt(I + S^2) - I.
+        return (X + np.dot(np.dot(X, self._V), self._C[:,np.newaxis] * self._V.T)) * np.sqrt(self.uniquenesses)
+    def _set_factors(self, rank, maxiter=100, tol=1e-10):
+        """
+        Private function that fits the factor model R0 = L L^T + diag(psi), with L of shape (dimension, rank), by principal axis factoring.
 
-                t = temp[0]
-                Xc[j,i] = t
+        :param Correlations self: An instance of the Correlations object.
+        :param int rank: Number of latent factors.
+        """
+        d = len(self.D)
+        rank = int(rank)
+        if (rank < 1) or (rank > d):
+            raise ValueError('The rank must be between 1 and the number of parameters, '+str(d)+'.')
+        psi = np.ones(d) * 0.5
+        for i in range(0, maxiter):
+            reduced = self.R0 - np.diag(psi)
+            eigenvalues, eigenvectors = np.linalg.eigh(reduced)
+            L = eigenvectors[:,-rank:] * np.sqrt(np.maximum(eigenvalues[-rank:], 0.0))
+            psi_new = np.clip(1.0 - np.sum(L**2, axis=1), MINIMUM_UNIQUENESS, 1.0)
+            converged = np.max(np.abs(psi_new - psi)) < tol
+            psi = psi_new
+            if converged:
+                break
+        # Rescale the loadings so that the factor model is a correlation matrix.
+        L = L * np.sqrt((1.0 - psi) / np.maximum(np.sum(L**2, axis=1), 1e-300))[:,np.newaxis]
+        self.loadings = L
+        self.uniquenesses = psi
+        V, S, _ = np.linalg.svd(L / np.sqrt(psi)[:,np.newaxis], full_matrices=False)
+        self._V = V
+        self._C = np.sqrt(1.0 + S**2) - 1.0
+    def _get_marginals_from_standard(self, Z):
+        """
+        Private function that maps correlated standard normal samples to the marginals, one column at a time.
+
+        :param Correlations self: An instance of the Correlations object.
+        :param numpy.ndarray Z: Correlated standard normal samples; of shape (N,M)
+
+        :return:
+            **C**: A numpy.ndarray of shape (N, M), which contains the correlated samples.
+        """
+        Xc = np.zeros(Z.shape)
+        for i in range(len(self.D)):
+            Xc[:,i] = np.ravel(self.D[i].get_icdf(self.std.get_cdf(points=Z[:,i])))
         return Xc
     def get_correlated_samples(self, N=None):
         """
@@ -161,27 +295,84 @@ class Correlations(object):
             **C**: A numpy.ndarray of shape (N, M), which contains the correlated samples.
         """
         if N is not None:
-
-            distro = list()
+            distro = np.zeros((len(self.D), N))
             for i in range(len(self.D)):
-                    distro1 = self.std.get_samples(N)
-
-                    # check dimensions ------------------#
-                    distro1 = np.matrix(distro1)
-                    dimension = np.shape(distro1)
-                    if dimension[0] == N:
-                        distro1 = distro1.T
-                    #------------------------------------#
-                    distro.append(distro1)
-
-            distro = np.reshape(distro, (len(self.D),N))
-            interm = np.dot(self.A, distro)
-            correlated = np.zeros((len(self.D),N))
-            for i in range(len(self.D)):
-                for j in range(N):
-                    correlated[i,j] = self.D[i].get_icdf(self.std.get_cdf(interm[i,j]))
-            correlated = correlated.T
-            return correlated
-
+                distro[i,:] = np.ravel(self.std.get_samples(N))
+            interm = self._get_correlated_standard(distro.T)
+            return self._get_marginals_from_standard(interm)
         else:
-             raise(ValueError, 'One input must be given to "get Correlated Samples" method: please choose between sampling N points or giving an array of uncorrelated data ')
\ No newline at end of file
+             raise(ValueError, 'One input must be given to "get Correlated Samples" method: please choose between sampling N points or giving an array of uncorrelated data ')
+def _solve_fictive_correlations(G1, G2, x, rho_target, maxiter=50, tol=1.48e-8):
+    """
+    Private function that solves, with Newton's method, for the correlations of pairs of standard normal variables that yield the target
+    correlations between the marginals. All pairs are solved for at once.
+
+    :param numpy.ndarray G1: The first marginal of each pair, standardised and evaluated on the grid x, times the quadrature weights; of shape (P, n).
+    :param numpy.ndarray G2: The second marginal of each pair, likewise; of shape (P, n).
+    :param numpy.ndarray x: The univariate quadrature grid in the standard normal space; of shape (n,).
+    :param numpy.ndarray rho_target: The target correlations; of shape (P,).
+
+    :return:
+        **rho**: A numpy.ndarray of shape (P,) with the fictive correlations.
+    """
+    x1 = x.reshape(1, len(x), 1)
+    x2 = x.reshape(1, 1, len(x))
+    rho = np.array(rho_target, dtype=float)
+    for iteration in range(0, maxiter):
+        r = rho.reshape(len(rho), 1, 1)
+        s = 1.0 - r**2
+        Q = x1**2 - 2.0 * r * x1 * x2 + x2**2
+        bivariateNormalPDF = 1.0 / (2.0 * np.pi * np.sqrt(s)) * np.exp(-Q / (2.0 * s))
+        difference = np.einsum('pa,pab,pb->p', G1, bivariateNormalPDF, G2) - rho_target
+        derivative = np.einsum('pa,pab,pb->p', G1, bivariateNormalPDF * (r / s + x1 * x2 / s - r * Q / s**2), G2)
+        rho_new = np.clip(rho - difference / derivative, -0.9999, 0.9999)
+        converged = np.all(np.abs(rho_new - rho) < tol)
+        rho = rho_new
+        if converged:
+            return rho
+    print('WARNING: The fictive correlations did not converge after '+str(maxiter)+' iterations.')
+    return rho
+def nearest_correlation_matrix(R, minimum_eigenvalue=1e-8, tol=1e-10, maxiter=500):
+    """
+    Computes the nearest correlation matrix---in the Frobenius norm---to a symmetric matrix, with the alternating projections method of Higham
+    [1], in which Dykstra's correction is applied to the projection onto positive semi-definite matrices. The eigenvalues of the result are
+    bounded from below, so that its Cholesky factorisation exists.
+
+    :param numpy.ndarray R: A symmetric matrix with unit diagonal, e.g., an indefinite estimate of a correlation matrix.
+    :param double minimum_eigenvalue: The smallest eigenvalue allowed.
+    :param double tol: Relative tolerance on the change between two iterations.
+    :param int maxiter: Maximum number of iterations.
+
+    :return:
+        **R**: A numpy.ndarray with the nearest positive definite correlation matrix.
+
+    **References**
+        1. Higham, N. J., (2002) Computing the Nearest Correlation Matrix - A Problem from Finance. IMA Journal of Numerical Analysis, 22(3).
+    """
+    Y = 0.5 * (np.asarray(R, dtype=float) + np.asarray(R, dtype=float).T)
+    dS = np.zeros(Y.shape)
+    for i in range(0, maxiter):
+        Rk = Y - dS
+        eigenvalues, eigenvectors = np.linalg.eigh(Rk)
+        X = np.dot(eigenvectors * np.maximum(eigenvalues, minimum_eigenvalue), eigenvectors.T)
+        dS = X - Rk
+        Y_new = X.copy()
+        np.fill_diagonal(Y_new, 1.0)
+        change = np.linalg.norm(Y_new - Y) / np.linalg.norm(Y)
+        Y = Y_new
+        if change < tol:
+            break
+    # Restore positive definiteness exactly, while keeping a unit diagonal.
+    eigenvalues, eigenvectors = np.linalg.eigh(Y)
+    X = np.dot(eigenvectors * np.maximum(eigenvalues, minimum_eigenvalue), eigenvectors.T)
+    scaling = 1.0 / np.sqrt(np.diag(X))
+    return X * scaling[:,np.newaxis] * scaling[np.newaxis,:]
+def _is_positive_definite(R):
+    """
+    Private function that checks whether a matrix has a Cholesky factorisation.
+    """
+    try:
+        np.linalg.cholesky(R)
+        return True
+    except np.linalg.LinAlgError:
+        return False
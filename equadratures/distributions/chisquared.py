@@ -1,5 +1,6 @@
 """The Chi-squared distribution."""
 from equadratures.distributions.template import Distribution
+from equadratures.distributions.recurrence_utils import gamma_recurrence_coefficients
 import numpy as np
 from scipy.special import erf, erfinv, gamma, gammainc
 from scipy.stats import chi2
@@ -98,3 +99,17 @@ class Chisquared(Distribution):
         else:
             number = 500000
         return self.parent.rvs(size= number)
+    def get_recurrence_coefficients(self, order):
+        """
+        Recurrence coefficients for the chi-squared distribution, which is a gamma distribution with a shape parameter of
+        dofs/2 and a scale parameter of 2.
+
+        :param Chisquared self:
+            An instance of the Chi-squared class.
+        :param array order:
+            The order of the recurrence coefficients desired.
+        :return:
+            Recurrence coefficients associated with the chi-squared distribution.
+        """
+        ab = gamma_recurrence_coefficients(self.dofs/2.0, 2.0, order)
+        return ab
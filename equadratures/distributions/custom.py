@@ -1,10 +1,13 @@
 """ The Custom distribution"""
-from equadratures.distributions.recurrence_utils import jacobi_recurrence_coefficients
+from equadratures.distributions.recurrence_utils import custom_recurrence_coefficients
 from equadratures.distributions.template import Distribution
 import numpy as np
 import scipy.stats as stats
 from scipy.special import erf, erfinv, gamma, beta, betainc, gammainc
 RECURRENCE_PDF_SAMPLES = 50000
+INITIAL_TABLE_POINTS = 257
+MAXIMUM_TABLE_REFINEMENTS = 12
+TABLE_TOLERANCE = 1e-5
 
 class Custom(Distribution):
     """ The class defines a Custom object.
@@ -14,7 +17,7 @@ class Custom(Distribution):
     """
     def __init__(self, data):
         if data is not None:
-             self.data     = data
+             self.data     = np.ravel(data)
              self.mean     = np.mean(self.data)
              self.variance = np.var(self.data)
              self.std      = np.std(self.data)
@@ -25,6 +28,41 @@ class Custom(Distribution):
              self.x_range_for_pdf = np.linspace(self.lower, self.upper, RECURRENCE_PDF_SAMPLES)
              self.skewness = stats.skew(self.data)
              self.kurtosis = stats.kurtosis(self.data)
+             self._set_tables()
+    def _set_tables(self):
+        """
+        Private function that fits a kernel density estimate (with Gaussian kernel) to the data once, and tabulates it over
+        the support of the data. The grid is refined by bisection wherever the density is not resolved by linear
+        interpolation. The tabulated density is then piecewise linear, so the cumulative density function is piecewise
+        quadratic, and both it and its inverse are evaluated exactly from the tables.
+
+        :param Custom self:
+            An instance of Custom class.
+        """
+        self._kernel = stats.gaussian_kde(self.data)
+        x = np.linspace(self.lower, self.upper, INITIAL_TABLE_POINTS)
+        f = self._kernel(x)
+        active = np.ones(len(x) - 1, dtype=bool)
+        tolerance = TABLE_TOLERANCE * np.max(f)
+        for level in range(0, MAXIMUM_TABLE_REFINEMENTS):
+            indices = np.where(active)[0]
+            if len(indices) == 0:
+                break
+            x_mid = 0.5 * (x[indices] + x[indices + 1])
+            f_mid = self._kernel(x_mid)
+            unresolved = np.abs(f_mid - 0.5 * (f[indices] + f[indices + 1])) > tolerance
+            # Each bisected interval is replaced by two halves, which are refined further if it was unresolved.
+            active_left = np.zeros(len(x) - 1, dtype=bool)
+            active_left[indices] = unresolved
+            order = np.argsort(np.hstack([x, x_mid]), kind='mergesort')
+            x = np.hstack([x, x_mid])[order]
+            f = np.hstack([f, f_mid])[order]
+            active = np.hstack([active_left, [False], unresolved])[order][0:-1]
+        h = np.diff(x)
+        cdf = np.hstack([0.0, np.cumsum(0.5 * h * (f[0:-1] + f[1:]))])
+        self._x_table = x
+        self._pdf_table = f / cdf[-1]
+        self._cdf_table = cdf / cdf[-1]
     def get_description(self):
         """ A destription of custom distribution.
 
@@ -45,26 +83,11 @@ class Custom(Distribution):
             :return:
                 Probability density values along the support of custom distribution.
             ** Notes **
-            To obtain a probability density function from finite samples, this function uses kerne density estimation (with Gaussian kernel).
+            To obtain a probability density function from finite samples, this function uses kernel density estimation (with Gaussian kernel),
+            which is fitted once and tabulated over the support of the data.
         """
-        X = np.array(points)
-        kernel = stats.gaussian_kde(self.data)
         if points is not None:
-            # check dimensions:
-            points = np.matrix(points)
-            dimension = np.shape(points)
-            summ = dimension[0]+dimension[1]
-            if (summ != 2) :
-                wts    = kernel(X)
-                return wts
-            else:
-                c = X
-                lower = c*(1.-c/1000.)
-                upper = c*(1.+c/1000.)
-                vector = np.linspace(lower, upper, 3)
-                wts_v  = kernel(vector)
-                wts    = wts_v[1]
-                return wts
+            return np.interp(points, self._x_table, self._pdf_table, left=0.0, right=0.0)
         else:
             print('An input array have to be given to the getPDF method.')
 
@@ -91,36 +114,24 @@ class Custom(Distribution):
         else:
             print 'An input array has to be given to the getCDF method.'
     """
-    #------------------------------------------------------------------------#
     def get_cdf(self, points=None):
-        # Approssimation of PDF integral (not into the original version of custom class)
-        #    given a set of points: what is the cdf, staring from the PDF of data?
-        #------------------------------------
-        # version 1:
-        #---------------------------------------------------------------------
-        #x = sorted(points) # points can be different from self.data
-        #
-        #y = self.getPDF(x) # pdf function associated with self.data and points
-        #
-        #c     = [] # list for future CDF array
-        #c.append( 0.) # initialization
-        #
-        #for i in range(1,len(points)):
-        #    c.append((y[i-1]+y[i] )*.5*(x[i]-x[i-1])+c[i-1] )
-        #for i in range(1,len(points)):
-        #    c[i] = c[i]/c[len(points)-1]
-        #return c
-        #--------------------------------------------------------------------
-        # version 2
-        points = np.matrix(points)
-
-        y = self.get_pdf(self.data)
-        summ = np.sum(y)
-        p = np.array(y/summ)
-        custom = stats.rv_discrete(name='custom', values=(self.data, p))
+        """
+        A custom cumulative density function, obtained by integrating the tabulated probability density function.
 
-        return custom.cdf(points)
-        #------------------------------------------------------------------------#
+        :param Custom self:
+            An instance of Custom class.
+        :param array points:
+            An array of points in which the cumulative density function needs to be evaluated.
+        :return:
+            Cumulative density function values of the Custom distribution.
+        """
+        x = np.clip(np.asarray(points, dtype=float), self._x_table[0], self._x_table[-1])
+        k = np.clip(np.searchsorted(self._x_table, x, side='right') - 1, 0, len(self._x_table) - 2)
+        h = self._x_table[k + 1] - self._x_table[k]
+        f0 = self._pdf_table[k]
+        f1 = self._pdf_table[k + 1]
+        t = x - self._x_table[k]
+        return self._cdf_table[k] + t * (f0 + 0.5 * (f1 - f0) * t / h)
     def get_recurrence_coefficients(self, order):
         """
         Recurrence coefficients for the custom distribution.
@@ -134,49 +145,12 @@ class Custom(Distribution):
         """
         x = np.linspace(self.lower, self.upper, RECURRENCE_PDF_SAMPLES)
         w = self.get_pdf(points = x)
-        # Allocate memory for recurrence coefficients
-        order = int(order)+1
-        w = w / np.sum(w)
-        ab = np.zeros((order+1,2))
-
-        # Negate "zero" components
-        nonzero_indices = []
-        for i in range(0, len(x)):
-            if w[i] != 0:
-                nonzero_indices.append(i)
-
-        ncap = len(nonzero_indices)
-        x = x[nonzero_indices] # only keep entries at the non-zero indices!
-        w = w[nonzero_indices]
-        s = np.sum(w)
-
-        temp = w/s
-        ab[0,0] = np.dot(x, temp.T)
-        ab[0,1] = s
-
-
-        if order == 1:
-            return ab
-
-        p1 = np.zeros((1, ncap))
-        p2 = np.ones((1, ncap))
-
-        for j in range(0, order):
-            p0 = p1
-            p1 = p2
-            p2 = ( x - ab[j,0] ) * p1 - ab[j,1] * p0
-            p2_squared = p2**2
-            s1 = np.dot(w, p2_squared.T)
-            inner = w * p2_squared
-            s2 = np.dot(x, inner.T)
-            ab[j+1,0] = s2/s1
-            ab[j+1,1] = s1/s
-            s = s1
-
+        ab = custom_recurrence_coefficients(x, w, order)
         return ab
     def get_icdf(self, xx):
         """
-        A custom inverse cumulative distribution function.
+        A custom inverse cumulative distribution function. The piecewise quadratic cumulative density function is inverted
+        exactly, so the inverse is monotone and each point costs a binary search.
 
         :param Custom self:
             An instance of Custom class.
@@ -185,25 +159,15 @@ class Custom(Distribution):
         :return:
             Inverse cumulative density function values of the Custom distribution.
         """
-        #x  = self.data
-        #y  = self.getPDF(x)
-        #c  = []
-        #yy = []
-        #c.append(0.0)
-        #for i in range(1, len(x)):
-        #    c.append(c[i-1]+(x[i]-x[i-1])*(y[i]+y[i-1])*.5)
-        #for i in range(1, len(x)):
-        #    c[i]=c[i]/c[len(x)-1]
-        #for k in range(0, len(x)):
-        #    for i in range(0, len(x)):
-        #        if ((xx[k]>=c[i]) and (xx[k]<=c[i+1])):
-        #            value = float((xx[k]-c[i])/(c[i+1]-c[i])*(x[i+1]-x[i])+x[i])
-        #            yy.append(value)
-        #            break
-        #return yy
-        xx = np.matrix(xx)
-        y = self.get_pdf(self.data)
-        summ = np.sum(y)
-        p = np.array(y/summ)
-        custom = stats.rv_discrete(name='custom', values=(self.data, p))
-        return custom.ppf(xx)
+        u = np.clip(np.asarray(xx, dtype=float), 0.0, 1.0)
+        k = np.clip(np.searchsorted(self._cdf_table, u, side='right') - 1, 0, len(self._x_table) - 2)
+        h = self._x_table[k + 1] - self._x_table[k]
+        f0 = self._pdf_table[k]
+        f1 = self._pdf_table[k + 1]
+        # Solve 0.5 * (f1 - f0) / h * t**2 + f0 * t = u - F_k for t in [0, h], in a form that is stable when f1 = f0.
+        c = u - self._cdf_table[k]
+        discriminant = np.maximum(f0**2 + 2.0 * (f1 - f0) / h * c, 0.0)
+        denominator = f0 + np.sqrt(discriminant)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(denominator > 0, 2.0 * c / denominator, 0.0)
+        return self._x_table[k] + np.clip(t, 0.0, h)
@@ -1,6 +1,6 @@
 """The Exponential distribution."""
 from equadratures.distributions.template import Distribution
-from equadratures.distributions.recurrence_utils import custom_recurrence_coefficients
+from equadratures.distributions.recurrence_utils import gamma_recurrence_coefficients
 import numpy as np
 from scipy.stats import expon
 RECURRENCE_PDF_SAMPLES = 8000
@@ -97,3 +97,16 @@ class Exponential(Distribution):
         else:
             number = 500000
         return self.parent.rvs(size= number)
+    def get_recurrence_coefficients(self, order):
+        """
+        Recurrence coefficients for the exponential distribution, i.e., those of the scaled Laguerre polynomials.
+
+        :param Exponential self:
+            An instance of the Exponential class.
+        :param array order:
+            The order of the recurrence coefficients desired.
+        :return:
+            Recurrence coefficients associated with the exponential distribution.
+        """
+        ab = gamma_recurrence_coefficients(1.0, 1.0/self.rate, order)
+        return ab
@@ -1,5 +1,6 @@
 """The Gamma distribution."""
 from equadratures.distributions.template import Distribution
+from equadratures.distributions.recurrence_utils import gamma_recurrence_coefficients
 import numpy as np
 from scipy.special import erf, erfinv, gamma, beta, betainc, gammainc
 from scipy.stats import gamma
@@ -98,3 +99,16 @@ class Gamma(Distribution):
         else:
            number = 500000
         return self.parent.rvs(size = number)
+    def get_recurrence_coefficients(self, order):
+        """
+        Recurrence coefficients for the gamma distribution, i.e., those of the scaled generalised Laguerre polynomials.
+
+        :param Gamma self:
+            An instance of the Gamma class.
+        :param array order:
+            The order of the recurrence coefficients desired.
+        :return:
+            Recurrence coefficients associated with the gamma distribution.
+        """
+        ab = gamma_recurrence_coefficients(self.shape, self.scale, order)
+        return ab
@@ -92,3 +92,19 @@ class Gaussian(Distribution):
             Inverse CDF samples associated with the Gaussian distribution.
         """
         return self.parent.ppf(xx)
+    def get_recurrence_coefficients(self, order):
+        """
+        Recurrence coefficients for the Gaussian distribution, i.e., those of the probabilists' Hermite polynomials.
+
+        :param Gaussian self:
+            An instance of the Gaussian class.
+        :param array order:
+            The order of the recurrence coefficients desired.
+        :return:
+            Recurrence coefficients associated with the Gaussian distribution.
+        """
+        ab = np.zeros((int(order) + 1, 2))
+        ab[:,0] = self.mean
+        ab[0,1] = 1.0
+        ab[1:,1] = np.arange(1, int(order) + 1) * self.variance
+        return ab
@@ -18,6 +18,7 @@ class Pareto(Distribution):
             if self.shape_parameter > 0:
                 mean, var, skew, kurt = pareto.stats(self.shape_parameter, moments='mvsk')
                 self.parent = pareto(self.shape_parameter)
+                self.tail_index = self.shape_parameter
                 self.mean = mean
                 self.variance = var
                 self.skewness = skew
@@ -1,6 +1,9 @@
 """Recurrence coefficients class."""
 import numpy as np
 from scipy.special import erf, erfinv, gamma, beta, betainc, gammainc
+TANH_SINH_HALF_WIDTH = 4.5
+SINH_HALF_WIDTH = 3.0
+MAXIMUM_DISCRETISATION_POINTS = 2**17
 def laguerre_recurrence_coefficients(a, order):
     """
     Returns the Laguerre recurrence coefficients.
@@ -27,6 +30,25 @@ def laguerre_recurrence_coefficients(a, order):
         ab[i+1, 0] = na
         ab[i+1, 1] = nb
     return ab
+def gamma_recurrence_coefficients(shape, scale, order):
+    """
+    Returns the recurrence coefficients of a gamma distribution, obtained by scaling the generalised Laguerre
+    recurrence coefficients.
+
+    :param double shape:
+        Shape parameter of the gamma distribution, where shape > 0.
+    :param double scale:
+        Scale parameter of the gamma distribution.
+    :param int order:
+        Order of the recurrence coefficients requested.
+    :return:
+        (order+1)-by-2 numpy array of the recurrence coefficients, normalised such that ab[0,1] = 1.
+    """
+    ab = laguerre_recurrence_coefficients(shape - 1.0, order)
+    ab[:,0] = scale * ab[:,0]
+    ab[1:,1] = scale**2 * ab[1:,1]
+    ab[0,1] = 1.0
+    return ab
 def jacobi_recurrence_coefficients(a, b, lower, upper, order):
     """
     Returns the Jacobi recurrence coefficients.
@@ -98,54 +120,240 @@ def hermite_recurrence_coefficients(param_A, param_B, order):
     ab[0,1] = gamma(param_A + 0.5)#2.0
 
     return ab
-def custom_recurrence_coefficients(x, w, order):
+def custom_recurrence_coefficients(x, w, order, method='stieltjes'):
     """
-    Returns the custom recurrence coefficients.
+    Returns the recurrence coefficients of the discrete measure with support points x and weights w.
 
     :param array x:
-        Equidistant values of the support of the distribution.
+        Support points of the discrete measure, e.g., equidistant values over the support of the distribution.
     :param array w:
         Probability density function weights associated with the distribution.
     :param int order:
         Order of the recurrence coefficients requested.
+    :param str method:
+        Either ``stieltjes`` (default) or ``lanczos``. The latter is more stable for large orders and large numbers of
+        support points, at the cost of storing the Lanczos vectors.
     :return:
-        (order+1)-by-2 numpy array of the Hermite recurrence coefficients.
+        (order+2)-by-2 numpy array of the recurrence coefficients.
     """
-
-    # Allocate memory for recurrence coefficients
-    order = int(order)+1
+    x = np.asarray(x, dtype=float).reshape(-1)
+    w = np.asarray(w, dtype=float).reshape(-1)
     w = w / np.sum(w)
-    ab = np.zeros((order+1,2))
-
-    # Negate "zero" components
-    nonzero_indices = []
-    for i in range(0, len(x)):
-        if w[i] != 0:
-            nonzero_indices.append(i)
-
-    ncap = len(nonzero_indices)
-    x = x[nonzero_indices] # only keep entries at the non-zero indices!
-    w = w[nonzero_indices]
+    nonzero = w != 0
+    x = x[nonzero] # only keep entries at the non-zero indices!
+    w = w[nonzero]
+    if method == 'stieltjes':
+        return _stieltjes(x, w, int(order) + 1)
+    elif method == 'lanczos':
+        return _lanczos(x, w, int(order) + 1)
+    else:
+        raise ValueError('Unknown method '+str(method)+' for computing recurrence coefficients; choose stieltjes or lanczos.')
+def _stieltjes(x, w, order):
+    """
+    Private function that runs the Stieltjes procedure on orthonormal---rather than monic---polynomials, which do not
+    overflow at high orders. The polynomials are held in three preallocated buffers that are rotated between
+    iterations.
+    """
+    ab = np.zeros((order+1, 2))
     s = np.sum(w)
-    temp = w/s
-    ab[0,0] = np.dot(x, temp.T)
+    ab[0,0] = np.dot(w, x) / s
     ab[0,1] = s
-
     if order == 1:
         return ab
+    w = w / s
+    p0 = np.zeros(len(x))
+    p1 = np.ones(len(x))
+    p2 = np.empty(len(x))
+    wp = np.empty(len(x))
+    sqrt_b = 0.0
+    for j in range(0, order):
+        # p2 = ((x - a_j) * p1 - sqrt(b_j) * p0) / sqrt(b_{j+1})
+        np.subtract(x, ab[j,0], out=p2)
+        np.multiply(p2, p1, out=p2)
+        p0 *= sqrt_b
+        p2 -= p0
+        np.multiply(w, p2, out=wp)
+        ab[j+1,1] = np.dot(wp, p2)
+        if ab[j+1,1] <= 0.0:
+            break
+        sqrt_b = np.sqrt(ab[j+1,1])
+        p2 /= sqrt_b
+        wp /= sqrt_b
+        ab[j+1,0] = np.dot(wp, x * p2)
+        p0, p1, p2 = p1, p2, p0
+    return ab
+def _lanczos(x, w, order):
+    """
+    Private function that computes the recurrence coefficients with the Lanczos algorithm, i.e., by tridiagonalising
+    diag(x) starting from the vector sqrt(w). Full reorthogonalisation of the Lanczos vectors, which are stored in a
+    preallocated array, keeps the coefficients accurate even when the Stieltjes procedure loses orthogonality.
+    """
+    ab = np.zeros((order+1, 2))
+    s = np.sum(w)
+    ab[0,1] = s
+    if order == 1:
+        ab[0,0] = np.dot(w, x) / s
+        return ab
+    number_of_vectors = min(order + 1, len(x))
+    Q = np.zeros((number_of_vectors, len(x)))
+    Q[0,:] = np.sqrt(w / s)
+    v = np.empty(len(x))
+    for j in range(0, number_of_vectors):
+        np.multiply(x, Q[j,:], out=v)
+        ab[j,0] = np.dot(Q[j,:], v)
+        if j == number_of_vectors - 1:
+            break
+        # Orthogonalise twice against all previous Lanczos vectors.
+        for k in range(0, 2):
+            v -= np.dot(np.dot(Q[0:j+1,:], v), Q[0:j+1,:])
+        beta = np.linalg.norm(v)
+        if beta == 0.0:
+            break
+        ab[j+1,1] = beta**2
+        np.divide(v, beta, out=Q[j+1,:])
+    return ab
+def discretised_recurrence_coefficients(pdf, lower, upper, order, tolerance=1e-11, center=0.0, scale=1.0):
+    """
+    Returns the recurrence coefficients of a probability density over its support. The density is discretised
+    with a double exponential quadrature rule---tanh-sinh over a finite interval, which copes with integrable
+    singularities at the end-points, exp-sinh over a semi-infinite one and sinh-sinh over the real line---and the
+    coefficients of the discrete measure are obtained with the Stieltjes procedure. The step of the quadrature rule is
+    halved until the coefficients converge, so the cost adapts to the order requested rather than to a fixed number
+    of samples.
+
+    :param callable pdf:
+        The probability density function.
+    :param double lower:
+        Lower bound of the support; may be -np.inf.
+    :param double upper:
+        Upper bound of the support; may be np.inf.
+    :param int order:
+        Order of the recurrence coefficients requested.
+    :param double tolerance:
+        Relative tolerance used to assess the convergence of the coefficients.
+    :param double center:
+        Centre of the sinh-sinh rule, e.g., the median, used when the support is the real line.
+    :param double scale:
+        Length scale of the rule over an infinite support, e.g., the interquartile range or the distance from the
+        finite end-point to the median.
+    :return:
+        (order+1)-by-2 numpy array of the recurrence coefficients.
+    """
+    order = int(order)
+    step = min(0.5, 2.0 * TANH_SINH_HALF_WIDTH / (4.0 * (order + 1)))
+    ab_previous = None
+    while True:
+        x, w = double_exponential_rule(lower, upper, step, center, scale)
+        with np.errstate(all='ignore'):
+            w = w * np.asarray(pdf(x), dtype=float).reshape(len(x))
+        w[~np.isfinite(w)] = 0.0
+        ab = custom_recurrence_coefficients(x, w, order)[0:order+1,:]
+        ab[0,1] = 1.0
+        if ab_previous is not None:
+            scale_a = np.max(np.abs(ab[:, 0])) + np.sqrt(np.max(ab[:, 1]))
+            error_a = np.max(np.abs(ab[:, 0] - ab_previous[:, 0])) / scale_a
+            error_b = np.max(np.abs(ab[:, 1] - ab_previous[:, 1]) / ab[:, 1])
+            if max(error_a, error_b) <= tolerance:
+                return ab
+        if len(x) > MAXIMUM_DISCRETISATION_POINTS:
+            print('WARNING: The recurrence coefficients did not converge to the requested tolerance.')
+            return ab
+        ab_previous = ab
+        step = step / 2.0
+def double_exponential_rule(lower, upper, step, center=0.0, scale=1.0):
+    """
+    Returns the double exponential quadrature rule suited to the interval [lower, upper]: tanh-sinh if both bounds
+    are finite, exp-sinh if only one of them is, and sinh-sinh if neither is.
+
+    :param double lower:
+        Lower bound of the interval; may be -np.inf.
+    :param double upper:
+        Upper bound of the interval; may be np.inf.
+    :param double step:
+        Step size of the trapezoidal rule in the transformed variable.
+    :param double center:
+        Centre of the sinh-sinh rule.
+    :param double scale:
+        Length scale of the exp-sinh and sinh-sinh rules.
+    :return:
+        **x**: A numpy.ndarray of quadrature points.
 
-    p1 = np.zeros((1, ncap))
-    p2 = np.ones((1, ncap))
+        **w**: A numpy.ndarray of quadrature weights.
+    """
+    if np.isfinite(lower) and np.isfinite(upper):
+        return tanh_sinh_rule(lower, upper, step)
+    elif np.isfinite(lower):
+        return exp_sinh_rule(lower, scale, step)
+    elif np.isfinite(upper):
+        x, w = exp_sinh_rule(-upper, scale, step)
+        return -x[::-1], w[::-1]
+    return sinh_sinh_rule(center, scale, step)
+def tanh_sinh_rule(lower, upper, step):
+    """
+    Returns the tanh-sinh (double exponential) quadrature rule over a finite interval. The nodes are computed from
+    their distance to the nearest end-point, so that none of them coincides with an end-point.
 
-    for j in range(0, order):
-        p0 = p1
-        p1 = p2
-        p2 = ( x - ab[j,0] ) * p1 - ab[j,1] * p0
-        p2_squared = p2**2
-        s1 = np.dot(w, p2_squared.T)
-        inner = w * p2_squared
-        s2 = np.dot(x, inner.T)
-        ab[j+1,0] = s2/s1
-        ab[j+1,1] = s1/s
-        s = s1
-    return ab
\ No newline at end of file
+    :param double lower:
+        Lower bound of the interval.
+    :param double upper:
+        Upper bound of the interval.
+    :param double step:
+        Step size of the trapezoidal rule in the transformed variable.
+    :return:
+        **x**: A numpy.ndarray of quadrature points.
+
+        **w**: A numpy.ndarray of quadrature weights.
+    """
+    half_length = (upper - lower) / 2.0
+    number_of_steps = int(np.ceil(TANH_SINH_HALF_WIDTH / step))
+    t = step * np.arange(-number_of_steps, number_of_steps + 1)
+    u = np.pi / 2.0 * np.sinh(np.abs(t))
+    distance_to_end = 2.0 * half_length / (1.0 + np.exp(2.0 * u))
+    x = np.where(t < 0, lower + distance_to_end, upper - distance_to_end)
+    w = step * half_length * np.pi / 2.0 * np.cosh(t) / np.cosh(u)**2
+    keep = (x > lower) & (x < upper) & (w > 0)
+    return x[keep], w[keep]
+def exp_sinh_rule(lower, scale, step):
+    """
+    Returns the exp-sinh quadrature rule over [lower, np.inf), with nodes lower + scale * exp(pi/2 * sinh(t)). The
+    transformed variable runs further towards the end-point, where the density may be singular, than towards infinity,
+    where the nodes would otherwise overflow the polynomials evaluated at them.
+
+    :param double lower:
+        Lower bound of the interval.
+    :param double scale:
+        Distance from the lower bound to the node at t = 0.
+    :param double step:
+        Step size of the trapezoidal rule in the transformed variable.
+    :return:
+        **x**: A numpy.ndarray of quadrature points.
+
+        **w**: A numpy.ndarray of quadrature weights.
+    """
+    t = step * np.arange(-int(np.ceil(TANH_SINH_HALF_WIDTH / step)), int(np.ceil(SINH_HALF_WIDTH / step)) + 1)
+    distance_to_end = scale * np.exp(np.pi / 2.0 * np.sinh(t))
+    x = lower + distance_to_end
+    w = step * np.pi / 2.0 * np.cosh(t) * distance_to_end
+    keep = (x > lower) & (w > 0)
+    return x[keep], w[keep]
+def sinh_sinh_rule(center, scale, step):
+    """
+    Returns the sinh-sinh quadrature rule over the real line, with nodes center + scale * sinh(pi/2 * sinh(t)).
+
+    :param double center:
+        Centre of the rule, i.e., the node at t = 0.
+    :param double scale:
+        Length scale of the rule.
+    :param double step:
+        Step size of the trapezoidal rule in the transformed variable.
+    :return:
+        **x**: A numpy.ndarray of quadrature points.
+
+        **w**: A numpy.ndarray of quadrature weights.
+    """
+    number_of_steps = int(np.ceil(SINH_HALF_WIDTH / step))
+    t = step * np.arange(-number_of_steps, number_of_steps + 1)
+    u = np.pi / 2.0 * np.sinh(t)
+    x = center + scale * np.sinh(u)
+    w = step * scale * np.pi / 2.0 * np.cosh(t) * np.cosh(u)
+    return x, w
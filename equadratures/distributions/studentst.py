@@ -16,6 +16,7 @@ class Studentst(Distribution):
         if self.dofs is not None:
             if self.dofs > 0:
                 self.bounds = np.array([-np.inf, np.inf])
+                self.tail_index = self.dofs
                 mean, var, skew, kurt = t.stats(df=self.dofs, moments='mvsk')
                 self.parent = t(df=self.dofs)
                 self.mean = mean
@@ -1,6 +1,6 @@
 """The Distribution template."""
 
-from equadratures.distributions.recurrence_utils import custom_recurrence_coefficients
+from equadratures.distributions.recurrence_utils import discretised_recurrence_coefficients
 
 import numpy as np
 
@@ -61,7 +61,11 @@ class Distribution(object):
         pass
     def get_recurrence_coefficients(self, order):
         """
-        Recurrence coefficients for the distribution
+        Recurrence coefficients for the distribution. Unless a distribution provides them in closed form, they are computed
+        from an adaptive discretisation of its probability density function over the support of its scipy parent, or over the
+        range spanned by ``x_range_for_pdf`` if it has none. Heavy-tailed distributions set ``tail_index``, the order from
+        which their moments are infinite; if the coefficients requested depend on such moments, the density is truncated to
+        ``x_range_for_pdf`` instead.
 
         :param Distribution self:
             An instance of the distribution class.
@@ -70,8 +74,27 @@ class Distribution(object):
         :return:
             Recurrence coefficients associated with the distribution.
         """
-        w_pdf = self.get_pdf(self.x_range_for_pdf)
-        ab = custom_recurrence_coefficients(self.x_range_for_pdf, w_pdf, order)
+        if not hasattr(self, 'parent') or not hasattr(self.parent, 'support'):
+            return discretised_recurrence_coefficients(self.get_pdf, self.x_range_for_pdf[0], self.x_range_for_pdf[-1], order)
+        lower, upper = self.parent.support()
+        tail_index = getattr(self, 'tail_index', np.inf)
+        if 2 * int(order) + 1 >= tail_index:
+            # The moments these coefficients depend on are infinite, so the density is truncated to x_range_for_pdf. Without any finite
+            # moments (e.g. Cauchy) there is no other option, so the warning is only printed if a lower order would have avoided it,
+            # and only once per distribution.
+            if (tail_index > 1) and not getattr(self, '_truncation_warned', False):
+                print('WARNING: The moments of order '+str(2 * int(order) + 1)+' of this distribution do not exist; its density is truncated to x_range_for_pdf to compute the recurrence coefficients.')
+                self._truncation_warned = True
+            lower, upper = max(lower, self.x_range_for_pdf[0]), min(upper, self.x_range_for_pdf[-1])
+            return discretised_recurrence_coefficients(self.get_pdf, lower, upper, order)
+        center = self.parent.median()
+        if np.isfinite(lower) and not np.isfinite(upper):
+            scale = center - lower
+        elif np.isfinite(upper) and not np.isfinite(lower):
+            scale = upper - center
+        else:
+            scale = self.parent.ppf(0.75) - self.parent.ppf(0.25)
+        ab = discretised_recurrence_coefficients(self.get_pdf, lower, upper, order, center=center, scale=scale)
         return ab
     def get_samples(self, m=None):
         """
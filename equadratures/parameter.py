@@ -17,7 +17,11 @@ from equadratures.distributions.logistic import Logistic
 from equadratures.distributions.gumbel import Gumbel
 from equadratures.distributions.chi import Chi
 from equadratures.distributions.custom import Custom
+from equadratures.basis import get_nested_rule_size
 import numpy as np
+from scipy.linalg import eigh_tridiagonal
+from scipy.optimize import minimize_scalar
+LEJA_CANDIDATE_POINTS = 2001
 
 class Parameter(object):
     """
@@ -70,6 +74,11 @@ class Parameter(object):
         self.upper = upper
         self.endpoints = endpoints
         self.data = data
+        self._recurrence_coefficients = None
+        self._recurrence_order = None
+        self._recurrence_rows_offset = 0
+        self._quadrature_rules = {}
+        self._nested_nodes = {}
         self._set_distribution()
         self._set_bounds()
         self._set_moments()
@@ -200,14 +209,27 @@ class Parameter(object):
         return self.distribution.get_description()
     def get_recurrence_coefficients(self, order=None):
         """
-        Generates the recurrence coefficients.
+        Generates the recurrence coefficients. These are cached: requests for a lower order are served from the cached table, while requests
+        for a higher order grow it geometrically, so that repeated requests for increasing orders only trigger a few computations.
 
         :param Parameter self:
             An instance of the Parameter object.
         :param int order:
-            Order of the recurrence coefficients.
+            Order of the recurrence coefficients. If not provided, the order of the parameter is used.
         """
-        return self.distribution.get_recurrence_coefficients(order)
+        if order is None:
+            order = self.order
+        order = int(order)
+        if (self._recurrence_coefficients is None) or (order > self._recurrence_order):
+            if self._recurrence_coefficients is None:
+                new_order = order
+            else:
+                new_order = max(order, 2 * self._recurrence_order)
+            ab = np.asarray(self.distribution.get_recurrence_coefficients(new_order))
+            self._recurrence_coefficients = ab
+            self._recurrence_order = new_order
+            self._recurrence_rows_offset = len(ab) - new_order
+        return self._recurrence_coefficients[0:order + self._recurrence_rows_offset, :].copy()
     def get_jacobi_eigenvectors(self, order=None):
         """
         Computes the eigenvectors of the Jacobi matrix.
@@ -252,19 +274,10 @@ class Parameter(object):
             JacobiMatrix = ab[0, 0]
         # For everything else~
         else:
-            JacobiMatrix = np.zeros((int(order), int(order))) # allocate space
-            JacobiMatrix[0,0] = ab[0,0]
-            JacobiMatrix[0,1] = np.sqrt(ab[1,1])
-            k = order - 1
-            for u in range(1, int(k)):
-                JacobiMatrix[u,u] = ab[u,0]
-                JacobiMatrix[u,u-1] = np.sqrt(ab[u,1])
-                JacobiMatrix[u,u+1] = np.sqrt(ab[u+1,1])
-
-            JacobiMatrix[order-1, order-1] = ab[order-1,0]
-            JacobiMatrix[order-1, order-2] = np.sqrt(ab[order-1,1])
+            off_diagonal = np.sqrt(ab[1:order, 1])
+            JacobiMatrix = np.diag(ab[0:order, 0]) + np.diag(off_diagonal, 1) + np.diag(off_diagonal, -1)
         return JacobiMatrix
-    def _get_orthogonal_polynomial(self, points, order=None):
+    def _get_orthogonal_polynomial(self, points, order=None, grad_order=2):
         """
         Private function that evaluates the univariate orthogonal polynomial at quadrature points.
 
@@ -274,48 +287,22 @@ class Parameter(object):
             Points at which the orthogonal polynomial must be evaluated.
         :param int order:
             Order up to which the orthogonal polynomial must be obtained.
+        :param int grad_order:
+            The highest derivative required: 0 for the polynomials only, 1 to include their first derivatives and 2 (default) to also
+            include their second derivatives. Derivatives that are not required are returned as None.
+        :return:
+            **orthopoly**: A numpy.ndarray of shape (order + 1, number_of_points) with the values of the orthogonal polynomials.
+
+            **derivative_orthopoly**: A numpy.ndarray of the same shape with their first derivatives (or None).
+
+            **dderivative_orthopoly**: A numpy.ndarray of the same shape with their second derivatives (or None).
         """
         if order is None:
             order = self.order + 1
         else:
             order = order + 1
-        gridPoints = np.asarray(points).copy()
         ab = self.get_recurrence_coefficients(order)
-        if (any(gridPoints) < self.bounds[0]) or (any(gridPoints) > self.bounds[1]):
-            for r in range(0, len(gridPoints)):
-                gridPoints[r] = (gridPoints[r] - self.bounds[0]) / (self.bounds[1] - self.bounds[0])
-
-        orthopoly = np.zeros((order, len(gridPoints)))  # create a matrix full of zeros
-        derivative_orthopoly = np.zeros((order, len(gridPoints)))
-        dderivative_orthopoly = np.zeros((order, len(gridPoints)))
-
-        # Convert the grid points to a numpy array -- simplfy life!
-        gridPointsII = np.zeros((len(gridPoints), 1))
-        for u in range(0, len(gridPoints)):
-            gridPointsII[u, 0] = gridPoints[u]
-        orthopoly[0, :] = 1.0
-
-        # Cases
-        if order == 1:  # CHANGED 2/2/18
-            return orthopoly, derivative_orthopoly, dderivative_orthopoly
-        orthopoly[1, :] = ((gridPointsII[:, 0] - ab[0, 0]) * orthopoly[0, :]) * (1.0) / (1.0 * np.sqrt(ab[1, 1]))
-        derivative_orthopoly[1, :] = orthopoly[0, :] / (np.sqrt(ab[1, 1]))
-        if order == 2:  # CHANGED 2/2/18
-            return orthopoly, derivative_orthopoly, dderivative_orthopoly
-
-        if order >= 3:  # CHANGED 2/2/18
-            for u in range(2, order):  # CHANGED 2/2/18
-                # Three-term recurrence rule in action!
-                orthopoly[u, :] = (((gridPointsII[:, 0] - ab[u - 1, 0]) * orthopoly[u - 1, :]) - np.sqrt(
-                    ab[u - 1, 1]) * orthopoly[u - 2, :]) / (1.0 * np.sqrt(ab[u, 1]))
-            for u in range(2, order):  # CHANGED 2/2/18
-                # Four-term recurrence formula for derivatives of orthogonal polynomials!
-                derivative_orthopoly[u,:] = ( ((gridPointsII[:,0] - ab[u-1,0]) * derivative_orthopoly[u-1,:]) - ( np.sqrt(ab[u-1,1]) * derivative_orthopoly[u-2,:] ) +  orthopoly[u-1,:]   )/(1.0 * np.sqrt(ab[u,1]))
-            for u in range(2,order):
-                # Four-term recurrence formula for second derivatives of orthogonal polynomials!
-                dderivative_orthopoly[u,:] = ( ((gridPointsII[:,0] - ab[u-1,0]) * dderivative_orthopoly[u-1,:]) - ( np.sqrt(ab[u-1,1]) * dderivative_orthopoly[u-2,:] ) +  2.0 * derivative_orthopoly[u-1,:]   )/(1.0 * np.sqrt(ab[u,1]))
-
-        return orthopoly, derivative_orthopoly, dderivative_orthopoly
+        return get_orthogonal_polynomials(points, ab[0:order, :], grad_order)
     def _get_local_quadrature(self, order=None, ab=None):
         """
         Returns the 1D quadrature points and weights for the parameter. WARNING: Should not be called under normal circumstances.
@@ -329,6 +316,25 @@ class Parameter(object):
         :return:
             A 1-by-N matrix that contains the quadrature weights
         """
+        if ab is None:
+            # Rules computed from the parameter's own recurrence coefficients are cached.
+            key = (order, self.order, self.endpoints, self.lower, self.upper)
+            if key not in self._quadrature_rules:
+                self._quadrature_rules[key] = self._get_local_quadrature_rule(order)
+            p, w = self._quadrature_rules[key]
+            return np.array(p), np.array(w)
+        return self._get_local_quadrature_rule(order, ab)
+    def _get_local_quadrature_rule(self, order=None, ab=None):
+        """
+        Private function that computes the 1D quadrature points and weights for the parameter, based on its end-point rule.
+
+        :param Parameter self:
+            An instance of the Parameter class
+        :param int order:
+            Order of the quadrature rule.
+        :param numpy.ndarray ab:
+            Recurrence coefficients to be used instead of those of the parameter.
+        """
         if self.endpoints is None:
             return get_local_quadrature(self, order, ab)
         elif self.endpoints.lower() == 'lower' or self.endpoints.lower() == 'upper':
@@ -337,6 +343,41 @@ class Parameter(object):
             return get_local_quadrature_lobatto(self, order, ab)
         else:
             raise(ValueError, 'Error in endpoints specification.')
+    def _get_nested_quadrature(self, level, growth_rule):
+        """
+        Returns a 1D nested quadrature rule for the parameter. The points at one level are contained in those at the next, and the weights are
+        those of the interpolatory rule for the distribution of the parameter. WARNING: Should not be called under normal circumstances.
+
+        :param Parameter self:
+            An instance of the Parameter class
+        :param int level:
+            Level of the rule, starting at one.
+        :param string growth_rule:
+            The family of nested rules: ``clenshaw-curtis``, ``gauss-patterson`` or ``leja``.
+        :return:
+            A N-by-1 matrix that contains the quadrature points
+        :return:
+            A 1-by-N matrix that contains the quadrature weights
+        """
+        key = ('nested', growth_rule, level, self.lower, self.upper)
+        if key not in self._quadrature_rules:
+            number_of_points = get_nested_rule_size(level, growth_rule)
+            if growth_rule == 'clenshaw-curtis':
+                nodes = get_clenshaw_curtis_nodes(self, number_of_points)
+            else:
+                # Gauss-Patterson and Leja nodes are sequences; each level only appends points to the previous one.
+                nodes = self._nested_nodes.get(growth_rule, np.array([self.get_recurrence_coefficients(1)[0,0]]))
+                while len(nodes) < number_of_points:
+                    if growth_rule == 'gauss-patterson':
+                        nodes = np.hstack([nodes, get_patterson_extension(self, nodes)])
+                    else:
+                        nodes = np.hstack([nodes, get_leja_extension(self, nodes, number_of_points - len(nodes))])
+                self._nested_nodes[growth_rule] = nodes
+                nodes = nodes[0:number_of_points]
+            w = get_interpolatory_weights(self, nodes)
+            self._quadrature_rules[key] = (nodes.reshape((number_of_points, 1)), w)
+        p, w = self._quadrature_rules[key]
+        return np.array(p), np.array(w)
 def get_local_quadrature(self, order=None, ab=None):
     # Check for extra input argument!
     if order is None:
@@ -345,12 +386,10 @@ def get_local_quadrature(self, order=None, ab=None):
         order = order + 1
 
     if ab is None:
-        # Get the recurrence coefficients & the jacobi matrix
-        JacobiMat = self.get_jacobi_matrix(order)
+        # Get the recurrence coefficients
         ab = self.get_recurrence_coefficients(order+1)
     else:
         ab = ab[0:order+1,:]
-        JacobiMat = self.get_jacobi_matrix(order, ab)
     # If statement to handle the case where order = 1
     if order == 1:
         # Check to see whether upper and lower bound are defined:
@@ -360,19 +399,17 @@ def get_local_quadrature(self, order=None, ab=None):
             p = np.asarray((self.upper - self.lower)/(2.0) + self.lower).reshape((1,1))
         w = [1.0]
     else:
-        # Compute eigenvalues & eigenvectors of Jacobi matrix
-        D,V = np.linalg.eig(JacobiMat)
-        V = np.mat(V) # convert to matrix
-        local_points = np.sort(D) # sort by the eigenvalues
-        i = np.argsort(D) # get the sorted indices
-        i = np.array(i) # convert to array
-        w = np.linspace(1,order+1,order) # create space for weights
-        p = np.ones((int(order),1))
-        for u in range(0, len(i) ):
-            w[u] = ab[0,1] * (V[0,i[u]]**2) # replace weights with right value
-            p[u,0] = local_points[u]
-            if (p[u,0] < 1e-16) and (-1e-16 < p[u,0]):
-                p[u,0] = np.abs(p[u,0])
+        # Golub-Welsch: the points are the eigenvalues of the symmetric tridiagonal Jacobi matrix, while the weights
+        # follow from the first component of each of its eigenvectors.
+        local_points, V = eigh_tridiagonal(ab[0:order, 0], np.sqrt(ab[1:order, 1]))
+        w = ab[0,1] * V[0,:]**2
+        if np.max(np.abs(ab[0:order, 0] - ab[0, 0])) <= 1e-12 * np.sqrt(np.max(ab[1:order, 1])):
+            # A constant diagonal (up to round-off) makes the rule symmetric about it; enforce this exactly, so that round-off does not
+            # break ties between mirrored points.
+            local_points = ab[0, 0] + 0.5 * ((local_points - ab[0, 0]) - (local_points[::-1] - ab[0, 0]))
+            w = 0.5 * (w + w[::-1])
+        local_points[np.abs(local_points) < 1e-16] = np.abs(local_points[np.abs(local_points) < 1e-16])
+        p = local_points.reshape((order, 1))
     return p, w
 def get_local_quadrature_radau(self, order=None, ab=None):
     if self.endpoints.lower() == 'lower':
@@ -423,5 +460,139 @@ def get_local_quadrature_lobatto(self, order=None, ab=None):
     ab[N+2, 0] = (endl*p1l*p0r-endr*p1r*p0l)/det
     ab[N+2, 1] = (endr - endl) * p1l * p1r/det
     return get_local_quadrature(self, order=order+2, ab=ab)
+def get_support(self):
+    # Finite bounds of the parameter, or None for an unbounded parameter.
+    lower, upper = self.lower, self.upper
+    if (lower is None) or (upper is None):
+        lower, upper = self.distribution.bounds[0], self.distribution.bounds[1]
+    if np.isinf(lower) or np.isinf(upper):
+        return None
+    return float(lower), float(upper)
+def get_clenshaw_curtis_nodes(self, number_of_points):
+    support = get_support(self)
+    if support is None:
+        raise ValueError('Parameter: Clenshaw-Curtis rules require a bounded parameter; use gauss-patterson or leja instead.')
+    lower, upper = support
+    if number_of_points == 1:
+        return np.array([(lower + upper) / 2.0])
+    # The sine form is exactly symmetric, and gives bitwise identical nodes at every level since the number of intervals is a power of two.
+    n = number_of_points - 1
+    x = np.sin(np.pi * (2.0 * np.arange(0, number_of_points) - n) / (2.0 * n))
+    return (lower + upper) / 2.0 + (upper - lower) / 2.0 * x
+def get_interpolatory_weights(self, nodes):
+    # The weights integrate the orthogonal polynomials up to order N - 1 exactly; their integrals follow from an N-point Gauss rule.
+    N = len(nodes)
+    ab = self.get_recurrence_coefficients(N + 1)
+    if N == 1:
+        return np.array([ab[0,1]])
+    gauss_points, V = eigh_tridiagonal(ab[0:N, 0], np.sqrt(ab[1:N, 1]))
+    gauss_weights = ab[0,1] * V[0,:]**2
+    P = self._get_orthogonal_polynomial(gauss_points, N - 1, grad_order=0)[0]
+    P_nodes = self._get_orthogonal_polynomial(nodes, N - 1, grad_order=0)[0]
+    return np.linalg.solve(P_nodes, np.dot(P, gauss_weights))
+def get_patterson_extension(self, nodes):
+    """
+    Returns the n + 1 points that extend a rule with n points, so that the resulting interpolatory rule has the highest degree of exactness
+    (3n + 1). These are the roots of the polynomial of order n + 1 that is orthogonal to all polynomials of order n with respect to the
+    distribution multiplied by the node polynomial of the existing points. For a uniform distribution, these are the Gauss-Patterson rules.
+    """
+    n = len(nodes)
+    N = n + 1
+    ab = self.get_recurrence_coefficients(2 * N + n + 1)
+    # Gauss rule that integrates the products (of degree 3n + 1) exactly.
+    Q = (3 * n + 2) // 2 + 1
+    gauss_points, V = eigh_tridiagonal(ab[0:Q, 0], np.sqrt(ab[1:Q, 1]))
+    gauss_weights = ab[0,1] * V[0,:]**2
+    scale = np.max(gauss_points) - np.min(gauss_points)
+    node_polynomial = np.prod((gauss_points.reshape(-1, 1) - np.asarray(nodes).reshape(1, -1)) / scale, axis=1)
+    P = self._get_orthogonal_polynomial(gauss_points, N, grad_order=0)[0]
+    M = np.dot(P[0:N, :] * (gauss_weights * node_polynomial), P.T)
+    c = np.linalg.solve(M[:, 0:N], -M[:, N])
+    # Colleague matrix, whose eigenvalues are the roots of p_N + sum_j c_j p_j.
+    T = np.diag(ab[0:N, 0]) + np.diag(np.sqrt(ab[1:N, 1]), 1) + np.diag(np.sqrt(ab[1:N, 1]), -1)
+    T[N-1, :] = T[N-1, :] - np.sqrt(ab[N, 1]) * c
+    roots = np.linalg.eigvals(T)
+    support = get_support(self)
+    if support is None:
+        support = (self.distribution.bounds[0], self.distribution.bounds[1])
+    if np.any(np.abs(np.imag(roots)) > 1e-8 * scale) or np.any(np.real(roots) < support[0]) or np.any(np.real(roots) > support[1]):
+        raise ValueError('Parameter: the Gauss-Patterson extension of the '+str(n)+'-point rule does not exist (or cannot be computed accurately) for this distribution; use a lower level or leja instead.')
+    return np.sort(np.real(roots))
+def get_leja_extension(self, nodes, number_of_points):
+    """
+    Returns the next points of a weighted Leja sequence, i.e., points that successively maximise the product of the distances to the
+    existing points times the square root of the probability density function.
+    """
+    support = get_support(self)
+    if support is None:
+        support = (self.distribution.x_range_for_pdf[0], self.distribution.x_range_for_pdf[-1])
+    candidates = np.linspace(support[0], support[1], LEJA_CANDIDATE_POINTS)
+    def objective(x, existing):
+        x = np.atleast_1d(x)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            value = np.sum(np.log(np.abs(x.reshape(-1, 1) - existing.reshape(1, -1))), axis=1) + 0.5 * np.log(self.get_pdf(x))
+        value[np.isnan(value)] = -np.inf
+        return value
+    new_nodes = []
+    existing = np.asarray(nodes, dtype=float)
+    for i in range(0, number_of_points):
+        j = int(np.argmax(objective(candidates, existing)))
+        a, b = candidates[max(j - 1, 0)], candidates[min(j + 1, LEJA_CANDIDATE_POINTS - 1)]
+        result = minimize_scalar(lambda x: -objective(x, existing)[0], bounds=(a, b), method='bounded', options={'xatol':1e-12 * (support[1] - support[0])})
+        x = result.x if -result.fun >= objective(candidates[j], existing)[0] else candidates[j]
+        new_nodes.append(x)
+        existing = np.hstack([existing, x])
+    return np.array(new_nodes)
 def distribution_error():
     raise(ValueError, 'Please select a valid distribution for your parameter; documentation can be found at www.effective-quadratures.org')
+def get_orthogonal_polynomials(points, ab, grad_order=2):
+    """
+    Evaluates the orthonormal polynomials defined by a set of recurrence coefficients, along with their derivatives, at a set of points. This
+    is used by :meth:`Parameter._get_orthogonal_polynomial`, and by :class:`PolyPredictor`, which only keeps the recurrence coefficients.
+
+    :param numpy.ndarray points:
+        Points at which the orthogonal polynomials must be evaluated.
+    :param numpy.ndarray ab:
+        The recurrence coefficients, with shape (order + 1, 2).
+    :param int grad_order:
+        The highest derivative required: 0, 1 or 2.
+    :return:
+        **orthopoly**: A numpy.ndarray of shape (order + 1, number_of_points) with the values of the orthogonal polynomials.
+
+        **derivative_orthopoly**: A numpy.ndarray of the same shape with their first derivatives (or None).
+
+        **dderivative_orthopoly**: A numpy.ndarray of the same shape with their second derivatives (or None).
+    """
+    order = len(ab)
+    gridPoints = np.asarray(points, dtype=float).reshape(-1)
+    number_of_points = len(gridPoints)
+
+    orthopoly = np.zeros((order, number_of_points))
+    orthopoly[0, :] = 1.0
+    derivative_orthopoly = None
+    dderivative_orthopoly = None
+    if grad_order >= 1:
+        derivative_orthopoly = np.zeros((order, number_of_points))
+    if grad_order >= 2:
+        dderivative_orthopoly = np.zeros((order, number_of_points))
+
+    # Cases
+    if order == 1:
+        return orthopoly, derivative_orthopoly, dderivative_orthopoly
+    sqrt_beta = np.sqrt(ab[0:order, 1])
+    orthopoly[1, :] = (gridPoints - ab[0, 0]) / sqrt_beta[1]
+    if grad_order >= 1:
+        derivative_orthopoly[1, :] = 1.0 / sqrt_beta[1]
+    for u in range(2, order):
+        # Three-term recurrence rule in action!
+        shifted_points = gridPoints - ab[u - 1, 0]
+        orthopoly[u, :] = (shifted_points * orthopoly[u - 1, :] - sqrt_beta[u - 1] * orthopoly[u - 2, :]) / sqrt_beta[u]
+        if grad_order >= 1:
+            # Four-term recurrence formula for derivatives of orthogonal polynomials!
+            derivative_orthopoly[u, :] = (shifted_points * derivative_orthopoly[u - 1, :] - sqrt_beta[u - 1] * derivative_orthopoly[u - 2, :] \
+                + orthopoly[u - 1, :]) / sqrt_beta[u]
+        if grad_order >= 2:
+            # Four-term recurrence formula for second derivatives of orthogonal polynomials!
+            dderivative_orthopoly[u, :] = (shifted_points * dderivative_orthopoly[u - 1, :] - sqrt_beta[u - 1] * dderivative_orthopoly[u - 2, :] \
+                + 2.0 * derivative_orthopoly[u - 1, :]) / sqrt_beta[u]
+    return orthopoly, derivative_orthopoly, dderivative_orthopoly
@@ -1,13 +1,23 @@
 """The polynomial parent class; one of the main building blocks in Effective Quadratures."""
 from equadratures.stats import Statistics
 from equadratures.parameter import Parameter
-from equadratures.basis import Basis
+from equadratures.basis import Basis, get_compact_elements
 from equadratures.solver import Solver
 from equadratures.subsampling import Subsampling
 from equadratures.quadrature import Quadrature
+from equadratures.sampling_methods.sparsegrid import get_sparse_grid_tensor
+from equadratures.cache import ModelCache
+from equadratures.predictor import PolyPredictor, POLYFIT_MEMORY_BUDGET, get_stack_of_points, get_polynomial_contraction, \
+    contract_polynomial, get_basis_gradients, get_basis_hessians
 import scipy.stats as st
 import numpy as np
-from copy import deepcopy
+from copy import copy, deepcopy
+try:
+    from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+    concurrent_futures_imported = True
+except ImportError:
+    concurrent_futures_imported = False
+    pass
 MAXIMUM_ORDER_FOR_STATS = 8
 class Poly(object):
     """
@@ -60,6 +70,8 @@ class Poly(object):
         4. Seshadri, P., Narayan, A., Sankaran M., (2017) Effectively Subsampled Quadratures for Least Squares Polynomial Approximations. SIAM/ASA Journal on Uncertainty Quantification, 5(1). `Paper <https://epubs.siam.org/doi/abs/10.1137/16M1057668>`__
         5. Bos, L., De Marchi, S., Sommariva, A., Vianello, M., (2010) Computing Multivariate Fekete and Leja points by Numerical Linear Algebra. SIAM Journal on Numerical Analysis, 48(5). `Paper <https://epubs.siam.org/doi/abs/10.1137/090779024>`__
         6. Joshi, S., Boyd, S., (2009) Sensor Selection via Convex Optimization. IEEE Transactions on Signal Processing, 57(2). `Paper <https://ieeexplore.ieee.org/document/4663892>`__
+        7. Gerstner, T., Griebel, M., (2003) Dimension-Adaptive Tensor-Product Quadrature. Computing, 71(1), 65-87. `Paper <https://link.springer.com/article/10.1007/s00607-003-0015-5>`__
+        8. Conrad, P. R., Marzouk, Y. M., (2013) Adaptive Smolyak Pseudospectral Approximations. SIAM Journal on Scientific Computing, 35(6). `Paper <https://epubs.siam.org/doi/abs/10.1137/120890715>`__
     """
     def __init__(self, parameters, basis, method=None, sampling_args=None, solver_args=None):
         try:
@@ -84,6 +96,7 @@ class Poly(object):
         self.subsampling_algorithm_name = None
         self.sampling_ratio = 1.0
         self.statistics_object = None
+        self._polyfit_contraction = None
         self.parameters_order = [ parameter.order for parameter in self.parameters]
         self.highest_order = np.max(self.parameters_order)
         if self.method is not None:
@@ -221,8 +234,7 @@ class Poly(object):
         quadrature_points, quadrature_weights = self.quadrature.get_points_and_weights()
         if self.subsampling_algorithm_name is not None:
             P = self.get_poly(quadrature_points)
-            W = np.mat( np.diag(np.sqrt(quadrature_weights)))
-            A = W * P.T
+            A = np.mat( np.sqrt(quadrature_weights).reshape(-1, 1) * P.T )
             self.A = A
             mm, nn = A.shape
             m_refined = int(np.round(self.sampling_ratio * nn))
@@ -233,8 +245,7 @@ class Poly(object):
             self._quadrature_points = quadrature_points
             self._quadrature_weights = quadrature_weights
             P = self.get_poly(quadrature_points)
-            W = np.mat( np.diag(np.sqrt(quadrature_weights)))
-            A = W * P.T
+            A = np.mat( np.sqrt(quadrature_weights).reshape(-1, 1) * P.T )
             self.A = A
     def get_model_evaluations(self):
         """
@@ -349,7 +360,7 @@ class Poly(object):
         """
         self._set_statistics()
         return self.statistics_object.get_conditional_kurtosis(order)
-    def set_model(self, model=None, model_grads=None):
+    def set_model(self, model=None, model_grads=None, batch_size=None, executor=None, cache=None):
         """
         Computes the coefficients of the polynomial via the method selected.
 
@@ -359,12 +370,23 @@ class Poly(object):
             The function that needs to be approximated. In the absence of a callable function, the input can be the function evaluated at the quadrature points.
         :param callable model_grads:
             The gradient of the function that needs to be approximated. In the absence of a callable gradient function, the input can be a matrix of gradient evaluations at the quadrature points.
+        :param int batch_size:
+            If provided, the callables ``model`` and ``model_grads`` are evaluated in batched mode: they are passed blocks of at most ``batch_size`` quadrature
+            points as numpy.ndarrays of shape (batch_size, dimensions) and must return arrays of shape (batch_size, 1) and (batch_size, dimensions) respectively.
+        :param executor:
+            If provided, the model evaluations are spread across workers: ``thread`` for a thread pool, ``process`` for a process pool, or any instance of
+            ``concurrent.futures.Executor``. Quadrature points at which the model fails are reported and treated as NaNs.
+        :param ModelCache cache:
+            If provided, the model is only evaluated at quadrature points that have not been evaluated before. Either an instance of the ModelCache class or
+            the filename of one.
         """
+        if isinstance(cache, str):
+            cache = ModelCache(cache)
         if (model is None) and (self.outputs is not None):
             self._model_evaluations = self.outputs
         else:
             if callable(model):
-                y = evaluate_model(self._quadrature_points, model)
+                y = evaluate_model(self._quadrature_points, model, batch_size, executor, cache)
             else:
                 y = model
                 assert(y.shape[0] == self._quadrature_points.shape[0])
@@ -376,20 +398,197 @@ class Poly(object):
                     grad_values = self.gradients
                 else:
                     if callable(model_grads):
-                        grad_values = evaluate_model_gradients(self._quadrature_points, model_grads, 'matrix')
+                        grad_values = evaluate_model_gradients(self._quadrature_points, model_grads, 'matrix', batch_size, executor, cache)
                     else:
                         grad_values = model_grads
                 p, q = grad_values.shape
-                self._gradient_evaluations = np.zeros((p*q,1))
-                W = np.diag(np.sqrt(self._quadrature_weights))
-                counter = 0
-                for j in range(0,q):
-                    for i in range(0,p):
-                        self._gradient_evaluations[counter] = W[i,i] * grad_values[i,j]
-                        counter = counter + 1
+                # Weight each gradient and stack the columns on top of one another.
+                weighted_grad_values = np.sqrt(self._quadrature_weights).reshape(p, 1) * np.asarray(grad_values)
+                self._gradient_evaluations = np.reshape(weighted_grad_values, (p*q, 1), order='F')
                 del grad_values
         self.statistics_object = None
         self._set_coefficients()
+    def set_model_adaptively(self, model, max_evaluations=None, tolerance=None, batch_size=None, executor=None, cache=None, verbose=False):
+        """
+        Computes the coefficients with a dimension-adaptive sparse grid [7, 8]. Starting from the one-point grid, the level multi-index
+        with the largest error indicator---the norm of the change in the coefficients that its tensor grid brings about---is refined, and
+        all its admissible forward neighbours are added. The model is only evaluated at the nodes that have not been evaluated before; this
+        is most effective with the nested growth rules of :class:`Basis`. The sparse-grid basis should be defined without a ``level``, as the
+        grid of a given level is only replaced.
+
+        :param Poly self:
+            An instance of the Poly class, with a ``sparse-grid`` basis and the ``numerical-integration`` method.
+        :param callable model:
+            The function that needs to be approximated.
+        :param int max_evaluations:
+            The refinement stops once the next refinement would require more than this number of model evaluations.
+        :param float tolerance:
+            The refinement stops once the sum of the error indicators of the level multi-indices that have not been refined is below this value.
+        :param int batch_size:
+            See :meth:`Poly.set_model`.
+        :param executor:
+            See :meth:`Poly.set_model`. All the new nodes of a refinement step are evaluated together.
+        :param ModelCache cache:
+            See :meth:`Poly.set_model`.
+        :param bool verbose:
+            If True, the number of evaluations and the error estimate are printed after each refinement step.
+
+        **Sample usage**::
+
+            basis = Basis('sparse-grid', growth_rule='clenshaw-curtis')
+            poly = Poly(parameters=[param] * 6, basis=basis, method='numerical-integration')
+            poly.set_model_adaptively(model, max_evaluations=500, tolerance=1e-6)
+            print(poly.adaptive_indices, poly.error_estimate)
+        """
+        if self.mesh != 'sparse-grid':
+            raise ValueError('Poly: adaptive refinement requires a sparse-grid basis with the numerical-integration method.')
+        if (max_evaluations is None) and (tolerance is None):
+            raise ValueError('Poly: please provide max_evaluations, tolerance, or both.')
+        if (max_evaluations is not None) and (max_evaluations < 1):
+            raise ValueError('Poly: max_evaluations must be at least one.')
+        if isinstance(cache, str):
+            cache = ModelCache(cache)
+        growth_rule = self.basis.growth_rule
+        unit = np.eye(self.dimensions, dtype=int)
+        node_index = {}
+        node_points = []
+        evaluations = np.zeros((0, 1))
+        tensors = {}
+        tensor_rows = {}
+        projections = {}
+        refined = set()
+        indicators = {}
+        candidates = [tuple([0] * self.dimensions)]
+        out_of_budget = False
+        while True:
+            # Only the nodes of the candidate tensor grids that have not been seen before are evaluated, all in one go.
+            accepted = []
+            for index in candidates:
+                tensor = get_sparse_grid_tensor(self.parameters, index, growth_rule, adaptive=True)
+                new_nodes = set(node for node in map(tuple, tensor.points.tolist()) if node not in node_index)
+                if (max_evaluations is not None) and (len(node_index) + len(new_nodes) > max_evaluations):
+                    out_of_budget = True
+                    continue
+                for node in map(tuple, tensor.points.tolist()):
+                    if node not in node_index:
+                        node_index[node] = len(node_index)
+                        node_points.append(node)
+                tensors[index] = tensor
+                tensor_rows[index] = np.array([node_index[node] for node in map(tuple, tensor.points.tolist())], dtype=int)
+                accepted.append(index)
+            if len(node_points) > len(evaluations):
+                y = evaluate_model(np.array(node_points[len(evaluations):]), model, batch_size, executor, cache)
+                evaluations = np.vstack([evaluations, y])
+            for index in accepted:
+                projections[index] = self._get_tensor_projection(tensors[index], evaluations[tensor_rows[index]])
+                indicators[index] = self._get_surplus_norm(index, projections)
+            error_estimate = np.sum(list(indicators.values()))
+            if verbose:
+                print('Adaptive sparse grid: '+str(len(node_index))+' evaluations, '+str(len(tensors))+' tensor grids, error estimate '+str(error_estimate)+'.')
+            if (not indicators) or ((tolerance is not None) and (error_estimate < tolerance)) or out_of_budget:
+                break
+            # Refine the level multi-index with the largest indicator, and add its admissible forward neighbours.
+            index = max(indicators, key=indicators.get)
+            del indicators[index]
+            refined.add(index)
+            candidates = []
+            for j in range(0, self.dimensions):
+                neighbour = tuple(np.array(index) + unit[j])
+                if all(tuple(np.array(neighbour) - unit[i]) in refined for i in range(0, self.dimensions) if neighbour[i] > 0):
+                    candidates.append(neighbour)
+        self.adaptive_indices = np.array(list(tensors.keys()), dtype=int)
+        self.error_estimate = error_estimate
+        self._set_adaptive_quadrature(tensors, tensor_rows, np.array(node_points), evaluations)
+    def _get_tensor_projection(self, tensor, evaluations):
+        """
+        Private function that returns the pseudospectral projection of the model onto the basis of a tensor grid, as a dict of coefficients
+        keyed by multi-index.
+
+        :param Poly self:
+            An instance of the Poly class.
+        :param Tensorgrid tensor:
+            The tensor grid.
+        :param numpy.ndarray evaluations:
+            The model evaluations at the points of the tensor grid, with shape (number_of_points, 1).
+        """
+        P = self.get_poly(tensor.points, tensor.basis.elements)
+        coefficients = np.dot(P, tensor.weights.reshape(-1, 1) * evaluations).reshape(-1)
+        return dict(zip(map(tuple, tensor.basis.elements.tolist()), coefficients))
+    def _get_surplus_norm(self, index, projections):
+        """
+        Private function that returns the norm of the surplus of a level multi-index, i.e., of the change in the coefficients brought about by
+        adding it to a downward closed set of level multi-indices.
+
+        :param Poly self:
+            An instance of the Poly class.
+        :param tuple index:
+            The level multi-index.
+        :param dict projections:
+            The projections of the tensor grids, keyed by level multi-index.
+        """
+        surplus = {}
+        nonzero = [j for j in range(0, self.dimensions) if index[j] > 0]
+        for k in range(0, 2**len(nonzero)):
+            shift = np.zeros(self.dimensions, dtype=int)
+            for bit, j in enumerate(nonzero):
+                shift[j] = (k >> bit) & 1
+            sign = (-1.0)**np.sum(shift)
+            for multi_index, coefficient in projections[tuple(np.array(index) - shift)].items():
+                surplus[multi_index] = surplus.get(multi_index, 0.0) + sign * coefficient
+        return np.sqrt(np.sum(np.array(list(surplus.values()))**2))
+    def _set_adaptive_quadrature(self, tensors, tensor_rows, points, evaluations):
+        """
+        Private function that sets the sparse grid from a downward closed set of level multi-indices, and computes the coefficients.
+
+        :param Poly self:
+            An instance of the Poly class.
+        :param dict tensors:
+            The tensor grids, keyed by level multi-index.
+        :param dict tensor_rows:
+            The rows of the points of each tensor grid in ``points``, keyed by level multi-index.
+        :param numpy.ndarray points:
+            The points at which the model was evaluated.
+        :param numpy.ndarray evaluations:
+            The corresponding model evaluations.
+        """
+        unit = np.eye(self.dimensions, dtype=int)
+        # Combination coefficients of the Smolyak formula for a downward closed set of level multi-indices.
+        indices = list(tensors.keys())
+        factors = {}
+        for index in indices:
+            # Since the set is downward closed, only the directions of the forward neighbours in the set contribute.
+            forward = [j for j in range(0, self.dimensions) if tuple(np.array(index) + unit[j]) in tensors]
+            factor = 0.0
+            for k in range(0, 2**len(forward)):
+                shift = np.zeros(self.dimensions, dtype=int)
+                for bit, j in enumerate(forward):
+                    shift[j] = (k >> bit) & 1
+                if tuple(np.array(index) + shift) in tensors:
+                    factor = factor + (-1.0)**np.sum(shift)
+            factors[index] = factor
+        indices = [index for index in indices if factors[index] != 0.0]
+        # Sort the nodes lexicographically, as for the isotropic sparse grids.
+        order = np.lexsort(points.T[::-1])
+        rank = np.empty(len(order), dtype=int)
+        rank[order] = np.arange(len(order))
+        weights = np.zeros(len(points))
+        for index in indices:
+            np.add.at(weights, rank[tensor_rows[index]], factors[index] * tensors[index].weights)
+        samples = self.quadrature.samples
+        samples.points = points[order, :]
+        samples.weights = weights
+        samples.tensor_product_list = [tensors[index] for index in indices]
+        samples.tensor_indices = [rank[tensor_rows[index]] for index in indices]
+        samples.sparse_weights = [factors[index] for index in indices]
+        samples.sparse_indices = np.array([tensors[index].basis.orders for index in indices])
+        self.quadrature.list = samples.tensor_product_list
+        self.quadrature.tensor_indices = samples.tensor_indices
+        self.quadrature.sparse_weights = samples.sparse_weights
+        self._quadrature_points = samples.points
+        self._quadrature_weights = samples.weights
+        self._model_evaluations = evaluations[order, :]
+        self.statistics_object = None
+        self._set_coefficients()
     def _set_coefficients(self, user_defined_coefficients=None):
         """
         Computes the polynomial approximation coefficients.
@@ -421,33 +620,25 @@ class Poly(object):
             self._set_points_and_weights()
             self.set_model(self.outputs)
         if self.mesh == 'sparse-grid':
-            counter = 0
-            multi_index = []
-            coefficients = np.empty([1])
-            multindices = np.empty([1, self.dimensions])
-            for tensor in self.quadrature.list:
+            coefficients = []
+            multindices = []
+            for counter, tensor in enumerate(self.quadrature.list):
                 P = self.get_poly(tensor.points, tensor.basis.elements)
-                W = np.diag(np.sqrt(tensor.weights))
-                A = np.dot(W , P.T)
-                _, _ , counts = np.unique( np.vstack( [tensor.points, self._quadrature_points]), axis=0, return_index=True, return_counts=True)
-                indices = [i for i in range(0, len(counts)) if  counts[i] == 2]
-                b = np.dot(W , self._model_evaluations[indices])
-                del counts, indices
+                # The square roots of the weights are signed on the right-hand side, as nested rules may have negative weights.
+                sqrt_weights = np.sqrt(np.abs(tensor.weights)).reshape(-1, 1)
+                A = sqrt_weights * P.T
+                b = np.sign(tensor.weights).reshape(-1, 1) * sqrt_weights * self._model_evaluations[self.quadrature.tensor_indices[counter]]
                 coefficients_i = self.solver(A, b)  * self.quadrature.sparse_weights[counter]
-                multindices_i =  tensor.basis.elements
-                coefficients = np.vstack([coefficients_i, coefficients])
-                multindices = np.vstack([multindices_i, multindices])
-                counter = counter +  1
-            multindices = np.delete(multindices, multindices.shape[0]-1, 0)
-            coefficients = np.delete(coefficients, coefficients.shape[0]-1)
-            unique_indices, indices , counts = np.unique(multindices, axis=0, return_index=True, return_counts=True)
+                coefficients.append(np.ravel(coefficients_i))
+                multindices.append(tensor.basis.elements)
+            # Contributions are summed in reverse tensor order, as they were when each tensor was stacked on top.
+            coefficients = np.hstack(coefficients[::-1])
+            multindices = np.vstack(multindices[::-1])
+            unique_indices, inverse = np.unique(multindices, axis=0, return_inverse=True)
             coefficients_final = np.zeros((unique_indices.shape[0], 1))
-            for i in range(0, unique_indices.shape[0]):
-                for j in range(0, multindices.shape[0]):
-                    if np.array_equiv( unique_indices[i,:] , multindices[j,:]):
-                        coefficients_final[i] = coefficients_final[i] + coefficients[j]
+            np.add.at(coefficients_final[:,0], np.ravel(inverse), coefficients)
             self.coefficients = coefficients_final
-            self.basis.elements = unique_indices
+            self.basis.set_elements(unique_indices)
         else:
             P = self.get_poly(self._quadrature_points)
             W = np.diag(np.sqrt(self._quadrature_weights))
@@ -520,19 +711,127 @@ class Poly(object):
             **w**: A numpy.ndarray of the corresponding quadrature weights with shape (number_of_samples, 1).
         """
         return self._quadrature_points, self._quadrature_weights
-    def get_polyfit(self, stack_of_points):
+    def get_polyfit(self, stack_of_points, memory_budget=POLYFIT_MEMORY_BUDGET):
         """
         Evaluates the the polynomial approximation of a function (or model data) at prescribed points.
 
+        The points are streamed in chunks, and the polynomial is contracted one dimension at a time: the coefficients are multiplied by the
+        univariate polynomials of the last dimension and summed over the multi-indices that only differ along it, and so on. The matrix of
+        all the basis functions evaluated at all the points is thus never formed, and the memory stays within the budget, however many
+        points there are.
+
         :param Poly self:
             An instance of the Poly class.
         :param numpy.ndarray stack_of_points:
             An ndarray with shape (number_of_observations, dimensions) at which the polynomial fit must be evaluated at.
+        :param int memory_budget:
+            The approximate memory, in bytes, used for the intermediate arrays of each chunk of points.
+        :return:
+            **p**: A numpy.ndarray of shape (number_of_observations, 1) corresponding to the polynomial approximation of the model.
+        """
+        stack_of_points = get_stack_of_points(stack_of_points, self.basis.elements.shape[1])
+        no_of_points = stack_of_points.shape[0]
+        coefficients, levels = self._get_polyfit_contraction()
+        # Each chunk holds two arrays of shape (cardinality, chunk_size) at most.
+        chunk_size = max(1, int(memory_budget) // (16 * len(coefficients)))
+        polyfit = np.empty((no_of_points, 1))
+        for start in range(0, no_of_points, chunk_size):
+            points = stack_of_points[start:start + chunk_size, :]
+            polyfit[start:start + chunk_size, 0] = contract_polynomial(coefficients, levels, self._get_univariate_polynomials(points, 0))
+        return polyfit
+    def _get_polyfit_contraction(self):
+        """
+        Private function that returns the coefficients sorted lexicographically by multi-index, along with the contraction levels of
+        :func:`get_polynomial_contraction`. These are kept until the elements of the basis are replaced.
+        """
+        basis = self.basis.elements
+        if (self._polyfit_contraction is None) or (self._polyfit_contraction[0] is not basis):
+            order, levels = get_polynomial_contraction(basis)
+            self._polyfit_contraction = (basis, order, levels)
+        _, order, levels = self._polyfit_contraction
+        return np.ravel(self.coefficients)[order], levels
+    def _get_univariate_polynomials(self, stack_of_points, grad_order):
+        """
+        Private function that evaluates, along each dimension, the univariate orthogonal polynomials (and their derivatives up to grad_order)
+        up to the highest order of the basis along that dimension.
+        """
+        basis = self.basis.elements
+        return [self.parameters[k]._get_orthogonal_polynomial(stack_of_points[:, k], int(np.max(basis[:, k])), grad_order=grad_order) \
+                for k in range(0, basis.shape[1])]
+    def get_predictor(self):
+        """
+        Exports the polynomial approximation as a :class:`PolyPredictor`: a small, self-contained and picklable object that evaluates it,
+        along with its gradient and Hessian, from frozen copies of the coefficients, of the multi-indices with non-zero coefficients and of
+        the recurrence coefficients of the parameters. Unlike the callables of :meth:`get_polyfit_function`, it can be sent to worker
+        processes, and it does not change if the Poly is refitted.
+
+        :param Poly self:
+            An instance of the Poly class.
+        :return:
+            **predictor**: An instance of the PolyPredictor class.
+        """
+        coefficients = np.ravel(self.coefficients)
+        keep = np.flatnonzero(coefficients != 0.0)
+        if len(keep) == 0:
+            keep = np.array([0])
+        elements = self.basis.elements[keep, :]
+        recurrence_coefficients = []
+        for k in range(0, self.dimensions):
+            order = int(np.max(elements[:, k])) + 1
+            recurrence_coefficients.append(np.array(self.parameters[k].get_recurrence_coefficients(order)[0:order, :]))
+        return PolyPredictor(coefficients[keep], elements, recurrence_coefficients)
+    def get_pruned_poly(self, threshold=None, energy_fraction=None):
+        """
+        Returns a reduced copy of the polynomial approximation, whose basis and coefficients only keep its significant terms. After a
+        compressive sensing or least squares fit, most coefficients are often tiny, so the reduced polynomial is much cheaper to evaluate with
+        :meth:`get_polyfit` and the gradient and Hessian routines, while its statistics are computed over the same reduced set. The constant
+        term is always kept, and the remaining terms stay in their original order.
+
+        :param Poly self:
+            An instance of the Poly class.
+        :param float threshold:
+            Terms whose coefficients are smaller than this value in magnitude are dropped.
+        :param float energy_fraction:
+            A number in (0, 1]. Only the terms with the largest coefficients that together account for this fraction of the variance, i.e.,
+            of the sum of the squares of the non-constant coefficients, are kept.
         :return:
-            **p**: A numpy.ndarray of shape (1, number_of_observations) corresponding to the polynomial approximation of the model.
+            **poly**: A new instance of the Poly class. If neither a threshold nor an energy fraction is given, only the terms with zero
+            coefficients are dropped.
+
+        **Sample usage**::
+
+            poly.set_model(model)
+            reduced_poly = poly.get_pruned_poly(energy_fraction=0.9999)
+            predictions = reduced_poly.get_polyfit(points)
         """
-        N = len(self.coefficients)
-        return np.dot(self.get_poly(stack_of_points).T , self.coefficients.reshape(N, 1))
+        coefficients = np.ravel(self.coefficients)
+        elements = self.basis.elements
+        constant = np.all(elements == 0, axis=1)
+        keep = np.ones(len(coefficients), dtype=bool)
+        if threshold is not None:
+            keep &= np.abs(coefficients) >= threshold
+        if energy_fraction is not None:
+            if not (0.0 < energy_fraction <= 1.0):
+                raise ValueError('Poly: energy_fraction must be in (0, 1].')
+            energy = coefficients**2
+            energy[constant] = 0.0
+            largest = np.argsort(-energy, kind='stable')
+            cumulative_energy = np.cumsum(energy[largest])
+            number_of_terms = np.searchsorted(cumulative_energy, energy_fraction * cumulative_energy[-1]) + 1
+            selected = np.zeros(len(coefficients), dtype=bool)
+            selected[largest[0:number_of_terms]] = True
+            keep &= selected
+        if (threshold is None) and (energy_fraction is None):
+            keep &= coefficients != 0.0
+        keep |= constant
+        reduced_poly = copy(self)
+        reduced_poly.basis = deepcopy(self.basis)
+        reduced_poly.basis.set_elements(elements[keep, :])
+        reduced_poly.basis.cardinality = int(np.sum(keep))
+        reduced_poly.coefficients = self.coefficients[keep]
+        reduced_poly.statistics_object = None
+        reduced_poly._polyfit_contraction = None
+        return reduced_poly
     def get_polyfit_grad(self, stack_of_points, dim_index = None):
         """
         Evaluates the gradient of the polynomial approximation of a function (or model data) at prescribed points.
@@ -545,18 +844,24 @@ class Poly(object):
         :return:
             **p**: A numpy.ndarray of shape (dimensions, number_of_observations) corresponding to the polynomial gradient approximation of the model.
         """
-        N = len(self.coefficients)
-        if stack_of_points.ndim == 1:
-            no_of_points = 1
-        else:
-            no_of_points, _ = stack_of_points.shape
-        H = self.get_poly_grad(stack_of_points, dim_index=dim_index)
-        grads = np.zeros((self.dimensions, no_of_points ) )
+        grads = np.einsum('p,vpn->vn', np.ravel(self.coefficients), self._get_poly_grad_tensor(stack_of_points, dim_index))
         if self.dimensions == 1:
-            return np.dot(self.coefficients.reshape(N,),  H)
-        for i in range(0, self.dimensions):
-            grads[i,:] = np.dot(self.coefficients.reshape(N,) , H[i] )
+            return grads[0]
         return grads
+    def get_polyfit_grad_matrix(self, stack_of_points):
+        """
+        Evaluates the gradient of the polynomial approximation of a function (or model data) at prescribed points, with one row per point.
+
+        :param Poly self:
+            An instance of the Poly class.
+        :param numpy.ndarray stack_of_points:
+            An ndarray with shape (number_of_observations, dimensions) at which the polynomial fit approximation's
+            gradient must be evaluated at.
+        :return:
+            **g**: A numpy.ndarray of shape (number_of_observations, dimensions) corresponding to the polynomial gradient approximation of the
+            model, in the same format as :func:`evaluate_model_gradients` with ``matrix``.
+        """
+        return np.einsum('p,vpn->nv', np.ravel(self.coefficients), self._get_poly_grad_tensor(stack_of_points))
     def get_polyfit_hess(self, stack_of_points):
         """
         Evaluates the hessian of the polynomial approximation of a function (or model data) at prescribed points.
@@ -569,18 +874,8 @@ class Poly(object):
         :return:
             **h**: A numpy.ndarray of shape (dimensions, dimensions, number_of_observations) corresponding to the polynomial Hessian approximation of the model.
         """
-        if stack_of_points.ndim == 1:
-            no_of_points = 1
-        else:
-            no_of_points, _ = stack_of_points.shape
         H = self.get_poly_hess(stack_of_points)
-        if self.dimensions == 1:
-            return np.dot(self.coefficients.T , H)
-        hess = np.zeros((self.dimensions, self.dimensions, no_of_points))
-        for i in range(0, self.dimensions):
-            for j in range(0, self.dimensions):
-                hess[i, j, :] = np.dot(self.coefficients.T , H[i * self.dimensions + j])
-        return hess
+        return np.einsum('p,ijpn->ijn', np.ravel(self.coefficients), H)
     def get_polyfit_function(self):
         """
         Returns a callable polynomial approximation of a function (or model data).
@@ -590,8 +885,7 @@ class Poly(object):
         :return:
             A callable function.
         """
-        N = len(self.coefficients)
-        return lambda x: np.dot( self.get_poly(x).T ,  self.coefficients.reshape(N, 1) )
+        return lambda x: self.get_polyfit(x)
     def get_polyfit_grad_function(self):
         """
         Returns a callable for the gradients of the polynomial approximation of a function (or model data).
@@ -628,7 +922,7 @@ class Poly(object):
         if custom_multi_index is None:
             basis = self.basis.elements
         else:
-            basis = custom_multi_index
+            basis = get_compact_elements(custom_multi_index)
         basis_entries, dimensions = basis.shape
 
         if stack_of_points.ndim == 1:
@@ -639,19 +933,18 @@ class Poly(object):
 
         # Save time by returning if univariate!
         if dimensions == 1:
-            poly , _ , _ =  self.parameters[0]._get_orthogonal_polynomial(stack_of_points, int(np.max(basis)))
+            poly , _ , _ =  self.parameters[0]._get_orthogonal_polynomial(stack_of_points, int(np.max(basis)), grad_order=0)
             return poly
         else:
             for i in range(0, dimensions):
                 if len(stack_of_points.shape) == 1:
                     stack_of_points = np.array([stack_of_points])
-                p[i] , _ , _ = self.parameters[i]._get_orthogonal_polynomial(stack_of_points[:,i], int(np.max(basis[:,i])) )
+                p[i] , _ , _ = self.parameters[i]._get_orthogonal_polynomial(stack_of_points[:,i], int(np.max(basis[:,i])), grad_order=0)
 
         # One loop for polynomials
         polynomial = np.ones((basis_entries, no_of_points))
         for k in range(dimensions):
-            basis_entries_this_dim = basis[:, k].astype(int)
-            polynomial *= p[k][basis_entries_this_dim]
+            polynomial *= p[k][basis[:, k]]
         return polynomial
     def get_poly_grad(self, stack_of_points, dim_index = None):
         """
@@ -667,47 +960,24 @@ class Poly(object):
             **Gradients**: A list with d elements, where d corresponds to the dimension of the problem. Each element is a numpy.ndarray of shape
             (cardinality, number_of_observations) corresponding to the gradient polynomial evaluations at the stack_of_points.
         """
-        # "Unpack" parameters from "self"
-        basis = self.basis.elements
-        basis_entries, dimensions = basis.shape
-        if len(stack_of_points.shape) == 1:
-            if dimensions == 1:
-                # a 1d array of inputs, and each input is 1d
-                stack_of_points = np.reshape(stack_of_points, (len(stack_of_points),1))
-            else:
-                # a 1d array representing 1 point, in multiple dimensions!
-                stack_of_points = np.array([stack_of_points])
-        no_of_points, _ = stack_of_points.shape
-        p = {}
-        dp = {}
-
-        # Save time by returning if univariate!
-        if dimensions == 1:
-            _ , dpoly, _ =  self.parameters[0]._get_orthogonal_polynomial(stack_of_points, int(np.max(basis) ) )
-            return dpoly
-        else:
-            for i in range(0, dimensions):
-                if len(stack_of_points.shape) == 1:
-                    stack_of_points = np.array([stack_of_points])
-                p[i] , dp[i], _ = self.parameters[i]._get_orthogonal_polynomial(stack_of_points[:,i], int(np.max(basis[:,i])) )
+        G = self._get_poly_grad_tensor(stack_of_points, dim_index)
+        if self.basis.elements.shape[1] == 1:
+            return G[0]
+        return list(G)
+    def _get_poly_grad_tensor(self, stack_of_points, dim_index=None):
+        """
+        Private function that evaluates the gradients of the polynomial basis functions as one numpy.ndarray of shape
+        (dimensions, cardinality, number_of_observations), with :func:`get_basis_gradients`.
 
-        # One loop for polynomials
-        R = []
-        if dim_index is None:
-            dim_index = range(dimensions)
-        for v in range(dimensions):
-            if not(v in dim_index):
-                R.append(np.zeros((basis_entries, no_of_points)))
-            else:
-                polynomialgradient = np.ones((basis_entries, no_of_points))
-                for k in range(dimensions):
-                    basis_entries_this_dim = basis[:,k].astype(int)
-                    if k==v:
-                        polynomialgradient *= dp[k][basis_entries_this_dim]
-                    else:
-                        polynomialgradient *= p[k][basis_entries_this_dim]
-                R.append(polynomialgradient)
-        return R
+        :param Poly self:
+            An instance of the Poly class.
+        :param numpy.ndarray stack_of_points:
+            An ndarray with shape (number_of_observations, dimensions) at which the gradient must be evaluated.
+        :param list dim_index:
+            The dimensions along which the gradient is required; the other ones are set to zero. By default, all dimensions.
+        """
+        stack_of_points = get_stack_of_points(stack_of_points, self.basis.elements.shape[1])
+        return get_basis_gradients(self.basis.elements, self._get_univariate_polynomials(stack_of_points, 1), dim_index)
     def get_poly_hess(self, stack_of_points):
         """
         Evaluates the Hessian for each of the polynomial basis functions at a set of points,
@@ -719,53 +989,14 @@ class Poly(object):
             An ndarray with shape (number_of_observations, dimensions) at which the Hessian must be evaluated.
 
         :return:
-            **Hessian**: A list with d^2 elements, where d corresponds to the dimension of the model. Each element is a numpy.ndarray of shape
-            (cardinality, number_of_observations) corresponding to the hessian polynomial evaluations at the stack_of_points.
+            **Hessian**: A numpy.ndarray of shape (dimensions, dimensions, cardinality, number_of_observations), where the entry [i, j] holds
+            the second derivatives of the polynomial basis functions with respect to the i-th and j-th input variables, evaluated at the
+            stack_of_points.
 
         """
-        # "Unpack" parameters from "self"
-        basis = self.basis.elements
-        basis_entries, dimensions = basis.shape
-        if stack_of_points.ndim == 1:
-            no_of_points = 1
-        else:
-            no_of_points, _ = stack_of_points.shape
-        p = {}
-        dp = {}
-        d2p = {}
-
-        # Save time by returning if univariate!
-        if dimensions == 1:
-            _, _, d2poly = self.parameters[0]._get_orthogonal_polynomial(stack_of_points, int(np.max(basis)))
-            return d2poly
-        else:
-            for i in range(0, dimensions):
-                if len(stack_of_points.shape) == 1:
-                    stack_of_points = np.array([stack_of_points])
-                p[i], dp[i], d2p[i] = self.parameters[i]._get_orthogonal_polynomial(stack_of_points[:, i],
-                                                                       int(np.max(basis[:, i]) + 1))
-        H = []
-        for w in range(0, dimensions):
-            gradDirection1 = w
-            for v in range(0, dimensions):
-                gradDirection2 = v
-                polynomialhessian = np.zeros((basis_entries, no_of_points))
-                for i in range(0, basis_entries):
-                    temp = np.ones((1, no_of_points))
-                    for k in range(0, dimensions):
-                        if k == gradDirection1 == gradDirection2:
-                            polynomialhessian[i, :] = d2p[k][int(basis[i, k])] * temp
-                        elif k == gradDirection1:
-                            polynomialhessian[i, :] = dp[k][int(basis[i, k])] * temp
-                        elif k == gradDirection2:
-                            polynomialhessian[i, :] = dp[k][int(basis[i, k])] * temp
-                        else:
-                            polynomialhessian[i, :] = p[k][int(basis[i, k])] * temp
-                        temp = polynomialhessian[i, :]
-                H.append(polynomialhessian)
-
-        return H
-def evaluate_model_gradients(points, fungrad, format):
+        stack_of_points = get_stack_of_points(stack_of_points, self.basis.elements.shape[1])
+        return get_basis_hessians(self.basis.elements, self._get_univariate_polynomials(stack_of_points, 2))
+def evaluate_model_gradients(points, fungrad, format, batch_size=None, executor=None, cache=None):
     """
     Evaluates the model gradient at given values.
 
@@ -777,34 +1008,39 @@ def evaluate_model_gradients(points, fungrad, format):
         The format in which the output is to be provided: ``matrix`` will output a numpy.ndarray of shape
         (number_of_observations, dimensions) with gradient values, while ``vector`` will stack all the
         vectors in this matrix to yield a numpy.ndarray with shape (number_of_observations x dimensions, 1).
+    :param int batch_size:
+        If provided, ``fungrad`` is called with blocks of at most ``batch_size`` points, i.e., with numpy.ndarrays of shape
+        (batch_size, dimensions), and must return the gradients as an array of shape (batch_size, dimensions). By default
+        ``fungrad`` is called once per point.
+    :param executor:
+        If provided, the gradient evaluations are spread across workers; see :func:`evaluate_model`.
+    :param ModelCache cache:
+        If provided, gradients previously stored in the cache are reused; see :func:`evaluate_model`.
 
     :return:
         **grad_values**: A numpy.ndarray of gradient evaluations.
 
     """
     dimensions = len(points[0,:])
-    if format is 'matrix':
+    if cache is not None:
+        grad_values = _evaluate_with_cache(points, lambda x: evaluate_model_gradients(x, fungrad, 'matrix', batch_size, executor), \
+                        cache, cache.get_model_id(fungrad) + ':gradients')
+    elif executor is not None:
+        grad_values = _evaluate_with_executor(points, fungrad, batch_size, dimensions, executor)
+    elif batch_size is not None:
+        grad_values = _evaluate_in_batches(points, fungrad, batch_size, dimensions)
+    else:
         grad_values = np.zeros((len(points), dimensions))
         # For loop through all the points
         for i in range(0, len(points)):
-            output_from_gradient_call = fungrad(points[i,:])
-            for j in range(0, dimensions):
-                grad_values[i,j] = output_from_gradient_call[j]
+            grad_values[i,:] = np.reshape(fungrad(points[i,:]), (dimensions,))
+    if format == 'matrix':
         return grad_values
-    elif format is 'vector':
-        grad_values = np.zeros((len(points) * dimensions, 1))
-        # For loop through all the points
-        counter = 0
-        for i in range(0, len(points)):
-            output_from_gradient_call = fungrad(points[i,:])
-            for j in range(0, dimensions):
-                grad_values[counter, 0] = output_from_gradient_call[j]
-                counter = counter + 1
-        return np.mat(grad_values)
+    elif format == 'vector':
+        return np.mat(np.reshape(grad_values, (len(points) * dimensions, 1)))
     else:
-        error_function('evalgradients(): Format must be either matrix or vector!')
-        return 0
-def evaluate_model(points, function):
+        raise ValueError('evaluate_model_gradients(): Format must be either matrix or vector!')
+def evaluate_model(points, function, batch_size=None, executor=None, cache=None):
     """
     Evaluates the model function at given values.
 
@@ -812,14 +1048,145 @@ def evaluate_model(points, function):
         An ndarray with shape (number_of_observations, dimensions) at which the gradient must be evaluated.
     :param callable function:
         A callable argument for the function.
+    :param int batch_size:
+        If provided, ``function`` is called with blocks of at most ``batch_size`` points, i.e., with numpy.ndarrays of shape
+        (batch_size, dimensions), and must return an array with batch_size values. This is considerably faster for models
+        that are vectorised over their inputs. By default ``function`` is called once per point.
+    :param executor:
+        If provided, the model evaluations (or batches thereof) are spread across workers. Options include ``thread``,
+        ``process`` or any instance of ``concurrent.futures.Executor``. Results are returned in the order of ``points``;
+        points at which the model raises an exception are reported and set to NaN, so that they are subsequently
+        ignored when computing the coefficients. For ``process``, ``function`` must be picklable.
+    :param ModelCache cache:
+        If provided, the model is only evaluated at points that are not already stored in the cache; the new evaluations are
+        then added to the cache (and written to file, if the cache has one).
 
     :return:
         **function_values**: A numpy.ndarray of function evaluations.
     """
+    if cache is not None:
+        return _evaluate_with_cache(points, lambda x: evaluate_model(x, function, batch_size, executor), \
+                        cache, cache.get_model_id(function))
+    if executor is not None:
+        return _evaluate_with_executor(points, function, batch_size, 1, executor)
+    if batch_size is not None:
+        return _evaluate_in_batches(points, function, batch_size, 1)
     function_values = np.zeros((len(points), 1))
     for i in range(0, len(points)):
         function_values[i,0] = function(points[i,:])
     return function_values
+def _evaluate_in_batches(points, function, batch_size, number_of_outputs):
+    """
+    Private function that evaluates a vectorised callable over consecutive blocks of points.
+
+    :param numpy.ndarray points:
+        An ndarray with shape (number_of_observations, dimensions).
+    :param callable function:
+        A callable that takes an ndarray of shape (number_of_points_in_block, dimensions).
+    :param int batch_size:
+        The maximum number of points passed to each call.
+    :param int number_of_outputs:
+        The number of values returned per point.
+    :return:
+        A numpy.ndarray of shape (number_of_observations, number_of_outputs).
+    """
+    batch_size = int(batch_size)
+    if batch_size < 1:
+        raise ValueError('batch_size must be a positive integer.')
+    points = np.asarray(points)
+    number_of_points = len(points)
+    values = np.zeros((number_of_points, number_of_outputs))
+    for start in range(0, number_of_points, batch_size):
+        stop = min(start + batch_size, number_of_points)
+        values[start:stop, :] = np.reshape(function(points[start:stop, :]), (stop - start, number_of_outputs))
+    return values
+def _evaluate_with_cache(points, evaluate, cache, model_id):
+    """
+    Private function that evaluates a model only at the points that are not already stored in a cache.
+
+    :param numpy.ndarray points:
+        An ndarray with shape (number_of_observations, dimensions).
+    :param callable evaluate:
+        A callable that takes an ndarray of points and returns a numpy.ndarray of shape (number_of_points, number_of_outputs).
+    :param ModelCache cache:
+        An instance of the ModelCache class.
+    :param str model_id:
+        The identifier under which the evaluations are stored.
+    :return:
+        A numpy.ndarray of shape (number_of_observations, number_of_outputs).
+    """
+    points = np.asarray(points)
+    values, found = cache.lookup(points, model_id)
+    if np.all(found):
+        return values
+    new_values = evaluate(points[~found, :])
+    if values is None:
+        values = np.zeros((len(points), new_values.shape[1]))
+    values[~found, :] = new_values
+    cache.add(points[~found, :], new_values, model_id)
+    cache.save()
+    return values
+def _evaluate_with_executor(points, function, batch_size, number_of_outputs, executor):
+    """
+    Private function that evaluates a callable at each point (or each block of points) using a pool of workers.
+
+    :param numpy.ndarray points:
+        An ndarray with shape (number_of_observations, dimensions).
+    :param callable function:
+        The callable to be evaluated.
+    :param int batch_size:
+        If None, ``function`` is called with one point at a time; otherwise with blocks of at most ``batch_size`` points.
+    :param int number_of_outputs:
+        The number of values returned per point.
+    :param executor:
+        Either ``thread``, ``process`` or an instance of ``concurrent.futures.Executor``.
+    :return:
+        A numpy.ndarray of shape (number_of_observations, number_of_outputs), with NaNs in the rows that failed.
+    """
+    points = np.asarray(points)
+    number_of_points = len(points)
+    if batch_size is None:
+        blocks = [(i, i+1) for i in range(0, number_of_points)]
+    else:
+        batch_size = int(batch_size)
+        if batch_size < 1:
+            raise ValueError('batch_size must be a positive integer.')
+        blocks = [(start, min(start + batch_size, number_of_points)) for start in range(0, number_of_points, batch_size)]
+    if not concurrent_futures_imported:
+        raise ValueError('Evaluating the model with an executor requires concurrent.futures, which is available from Python 3.2 onwards; on Python 2.7, install the futures backport.')
+    shutdown_executor = False
+    if isinstance(executor, str):
+        if executor.lower() == 'thread':
+            executor = ThreadPoolExecutor()
+        elif executor.lower() == 'process':
+            executor = ProcessPoolExecutor()
+        else:
+            raise ValueError('executor must be one of: thread, process or an instance of concurrent.futures.Executor.')
+        shutdown_executor = True
+    elif not isinstance(executor, Executor):
+        raise ValueError('executor must be one of: thread, process or an instance of concurrent.futures.Executor.')
+    try:
+        if batch_size is None:
+            futures = [executor.submit(function, points[start,:]) for start, _ in blocks]
+        else:
+            futures = [executor.submit(function, points[start:stop,:]) for start, stop in blocks]
+        values = np.full((number_of_points, number_of_outputs), np.nan)
+        failures = 0
+        for (start, stop), future in zip(blocks, futures):
+            try:
+                values[start:stop, :] = np.reshape(future.result(), (stop - start, number_of_outputs))
+            except Exception as error:
+                if stop - start == 1:
+                    print('WARNING: Model evaluation at point '+str(start)+' failed with: '+repr(error))
+                else:
+                    print('WARNING: Model evaluation at points '+str(start)+' to '+str(stop - 1)+' failed with: '+repr(error))
+                failures = failures + stop - start
+    finally:
+        if shutdown_executor:
+            executor.shutdown()
+    if failures > 0:
+        print('WARNING: '+str(failures)+' out of '+str(number_of_points)+' model evaluations failed; these have been set to NaN.')
+    return values
 def vector_to_2D_grid(coefficients, index_set):
     """
     Handy function that converts a vector of coefficients into a matrix based on index set values.
@@ -0,0 +1,183 @@
+"""Frozen, picklable evaluation of polynomial approximations."""
+import numpy as np
+from scipy.sparse import csr_matrix
+from equadratures.parameter import get_orthogonal_polynomials
+from equadratures.basis import get_compact_elements
+POLYFIT_MEMORY_BUDGET = 2**24 # bytes
+
+class PolyPredictor(object):
+    """
+    A frozen polynomial approximation, which evaluates the fit of a :class:`Poly`, along with its gradient and Hessian, from a few numpy
+    arrays: the coefficients, the multi-indices with non-zero coefficients, and the recurrence coefficients of each parameter.
+    It holds no reference to the Poly, its parameters or its model, so it is small, can be pickled to worker processes, and evaluates
+    batches of points without going through the Poly machinery. It is usually obtained with :meth:`Poly.get_predictor`.
+
+    :param numpy.ndarray coefficients: The coefficients of the polynomial, with shape (number_of_terms,).
+    :param numpy.ndarray elements: The multi-indices of the polynomial, with shape (number_of_terms, dimensions).
+    :param list recurrence_coefficients: For each dimension, a numpy.ndarray of shape (highest_order + 1, 2) with the recurrence
+        coefficients of the orthogonal polynomials, where highest_order is the highest order of the multi-indices along that dimension.
+    :param int memory_budget: The approximate memory, in bytes, used for the intermediate arrays of each chunk of points in
+        :meth:`get_polyfit`.
+
+    **Sample usage**::
+
+        predictor = poly.get_predictor()
+        with ProcessPoolExecutor() as executor:
+            values = list(executor.map(predictor.get_polyfit, batches_of_points))
+    """
+    def __init__(self, coefficients, elements, recurrence_coefficients, memory_budget=POLYFIT_MEMORY_BUDGET):
+        self.coefficients = np.asarray(coefficients, dtype=float).reshape(-1)
+        self.elements = get_compact_elements(elements)
+        self.recurrence_coefficients = [np.array(ab, dtype=float) for ab in recurrence_coefficients]
+        self.memory_budget = memory_budget
+        self.dimensions = self.elements.shape[1]
+        order, self._levels = get_polynomial_contraction(self.elements)
+        self._sorted_coefficients = self.coefficients[order]
+    def _get_univariate_polynomials(self, stack_of_points, grad_order):
+        return [get_orthogonal_polynomials(stack_of_points[:, k], self.recurrence_coefficients[k], grad_order) \
+                for k in range(0, self.dimensions)]
+    def get_polyfit(self, stack_of_points):
+        """
+        Evaluates the polynomial approximation at prescribed points.
+
+        :param PolyPredictor self:
+            An instance of the PolyPredictor class.
+        :param numpy.ndarray stack_of_points:
+            An ndarray with shape (number_of_observations, dimensions) at which the polynomial fit must be evaluated at.
+        :return:
+            **p**: A numpy.ndarray of shape (number_of_observations, 1), as with :meth:`Poly.get_polyfit`.
+        """
+        stack_of_points = get_stack_of_points(stack_of_points, self.dimensions)
+        no_of_points = stack_of_points.shape[0]
+        chunk_size = max(1, int(self.memory_budget) // (16 * len(self.coefficients)))
+        polyfit = np.empty((no_of_points, 1))
+        for start in range(0, no_of_points, chunk_size):
+            points = stack_of_points[start:start + chunk_size, :]
+            polyfit[start:start + chunk_size, 0] = contract_polynomial(self._sorted_coefficients, self._levels, \
+                                                                       self._get_univariate_polynomials(points, 0))
+        return polyfit
+    def get_polyfit_grad(self, stack_of_points):
+        """
+        Evaluates the gradient of the polynomial approximation at prescribed points.
+
+        :param PolyPredictor self:
+            An instance of the PolyPredictor class.
+        :param numpy.ndarray stack_of_points:
+            An ndarray with shape (number_of_observations, dimensions) at which the gradient must be evaluated.
+        :return:
+            **g**: A numpy.ndarray of shape (dimensions, number_of_observations), as with :meth:`Poly.get_polyfit_grad`.
+        """
+        stack_of_points = get_stack_of_points(stack_of_points, self.dimensions)
+        G = get_basis_gradients(self.elements, self._get_univariate_polynomials(stack_of_points, 1))
+        grads = np.einsum('p,vpn->vn', self.coefficients, G)
+        if self.dimensions == 1:
+            return grads[0]
+        return grads
+    def get_polyfit_hess(self, stack_of_points):
+        """
+        Evaluates the Hessian of the polynomial approximation at prescribed points.
+
+        :param PolyPredictor self:
+            An instance of the PolyPredictor class.
+        :param numpy.ndarray stack_of_points:
+            An ndarray with shape (number_of_observations, dimensions) at which the Hessian must be evaluated.
+        :return:
+            **h**: A numpy.ndarray of shape (dimensions, dimensions, number_of_observations), as with :meth:`Poly.get_polyfit_hess`.
+        """
+        stack_of_points = get_stack_of_points(stack_of_points, self.dimensions)
+        H = get_basis_hessians(self.elements, self._get_univariate_polynomials(stack_of_points, 2))
+        return np.einsum('p,ijpn->ijn', self.coefficients, H)
+#---------------------------------------------------------------------------------------------------
+# PRIVATE FUNCTIONS
+#---------------------------------------------------------------------------------------------------
+def get_stack_of_points(stack_of_points, dimensions):
+    # A 1d array holds several points of a univariate polynomial, or a single point of a multivariate one.
+    stack_of_points = np.asarray(stack_of_points)
+    if stack_of_points.ndim == 1:
+        if dimensions == 1:
+            return np.reshape(stack_of_points, (len(stack_of_points), 1))
+        return np.array([stack_of_points])
+    return stack_of_points
+def get_polynomial_contraction(elements):
+    """
+    Returns the lexicographic order of a set of multi-indices and, for each dimension k, the orders along k of the distinct prefixes of
+    length k + 1 of the sorted multi-indices, along with a sparse matrix that sums the rows that share a prefix of length k.
+    """
+    cardinality, dimensions = elements.shape
+    order = np.lexsort(elements.T[::-1])
+    sorted_elements = elements[order, :]
+    levels = [None] * dimensions
+    rows = np.arange(0, cardinality)
+    for k in range(dimensions - 1, -1, -1):
+        prefixes = sorted_elements[rows, 0:k]
+        changes = np.ones(len(rows), dtype=bool)
+        changes[1:] = np.any(prefixes[1:, :] != prefixes[:-1, :], axis=1)
+        groups = np.cumsum(changes) - 1
+        levels[k] = (sorted_elements[rows, k], csr_matrix((np.ones(len(rows)), (groups, np.arange(0, len(rows))))))
+        rows = rows[changes]
+    return order, levels
+def contract_polynomial(sorted_coefficients, levels, univariate_polynomials):
+    """
+    Evaluates a polynomial one dimension at a time: the coefficients, sorted as in :func:`get_polynomial_contraction`, are multiplied by the
+    univariate polynomials of the last dimension and summed over the multi-indices that only differ along it, and so on. The matrix of all
+    the basis functions evaluated at all the points is thus never formed.
+    """
+    values = sorted_coefficients.reshape(-1, 1)
+    for k in range(len(levels) - 1, -1, -1):
+        entries, group_sums = levels[k]
+        values = group_sums.dot(values * univariate_polynomials[k][0][entries])
+    return values[0]
+def get_basis_gradients(elements, univariate_polynomials, dim_index=None):
+    """
+    Evaluates the gradients of the basis functions as one numpy.ndarray of shape (dimensions, cardinality, number_of_observations). The
+    product of the univariate polynomials along the dimensions that are not differentiated is shared across directions, as a running prefix
+    product stored in the output and a running suffix product, so the cost grows linearly with the number of dimensions.
+    """
+    basis_entries, dimensions = elements.shape
+    no_of_points = univariate_polynomials[0][0].shape[1]
+    if dim_index is None:
+        dim_index = range(dimensions)
+    p = np.empty((dimensions, basis_entries, no_of_points))
+    for k in range(0, dimensions):
+        p[k] = univariate_polynomials[k][0][elements[:, k]]
+    G = np.empty((dimensions, basis_entries, no_of_points))
+    G[0] = 1.0
+    for k in range(1, dimensions):
+        G[k] = G[k - 1] * p[k - 1]
+    suffix = np.ones((basis_entries, no_of_points))
+    for v in range(dimensions - 1, -1, -1):
+        if v in dim_index:
+            G[v] *= univariate_polynomials[v][1][elements[:, v]] * suffix
+        else:
+            G[v] = 0.0
+        suffix *= p[v]
+    return G
+def get_basis_hessians(elements, univariate_polynomials):
+    """
+    Evaluates the Hessians of the basis functions as one numpy.ndarray of shape (dimensions, dimensions, cardinality, number_of_observations),
+    from prefix and suffix products of the univariate polynomials. Only the upper triangle is computed; the Hessian is symmetric.
+    """
+    basis_entries, dimensions = elements.shape
+    no_of_points = univariate_polynomials[0][0].shape[1]
+    p = np.empty((dimensions, basis_entries, no_of_points))
+    dp = np.empty((dimensions, basis_entries, no_of_points))
+    d2p = np.empty((dimensions, basis_entries, no_of_points))
+    for k in range(0, dimensions):
+        p[k] = univariate_polynomials[k][0][elements[:, k]]
+        dp[k] = univariate_polynomials[k][1][elements[:, k]]
+        d2p[k] = univariate_polynomials[k][2][elements[:, k]]
+    # Products of the values over the dimensions before (prefix) and after (suffix) each dimension.
+    prefix = np.ones((dimensions, basis_entries, no_of_points))
+    suffix = np.ones((dimensions, basis_entries, no_of_points))
+    for k in range(1, dimensions):
+        prefix[k] = prefix[k - 1] * p[k - 1]
+        suffix[dimensions - 1 - k] = suffix[dimensions - k] * p[dimensions - k]
+    H = np.empty((dimensions, dimensions, basis_entries, no_of_points))
+    for i in range(0, dimensions):
+        H[i, i] = prefix[i] * d2p[i] * suffix[i]
+        running_product = prefix[i] * dp[i]
+        for j in range(i + 1, dimensions):
+            H[i, j] = running_product * dp[j] * suffix[j]
+            H[j, i] = H[i, j]
+            running_product *= p[j]
+    return H
@@ -59,17 +59,16 @@ class Sampling(object):
 
         # Save time by returning if univariate!
         if dimensions == 1:
-            poly , _ , _ =  self.parameters[0]._get_orthogonal_polynomial(self.points, int(np.max(basis)))
+            poly , _ , _ =  self.parameters[0]._get_orthogonal_polynomial(self.points, int(np.max(basis)), grad_order=0)
             return poly
         else:
             for i in range(0, dimensions):
                 if len(self.points.shape) == 1:
                     self.points = np.asarray([self.points])
-                p[i] , _ , _ = self.parameters[i]._get_orthogonal_polynomial(self.points[:,i], int(np.max(basis[:,i])) )
+                p[i] , _ , _ = self.parameters[i]._get_orthogonal_polynomial(self.points[:,i], int(np.max(basis[:,i])), grad_order=0)
 
         # One loop for polynomials
         polynomial = np.ones((basis_entries, no_of_points))
         for k in range(dimensions):
-            basis_entries_this_dim = basis[:, k].astype(int)
-            polynomial *= p[k][basis_entries_this_dim]
+            polynomial *= p[k][basis[:, k]]
         return polynomial
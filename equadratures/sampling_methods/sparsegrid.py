@@ -1,7 +1,8 @@
 """Sparse grid based sampling."""
 from equadratures.sampling_methods.sampling_template import Sampling
 from equadratures.sampling_methods.tensorgrid import Tensorgrid
-from equadratures.basis import Basis
+from equadratures.basis import Basis, sparse_grid_levels, get_sparse_grid_order, get_nested_rule_level, get_nested_rule_order, \
+    NESTED_GROWTH_RULES
 import numpy as np
 class Sparsegrid(Sampling):
     """
@@ -29,37 +30,57 @@ class Sparsegrid(Sampling):
 
             **w**: A numpy.ndarray of the corresponding quadrature weights with shape (number_of_samples, 1).
         """
-        sparse_indices, sparse_factors, not_used = self.basis.get_basis()
-        rows = len(sparse_indices)
-        cols = len(sparse_indices[0])
+        sparse_levels, sparse_factors = sparse_grid_levels(self.basis.level, self.dimensions, self.basis.weights)
+        rows = len(sparse_levels)
 
-        # For storage we use dictionaries
-        points_store = {}
-        weights_store = {}
-        indices = np.zeros((rows))
+        # Each node is hashed on its coordinates, so that every node of every tensor grid is mapped to a unique global row in one pass.
+        node_index = {}
+        node_points = []
+        local_rows = []
         self.tensor_product_list = []
         for i in range(0,rows):
-            orders = sparse_indices[i,:]
-            myBasis = Basis('tensor-grid')
-            myTensor = Tensorgrid(parameters=self.parameters, basis=myBasis, orders=orders.astype(int) )
+            myTensor = get_sparse_grid_tensor(self.parameters, sparse_levels[i,:], self.basis.growth_rule)
             self.tensor_product_list.append(myTensor)
             pts = myTensor.points
-            wts = myTensor.weights * sparse_factors[i]
-            points_store[i] = pts
-            weights_store[i] = wts
-            indices[i] = myTensor.basis.cardinality
-            del myTensor, myBasis
-        sum_indices = int(np.sum(indices))
-        points_saved = np.zeros((sum_indices, self.basis.dimensions))
-        weights_saved = np.zeros((sum_indices))
-        counter = int(0)
+            number_of_nodes = len(node_index)
+            tensor_rows = np.array([node_index.setdefault(node, len(node_index)) for node in map(tuple, pts.tolist())], dtype=int)
+            new_nodes = tensor_rows >= number_of_nodes
+            node_points.append(pts[new_nodes, :])
+            local_rows.append(tensor_rows)
+        points = np.vstack(node_points)
+        # The weight of a node is the sum of its combination-weighted weights over all the tensor grids it belongs to.
+        weights = np.zeros(len(points))
         for i in range(0,rows):
-            for j in range(0, int(indices[i])):
-                for d in range(0, self.basis.dimensions):
-                    points_saved[counter,d] = points_store[i][j, d]
-                weights_saved[counter] = weights_store[i][j]
-                counter = counter + 1
-        self.points , indices = np.unique(points_saved, axis=0, return_index=True)
-        self.weights = weights_saved[indices]
-        self.sparse_indices = sparse_indices
+            np.add.at(weights, local_rows[i], self.tensor_product_list[i].weights * sparse_factors[i])
+        # Sort the nodes lexicographically, and map the rows of each tensor grid accordingly.
+        order = np.lexsort(points.T[::-1])
+        rank = np.empty(len(order), dtype=int)
+        rank[order] = np.arange(len(order))
+        self.points = points[order, :]
+        self.weights = weights[order]
+        self.tensor_indices = [rank[tensor_rows] for tensor_rows in local_rows]
+        self.sparse_indices = np.array([tensor.basis.orders for tensor in self.tensor_product_list])
         self.sparse_weights = sparse_factors
+def get_sparse_grid_tensor(parameters, index, growth_rule, adaptive=False):
+    """
+    Returns the tensor grid associated with a level multi-index of a sparse grid.
+
+    :param list parameters: A list of parameters, where each element of the list is an instance of the Parameter class.
+    :param numpy.ndarray index: The level multi-index (starting at zero).
+    :param string growth_rule: The growth rule of the sparse grid (see :class:`Basis`).
+    :param bool adaptive: With nested rules, each entry of the multi-index is mapped to the rule of the next level (rather than to the
+        smallest rule that projects the orders of the ``linear`` rule), so that successive entries never share a rule. This is required by
+        dimension-adaptive sparse grids, where the error indicator of a repeated rule would vanish.
+    :return:
+        **tensor**: An instance of the Tensorgrid class.
+    """
+    if growth_rule in NESTED_GROWTH_RULES:
+        # Nested rules are indexed by their level rather than by the polynomial order they project.
+        if adaptive:
+            levels = [int(i) + 1 for i in index]
+        else:
+            levels = [get_nested_rule_level(int(i), growth_rule) for i in index]
+        orders = np.array([get_nested_rule_order(level, growth_rule) for level in levels], dtype=int)
+        return Tensorgrid(parameters=parameters, basis=Basis('tensor-grid'), orders=orders, levels=levels, growth_rule=growth_rule)
+    orders = np.array([get_sparse_grid_order(int(i), growth_rule) for i in index], dtype=int)
+    return Tensorgrid(parameters=parameters, basis=Basis('tensor-grid'), orders=orders)
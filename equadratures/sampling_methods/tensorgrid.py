@@ -1,19 +1,25 @@
 """Tensor grid based sampling."""
 from equadratures.sampling_methods.sampling_template import Sampling
 import numpy as np
+TENSOR_GRID_CHUNK_SIZE = 100000
 class Tensorgrid(Sampling):
     """
     The class defines a Tensorgrid sampling object.
 
     :param list parameters: A list of parameters, where each element of the list is an instance of the Parameter class.
     :param Basis basis: An instance of the Basis class corresponding to the multi-index set used.
+    :param list orders: A list of the highest polynomial orders along each dimension.
+    :param list levels: A list of the levels of the nested univariate rules along each dimension. Only used with ``growth_rule``.
+    :param string growth_rule: The family of nested univariate rules (see :class:`Basis`). If not provided, Gauss rules are used.
     """
-    def __init__(self, parameters, basis, orders=None):
+    def __init__(self, parameters, basis, orders=None, levels=None, growth_rule=None):
         self.parameters = parameters
         self.basis = basis
         if orders is not None:
             self.basis.set_orders(orders)
         self.dimensions = len(self.parameters)
+        self.levels = levels
+        self.growth_rule = growth_rule
         self._set_points(orders)
         super(Tensorgrid, self).__init__(self.parameters, self.basis, self.points, self.weights)
     def _set_points(self, orders=None):
@@ -25,28 +31,61 @@ class Tensorgrid(Sampling):
         :param list orders:
             A list of the highest polynomial orders along each dimension.
         """
-        # Initialize points and weights
-        pp = [1.0]
-        ww = [1.0]
-
         if orders is None:
             orders = self.basis.orders
-
-        # number of parameters
-        # For loop across each dimension
+        local_points, local_weights = _get_local_rules(self.parameters, orders, self.levels, self.growth_rule)
+        sizes = tuple(len(local_weights[u]) for u in range(0, self.dimensions))
+        # The last dimension varies fastest, so both arrays are filled through C-ordered views of shape sizes.
+        points = np.empty((int(np.prod(sizes)), self.dimensions))
+        weights = np.ones(sizes)
+        points_view = points.reshape(sizes + (self.dimensions,))
         for u in range(0, self.dimensions):
+            shape = [1] * self.dimensions
+            shape[u] = sizes[u]
+            points_view[..., u] = local_points[u].reshape(shape)
+            weights *= local_weights[u].reshape(shape)
+        self.points = points
+        self.weights = weights.reshape(-1)
+def get_tensor_grid_chunks(parameters, orders, chunk_size=TENSOR_GRID_CHUNK_SIZE):
+    """
+    Yields the points and weights of a tensor grid quadrature rule in chunks, in the same order as :class:`Tensorgrid`, without ever holding
+    the full grid in memory. This is useful to stream high dimensional grids through a model.
 
-            # Call to get local quadrature method (for dimension 'u')
-            local_points, local_weights = self.parameters[u]._get_local_quadrature(orders[u])
-            ww = np.kron(ww, local_weights)
+    :param list parameters: A list of parameters, where each element of the list is an instance of the Parameter class.
+    :param list orders: A list of the highest polynomial orders along each dimension.
+    :param int chunk_size: The maximum number of points per chunk.
+    :return:
+        A generator of tuples (**points**, **weights**), where points is a numpy.ndarray of shape (number_of_points_in_chunk, dimensions)
+        and weights is a numpy.ndarray of shape (number_of_points_in_chunk,).
 
-            # Tensor product of the points
-            dummy_vec = np.ones((len(local_points), 1))
-            dummy_vec2 = np.ones((len(pp), 1))
-            left_side = np.array(np.kron(pp, dummy_vec))
-            right_side = np.array( np.kron(dummy_vec2, local_points) )
-            pp = np.concatenate((left_side, right_side), axis = 1)
+    **Sample usage**::
 
-        # Ignore the first column of pp
-        self.points = pp[:,1::]
-        self.weights = ww
+        for points, weights in get_tensor_grid_chunks([param] * 10, [3] * 10, chunk_size=10000):
+            integral = integral + np.dot(weights, evaluate_model(points, model).flatten())
+    """
+    dimensions = len(parameters)
+    local_points, local_weights = _get_local_rules(parameters, orders)
+    sizes = tuple(len(local_weights[u]) for u in range(0, dimensions))
+    number_of_points = int(np.prod(sizes))
+    for start in range(0, number_of_points, int(chunk_size)):
+        indices = np.unravel_index(np.arange(start, min(start + int(chunk_size), number_of_points)), sizes)
+        points = np.empty((len(indices[0]), dimensions))
+        weights = np.ones(len(indices[0]))
+        for u in range(0, dimensions):
+            points[:,u] = local_points[u][indices[u]]
+            weights *= local_weights[u][indices[u]]
+        yield points, weights
+def _get_local_rules(parameters, orders, levels=None, growth_rule=None):
+    """
+    Private function that returns the univariate quadrature points and weights of each parameter as lists of flat arrays.
+    """
+    local_points = []
+    local_weights = []
+    for u in range(0, len(parameters)):
+        if growth_rule is None:
+            p, w = parameters[u]._get_local_quadrature(orders[u])
+        else:
+            p, w = parameters[u]._get_nested_quadrature(int(levels[u]), growth_rule)
+        local_points.append(np.asarray(p, dtype=float).reshape(-1))
+        local_weights.append(np.asarray(w, dtype=float).reshape(-1))
+    return local_points, local_weights
@@ -175,14 +175,13 @@ def private_get_all_sobol_indices(coefficients, basis, max_order):
             for i in combinations(range(dimensions),order):
                 #initialize each index to be 0
                 combo_index[i] = 0
-
-
-            for i in range(0,basis_entries): #loop over rows
-                row = basis[i,:]
-                non_zero_entries = np.nonzero(row)[0]
-                non_zero_entries.sort()    #just in case
-                if len(non_zero_entries) == order: #neglect entries that should actually be zero (what constitutes as zero?)
-                    combo_index[tuple(non_zero_entries)] = float(combo_index[tuple(non_zero_entries)] + coefficients[i]**2 / variance)
+        # Rows are grouped by the dimensions in which they are non-zero, and the contributions of each group are summed in one pass.
+        patterns, inverse = np.unique(basis != 0, axis=0, return_inverse=True)
+        contributions = np.bincount(np.ravel(inverse), weights=np.ravel(coefficients[0:basis_entries])**2 / variance, minlength=len(patterns))
+        for pattern, contribution in zip(patterns, contributions):
+            non_zero_entries = tuple(np.nonzero(pattern)[0])
+            if non_zero_entries in combo_index:
+                combo_index[non_zero_entries] = float(contribution)
         check_sum = sum(combo_index.values())
         if (abs(check_sum - 1.0) >= 1e-2):
             print("Possible discrepancy in calculation, sum of indices = " + str(check_sum))
@@ -137,8 +137,38 @@ def get_newton_determinant_maximization(Ao, number_of_subsamples):
     L = np.log(np.linalg.det(A.T * Zhat  * A))
     ztilde  = z
     Utilde = np.log(np.linalg.det(A.T * _diag(z) * A))  + 2 * m * kappa
-    z = _binary2indices(zhat)
+    z = _round_relaxation(A, z, number_of_subsamples)
     return z
+def _round_relaxation(A, z, number_of_subsamples):
+    """
+    Rounds the relaxed solution by selecting the rows with the largest entries. On symmetric grids, entries of the relaxed solution are
+    tied across mirrored points, and the last few rows may have to be picked among a tied group; any such pick used to be decided by
+    round-off, and could be singular. Tied rows are therefore picked greedily, each time taking the row with the largest component
+    orthogonal to the rows already selected.
+    """
+    A = np.asarray(A)
+    z = np.ravel(np.asarray(z))
+    threshold = np.sort(z)[::-1][number_of_subsamples - 1]
+    tolerance = 1e-8 * max(np.abs(threshold), 1.0)
+    selected = np.flatnonzero(z > threshold + tolerance).tolist()
+    tied = np.flatnonzero(np.abs(z - threshold) <= tolerance)
+    if len(selected) + len(tied) > number_of_subsamples:
+        residual = A[tied, :].copy()
+        if len(selected) > 0:
+            Q, _ = np.linalg.qr(A[selected, :].T)
+            residual = residual - np.dot(np.dot(residual, Q), Q.T)
+        available = np.ones(len(tied), dtype=bool)
+        for i in range(len(selected), number_of_subsamples):
+            norms = np.where(available, np.sum(residual**2, axis=1), -1.0)
+            j = int(np.argmax(norms))
+            available[j] = False
+            selected.append(int(tied[j]))
+            if norms[j] > 0.0:
+                q = residual[j, :] / np.sqrt(norms[j])
+                residual = residual - np.outer(np.dot(residual, q), q)
+    else:
+        selected = selected + tied.tolist()
+    return sorted(selected)
 def _binary2indices(zhat):
     """
     Simple utility that converts a binary array into one with indices!
@@ -1,6 +1,7 @@
 from unittest import TestCase
 import unittest
 from equadratures import *
+from equadratures.basis import total_order_set, get_total_order_chunks
 import numpy as np
 
 class TestBasis(TestCase):
@@ -27,5 +28,62 @@ class TestBasis(TestCase):
         total = Basis('total-order', [4, 4, 4])
         np.testing.assert_almost_equal(hyper.cardinality, total.cardinality, decimal=7, err_msg = "Difference greated than imposed tolerance")
 
+    def test_weighted(self):
+        orders = [6, 6, 6]
+        weights = np.array([1., 1.5, 3.])
+        tensor = Basis('tensor-grid', orders).elements
+        total = Basis('total-order', orders, weights=weights)
+        expected = tensor[np.dot(tensor, weights) <= 6 + 1e-12, :]
+        self.assertEqual(total.cardinality, len(expected))
+        np.testing.assert_array_equal(np.max(total.elements, axis=0), [6, 4, 2])
+        hyper = Basis('hyperbolic-basis', orders, q=0.5, weights=weights)
+        expected = tensor[np.sum((weights * tensor)**0.5, axis=1)**2 <= 6 + 1e-12, :]
+        self.assertEqual(hyper.cardinality, len(expected))
+        # Unit weights recover the isotropic index sets.
+        np.testing.assert_array_equal(Basis('total-order', orders, weights=[1., 1., 1.]).elements, Basis('total-order', orders).elements)
+        a, b, c = Basis('sparse-grid', orders=[3,3,3], level=2, growth_rule='linear').get_basis()
+        a_weighted, b_weighted, c_weighted = Basis('sparse-grid', orders=[3,3,3], level=2, growth_rule='linear', weights=[1.,1.,1.]).get_basis()
+        np.testing.assert_array_equal(a, a_weighted)
+        np.testing.assert_array_almost_equal(b, b_weighted, decimal=12)
+        # The combination coefficients of an anisotropic sparse grid integrate constants exactly.
+        a, b, c = Basis('sparse-grid', orders=[3,3,3], level=3, growth_rule='linear', weights=[1., 2., 2.5]).get_basis()
+        np.testing.assert_almost_equal(np.sum(b), 1.0, decimal=12)
+        self.assertTrue(np.max(a[:,0]) > np.max(a[:,2]))
+
+    def test_high_dimensional(self):
+        hyper = Basis('hyperbolic-basis', [4] * 30, q=0.5)
+        self.assertEqual(hyper.cardinality, 1 + 4 * 30 + 30 * 29 // 2)
+        total = Basis('total-order', [3] * 30, weights=[1.] * 5 + [2.] * 25)
+        # Up to third order along the first five dimensions, or first order along one of the others and at most first order along the first five.
+        self.assertEqual(total.cardinality, 1 + (5 + 15 + 35) + 25 * (1 + 5))
+
+    def test_total_order_enumeration(self):
+        elements = total_order_set(4, 30)
+        self.assertEqual(elements.shape, (46376, 30))
+        self.assertEqual(len(np.unique(elements, axis=0)), len(elements))
+        self.assertTrue(np.all(np.diff(np.sum(elements, axis=1)) >= 0))
+        # The index set is enumerated in the same order as before it was vectorised.
+        reference = [[0, 0, 0], [0, 0, 1], [0, 1, 0], [1, 0, 0], [0, 0, 2], [0, 1, 1], [0, 2, 0], [1, 0, 1], [1, 1, 0], [2, 0, 0], \
+                     [0, 0, 3], [0, 1, 2], [0, 2, 1], [0, 3, 0], [1, 0, 2], [1, 1, 1], [1, 2, 0], [2, 0, 1], [2, 1, 0], [3, 0, 0]]
+        np.testing.assert_array_equal(total_order_set(3, 3), reference)
+        np.testing.assert_array_equal(Basis('total-order', [3, 3, 3]).elements, reference)
+        # The chunks stream the same set, in the same order.
+        for dimensions, highest_order in [(1, 5), (4, 3), (6, 4)]:
+            chunks = list(get_total_order_chunks(highest_order, dimensions, chunk_size=11))
+            np.testing.assert_array_equal(np.vstack(chunks), total_order_set(highest_order, dimensions))
+            self.assertTrue(all(len(chunk) <= 11 for chunk in chunks))
+
+    def test_integer_elements(self):
+        basis = Basis('total-order', [5, 5, 5])
+        self.assertEqual(basis.elements.dtype, np.int16)
+        np.testing.assert_array_equal(basis.get_index_location(basis.elements[::-1]), np.arange(basis.cardinality)[::-1])
+        np.testing.assert_array_equal(basis.get_index_location([[1, 2, 2], [6, 0, 0]]), [np.argmax(np.all(basis.elements == [1, 2, 2], axis=1)), -1])
+        self.assertTrue([0, 5, 0] in basis)
+        self.assertFalse(np.array([3., 3., 0.]) in basis)
+        basis.union(Basis('tensor-grid', [3, 3, 3]).elements)
+        self.assertEqual(basis.cardinality, len(np.unique(basis.elements, axis=0)))
+        self.assertTrue([3, 3, 3] in basis)
+        np.testing.assert_array_equal(basis.elements[0:56, :], Basis('total-order', [5, 5, 5]).elements)
+
 if __name__== '__main__':
     unittest.main()
@@ -4,6 +4,8 @@ from equadratures import *
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.stats import skew
+import os
+import tempfile
 
 def fun(x):
      return 5.0 * x[0]**3 - x[0]*x[1] + 3.0*x[1]*x[2]**3 + 32.0
@@ -32,6 +34,86 @@ class TestF(TestCase):
           np.testing.assert_almost_equal(np.mean(f_mc)*0.01, mean*0.01, decimal=1, err_msg = "Difference greated than imposed tolerance")
           np.testing.assert_almost_equal(np.var(f_mc)*0.000001, variance*0.000001, decimal=2, err_msg = "Difference greated than imposed tolerance")
           np.testing.assert_almost_equal( skew(f_mc)*0.1, skewness*0.1, decimal=1, err_msg = "Difference greated than imposed tolerance")
+     def test_nataf_gaussian_marginals(self):
+          zeta_1 = Parameter(distribution='gaussian', shape_parameter_A = 1.0, shape_parameter_B = 4.0, order=2)
+          zeta_2 = Parameter(distribution='gaussian', shape_parameter_A = -1.0, shape_parameter_B = 0.25, order=2)
+          R = np.array([[1.0, -0.7], [-0.7, 1.0]])
+          myPoly = Poly([zeta_1, zeta_2], Basis('tensor-grid'), method='numerical-integration')
+          myNataf = Correlations(myPoly, R)
+          # For Gaussian marginals the transform is affine.
+          X = np.random.randn(1000, 2)
+          C = myNataf.get_correlated_from_uncorrelated(X)
+          np.testing.assert_array_almost_equal(C, np.dot(X, myNataf.A.T) * np.array([2.0, 0.5]) + np.array([1.0, -1.0]), decimal=8)
+          samples = myNataf.get_correlated_samples(N=200000)
+          self.assertEqual(samples.shape, (200000, 2))
+          np.testing.assert_almost_equal(np.corrcoef(samples.T)[0, 1], -0.7, decimal=2)
+     def test_fictive_matrix_reload(self):
+          zeta_1 = Parameter(distribution='gamma', shape_parameter_A = 2.0, shape_parameter_B = 1.0, order=2)
+          zeta_2 = Parameter(distribution='beta', shape_parameter_A = 2.0, shape_parameter_B = 3.0, lower=0.0, upper=1.0, order=2)
+          zeta_3 = Parameter(distribution='uniform', lower=-1.0, upper=1.0, order=2)
+          R = np.array([[1.0, 0.5, 0.0], [0.5, 1.0, -0.3], [0.0, -0.3, 1.0]])
+          myPoly = Poly([zeta_1, zeta_2, zeta_3], Basis('tensor-grid'), method='numerical-integration')
+          filename = os.path.join(tempfile.mkdtemp(), 'fictive.npy')
+          myNataf = Correlations(myPoly, R, fictive_matrix=filename)
+          R0 = myNataf.get_fictive_matrix()
+          self.assertTrue(os.path.isfile(filename))
+          self.assertEqual(R0[0, 2], 0.0)
+          # The fictive correlations reproduce the target correlations between the marginals.
+          samples = myNataf.get_correlated_samples(N=200000)
+          np.testing.assert_almost_equal(np.corrcoef(samples.T)[0, 1], 0.5, decimal=2)
+          np.testing.assert_almost_equal(np.corrcoef(samples.T)[1, 2], -0.3, decimal=2)
+          myNataf2 = Correlations(myPoly, R, fictive_matrix=filename)
+          np.testing.assert_array_equal(myNataf2.get_fictive_matrix(), R0)
+          myNataf3 = Correlations(myPoly, R, fictive_matrix=R0)
+          np.testing.assert_array_almost_equal(myNataf3.get_points(), myNataf.get_points(), decimal=12)
+          # A file written for other correlations or other marginals is not reused.
+          R_other = np.array([[1.0, 0.5, 0.2], [0.5, 1.0, -0.3], [0.2, -0.3, 1.0]])
+          myNataf4 = Correlations(myPoly, R_other, fictive_matrix=filename)
+          self.assertNotEqual(myNataf4.get_fictive_matrix()[0, 2], 0.0)
+          np.testing.assert_array_equal(Correlations(myPoly, R_other, fictive_matrix=filename).get_fictive_matrix(), myNataf4.get_fictive_matrix())
+          zeta_4 = Parameter(distribution='gamma', shape_parameter_A = 4.0, shape_parameter_B = 1.0, order=2)
+          myPoly2 = Poly([zeta_4, zeta_2, zeta_3], Basis('tensor-grid'), method='numerical-integration')
+          myNataf5 = Correlations(myPoly2, R_other, fictive_matrix=filename)
+          self.assertFalse(np.allclose(myNataf5.get_fictive_matrix()[0, 1], myNataf4.get_fictive_matrix()[0, 1]))
+          np.testing.assert_array_equal(myNataf5.get_fictive_matrix(), Correlations(myPoly2, R_other).get_fictive_matrix())
+          # Files that only hold R0 are checked against the zero pattern of the correlation matrix.
+          np.save(filename, R0)
+          np.testing.assert_array_equal(Correlations(myPoly, R, fictive_matrix=filename).get_fictive_matrix(), R0)
+          self.assertNotEqual(Correlations(myPoly, R_other, fictive_matrix=filename).get_fictive_matrix()[0, 2], 0.0)
+     def test_nearest_correlation_matrix(self):
+          R = np.array([[1.0, 0.95, 0.95], [0.95, 1.0, -0.5], [0.95, -0.5, 1.0]])
+          self.assertTrue(np.min(np.linalg.eigvalsh(R)) < 0.0)
+          R_pd = nearest_correlation_matrix(R)
+          np.testing.assert_array_almost_equal(np.diag(R_pd), np.ones(3), decimal=12)
+          np.testing.assert_array_almost_equal(R_pd, R_pd.T, decimal=12)
+          np.linalg.cholesky(R_pd)
+          self.assertTrue(np.linalg.norm(R_pd - R) < 0.8)
+          # An indefinite fictive matrix is repaired rather than causing the Cholesky factorisation to fail.
+          zeta = Parameter(distribution='gaussian', shape_parameter_A = 0.0, shape_parameter_B = 1.0, order=1)
+          myPoly = Poly([zeta, zeta, zeta], Basis('tensor-grid'), method='numerical-integration')
+          myNataf = Correlations(myPoly, R)
+          np.linalg.cholesky(myNataf.get_fictive_matrix())
+          np.testing.assert_array_almost_equal(myNataf.get_fictive_matrix(), R_pd, decimal=1)
+          # Only the repaired fictive matrix is stored.
+          filename = os.path.join(tempfile.mkdtemp(), 'fictive.npy')
+          myNataf = Correlations(myPoly, R, fictive_matrix=filename)
+          np.linalg.cholesky(np.load(filename)['R0'])
+          np.testing.assert_array_equal(np.load(filename)['R0'], myNataf.get_fictive_matrix())
+     def test_factor_model(self):
+          d = 12
+          np.random.seed(3)
+          L = np.random.uniform(-0.6, 0.6, (d, 2))
+          R = np.dot(L, L.T)
+          np.fill_diagonal(R, 1.0)
+          zeta = Parameter(distribution='uniform', lower=-1.0, upper=1.0, order=1)
+          myPoly = Poly([zeta] * d, Basis('total-order'), method='least-squares', sampling_args={'mesh':'monte-carlo', \
+                  'subsampling-algorithm':'qr', 'sampling-ratio':1.0})
+          myNataf = Correlations(myPoly, R, rank=2)
+          R0 = myNataf.get_fictive_matrix()
+          self.assertEqual(myNataf.loadings.shape, (d, 2))
+          np.testing.assert_array_almost_equal(np.dot(myNataf.loadings, myNataf.loadings.T) + np.diag(myNataf.uniquenesses), R0, decimal=2)
+          samples = myNataf.get_correlated_samples(N=100000)
+          np.testing.assert_array_almost_equal(np.corrcoef(samples.T), R, decimal=1)
 
 if __name__== '__main__':
     unittest.main()
\ No newline at end of file
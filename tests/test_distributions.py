@@ -4,6 +4,7 @@ from equadratures import *
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.special import erf, gamma
+import scipy.stats as st
 N = 900000
 def blackbox(x):
   return x
@@ -308,5 +309,19 @@ class Test_Distributions(TestCase):
       mean, variance = myPoly.get_mean_and_variance()
       np.testing.assert_almost_equal(mean, paramtest.shape_parameter_A, decimal=1)
       np.testing.assert_almost_equal(variance, paramtest.shape_parameter_B, decimal=1)
+    def test_custom_tables(self):
+      data = np.random.gamma(2.0, 1.5, 4000)
+      param = Parameter(order=3, distribution='custom', data=data)
+      kernel = st.gaussian_kde(data)
+      lower, upper = np.min(data), np.max(data)
+      x = np.linspace(lower, upper, 200)
+      mass = kernel.integrate_box_1d(lower, upper)
+      np.testing.assert_array_almost_equal(param.get_pdf(x), kernel(x) / mass, decimal=4)
+      cdf = np.array([kernel.integrate_box_1d(lower, xi) for xi in x]) / mass
+      np.testing.assert_array_almost_equal(param.get_cdf(x), cdf, decimal=4)
+      u = np.linspace(0., 1., 101)
+      icdf = param.get_icdf(u)
+      self.assertTrue(np.all(np.diff(icdf) >= 0.))
+      np.testing.assert_array_almost_equal(param.get_cdf(icdf), u, decimal=10)
 if __name__ == '__main__':
     unittest.main()
@@ -2,6 +2,7 @@ from unittest import TestCase
 import unittest
 from equadratures import *
 import numpy as np
+from equadratures.subsampling import _round_relaxation
 def fun(x):
     a = 1.0
     b = 100.0
@@ -44,6 +45,18 @@ class TestC(TestCase):
         model_evals4 = evaluate_model(pts4, fun)
         myPoly4.set_model(model_evals4)
         np.testing.assert_array_almost_equal(myPoly3.get_coefficients(), myPoly4.get_coefficients(), decimal=8, err_msg='Problem!')
+    def test_newton_tied_rounding(self):
+        # On a symmetric tensor grid, the relaxed solution is tied across mirrored points; the rounded subset must still be well conditioned.
+        zeta_1 = Parameter(distribution='uniform', order=4, lower= -2.0, upper=2.0)
+        zeta_2 = Parameter(distribution='uniform', order=4, lower=-1.0, upper=3.0)
+        myPoly = Poly([zeta_1, zeta_2], Basis('total-order'), method='least-squares', sampling_args={'mesh':'tensor-grid', 'subsampling-algorithm':'newton', 'sampling-ratio':1.0})
+        pts = myPoly.get_points()
+        self.assertEqual(len(np.unique(pts, axis=0)), myPoly.basis.cardinality)
+        self.assertTrue(np.linalg.cond(myPoly.get_poly(pts)) < 1e2)
+        # Among tied rows, duplicates of rows already selected are skipped.
+        A = np.array([[1., 0.], [1., 0.], [0., 1.], [0., -1.]])
+        self.assertEqual(_round_relaxation(A, np.array([0.5, 0.5, 0.5, 0.5]), 2), [0, 2])
+        self.assertEqual(_round_relaxation(A, np.array([0.9, 0.5, 0.5, 0.5]), 2), [0, 2])
     def test_least_squares_verbose(self):
         zeta_1 = Parameter(distribution='uniform', order=4, lower= -2.0, upper=2.0)
         zeta_2 = Parameter(distribution='uniform', order=4, lower=-1.0, upper=3.0)
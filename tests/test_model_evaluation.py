@@ -0,0 +1,147 @@
+from unittest import TestCase
+import unittest
+from equadratures import *
+import numpy as np
+import os
+import sys
+import tempfile
+from io import StringIO
+
+def fun(x):
+    return np.exp(2*x[0] + x[1])
+def gradfun(x):
+    return [2*np.exp(2*x[0] + x[1]), np.exp(2*x[0] + x[1])]
+def fun_vectorised(X):
+    return np.exp(2*X[:,0] + X[:,1])
+def gradfun_vectorised(X):
+    f = np.exp(2*X[:,0] + X[:,1])
+    return np.vstack([2*f, f]).T
+def fun_with_failures(x):
+    if x[0] > 0.9:
+        raise RuntimeError('Simulation did not converge!')
+    return x[0]**2 + x[1]**3 - x[0]*x[1]**2
+def fun_vectorised_with_failures(X):
+    if np.any(X[:,0] > 0.9):
+        raise RuntimeError('Simulation did not converge!')
+    return X[:,0]**2
+class CountingModel(object):
+    def __init__(self):
+        self.calls = 0
+    def __call__(self, x):
+        self.calls = self.calls + 1
+        return fun(x)
+
+class TestModelEvaluation(TestCase):
+
+    def test_batched_evaluation(self):
+        X = np.random.uniform(-1, 1, (53, 2))
+        y = evaluate_model(X, fun)
+        for batch_size in [1, 10, 53, 100]:
+            y_batched = evaluate_model(X, fun_vectorised, batch_size=batch_size)
+            np.testing.assert_array_almost_equal(y, y_batched, decimal=12)
+        g = evaluate_model_gradients(X, gradfun, 'matrix')
+        g_batched = evaluate_model_gradients(X, gradfun_vectorised, 'matrix', batch_size=7)
+        np.testing.assert_array_almost_equal(g, g_batched, decimal=12)
+        self.assertEqual(evaluate_model_gradients(X, gradfun, 'vector').shape, (106, 1))
+
+    def test_batched_set_model(self):
+        x1 = Parameter(distribution='uniform', order=5, lower=-1., upper=1.)
+        basis = Basis('tensor-grid')
+        poly = Poly([x1, x1], basis, method='numerical-integration')
+        poly.set_model(fun)
+        poly2 = Poly([x1, x1], basis, method='numerical-integration')
+        poly2.set_model(fun_vectorised, batch_size=10)
+        np.testing.assert_array_almost_equal(poly.get_coefficients(), poly2.get_coefficients(), decimal=10)
+
+    def test_batched_set_model_with_gradients(self):
+        x1 = Parameter(distribution='uniform', order=4, lower=-1., upper=1.)
+        basis = Basis('total-order')
+        poly = Poly([x1, x1], basis, method='least-squares-with-gradients', sampling_args={'mesh':'tensor-grid', \
+                    'subsampling-algorithm':'qr', 'sampling-ratio':1.0})
+        poly.set_model(fun, gradfun)
+        poly2 = Poly([x1, x1], basis, method='least-squares-with-gradients', sampling_args={'mesh':'tensor-grid', \
+                    'subsampling-algorithm':'qr', 'sampling-ratio':1.0})
+        poly2.set_model(fun_vectorised, gradfun_vectorised, batch_size=4)
+        np.testing.assert_array_almost_equal(poly.get_coefficients(), poly2.get_coefficients(), decimal=10)
+
+    def test_parallel_evaluation(self):
+        X = np.random.uniform(-1, 1, (40, 2))
+        y = evaluate_model(X, fun)
+        np.testing.assert_array_almost_equal(y, evaluate_model(X, fun, executor='thread'), decimal=12)
+        np.testing.assert_array_almost_equal(y, evaluate_model(X, fun, executor='process'), decimal=12)
+        np.testing.assert_array_almost_equal(y, evaluate_model(X, fun_vectorised, batch_size=8, executor='thread'), decimal=12)
+        g = evaluate_model_gradients(X, gradfun, 'matrix')
+        np.testing.assert_array_almost_equal(g, evaluate_model_gradients(X, gradfun, 'matrix', executor='thread'), decimal=12)
+
+    def test_parallel_evaluation_with_failures(self):
+        param = Parameter(distribution='uniform', lower=-1., upper=1., order=4)
+        basis = Basis('tensor-grid')
+        poly = Poly(parameters=[param, param], basis=basis, method='numerical-integration')
+        pts = poly.get_points()
+        y = evaluate_model(pts, fun_with_failures, executor='thread')
+        failed = pts[:,0] > 0.9
+        self.assertTrue(np.all(np.isnan(y[failed, 0])))
+        self.assertFalse(np.any(np.isnan(y[~failed, 0])))
+        poly.set_model(fun_with_failures, executor='thread')
+        poly2 = Poly(parameters=[param, param], basis=basis, method='numerical-integration')
+        poly2.set_model(y)
+        np.testing.assert_array_almost_equal(poly.get_coefficients(), poly2.get_coefficients(), decimal=10)
+
+    def test_parallel_evaluation_with_failed_batches(self):
+        X = np.random.uniform(-1, 0.5, (40, 2))
+        X[[3, 25], 0] = 0.95
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            y = evaluate_model(X, fun_vectorised_with_failures, batch_size=10, executor='thread')
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        self.assertTrue(np.all(np.isnan(y[0:10, 0])) and np.all(np.isnan(y[20:30, 0])))
+        np.testing.assert_array_almost_equal(y[10:20, 0], X[10:20, 0]**2, decimal=12)
+        # Each failed batch is reported once, along with its range of points.
+        self.assertEqual(output.count('failed with'), 2)
+        self.assertTrue('points 0 to 9 failed' in output)
+        self.assertTrue('points 20 to 29 failed' in output)
+        self.assertTrue('20 out of 40 model evaluations failed' in output)
+
+    def test_cached_evaluation(self):
+        filename = os.path.join(tempfile.mkdtemp(), 'evaluations.npz')
+        x1 = Parameter(distribution='uniform', order=4, lower=-1., upper=1.)
+        model = CountingModel()
+        poly = Poly([x1, x1], Basis('tensor-grid'), method='numerical-integration')
+        poly.set_model(model, cache=ModelCache(filename, model_id='exp'))
+        self.assertEqual(model.calls, 25)
+        # Rebuilding the same polynomial does not require any new evaluations.
+        poly2 = Poly([x1, x1], Basis('tensor-grid'), method='numerical-integration')
+        poly2.set_model(model, cache=ModelCache(filename, model_id='exp'))
+        self.assertEqual(model.calls, 25)
+        np.testing.assert_array_almost_equal(poly.get_coefficients(), poly2.get_coefficients(), decimal=12)
+        # Points that are not stored are evaluated and appended.
+        X = np.vstack([poly.get_points(), np.random.uniform(-1, 1, (5, 2))])
+        cache = ModelCache(filename, model_id='exp')
+        y = evaluate_model(X, model, cache=cache)
+        self.assertEqual(model.calls, 30)
+        self.assertEqual(cache.get_number_of_evaluations('exp'), 30)
+        np.testing.assert_array_almost_equal(y, evaluate_model(X, fun), decimal=12)
+        # A different model identifier does not share evaluations.
+        evaluate_model(X, model, cache=ModelCache(filename, model_id='another-model'))
+        self.assertEqual(model.calls, 60)
+
+    def test_cached_lambdas(self):
+        # Lambdas all share the same name, so they cannot be told apart without a model identifier.
+        x1 = Parameter(distribution='uniform', order=4, lower=-1., upper=1.)
+        poly = Poly(x1, Basis('univariate'), method='numerical-integration')
+        cache = ModelCache(os.path.join(tempfile.mkdtemp(), 'evaluations.npz'))
+        self.assertRaises(ValueError, poly.set_model, lambda x: x[0]**2, cache=cache)
+        self.assertRaises(ValueError, poly.set_model, lambda x: np.sin(x[0]), cache=cache)
+        poly.set_model(lambda x: x[0]**2, cache=ModelCache(cache.filename, model_id='square'))
+        square = poly.get_polyfit(poly.get_points())
+        poly.set_model(lambda x: np.sin(x[0]), cache=ModelCache(cache.filename, model_id='sine'))
+        np.testing.assert_array_almost_equal(square, poly.get_points()**2, decimal=10)
+        np.testing.assert_array_almost_equal(poly.get_polyfit(poly.get_points()), np.sin(poly.get_points()), decimal=10)
+        # Named functions are identified by their module and name.
+        self.assertEqual(cache.get_model_id(fun), fun.__module__ + '.fun')
+
+if __name__== '__main__':
+    unittest.main()
@@ -2,12 +2,15 @@ from unittest import TestCase
 import unittest
 from equadratures import *
 import numpy as np
+from equadratures.sampling_methods.tensorgrid import get_tensor_grid_chunks
 def model(x):
     return np.exp(10*x[0] + x[1])
 def model2(x):
     return np.exp(x[0] + x[1])
 def model1D(x):
     return np.exp(x[0])
+def model3D(x):
+    return np.exp(0.3*x[0] - 0.2*x[1] + 0.1*x[2])
 class TestA(TestCase):
     def test_tensor_grid_coefficients(self):
         param = Parameter(distribution='uniform', lower=-1., upper=1., order=30)
@@ -68,5 +71,92 @@ class TestA(TestCase):
         pts = poly.get_points()
         np.testing.assert_array_almost_equal(float(pts[10]), 68123.122, decimal=5, err_msg='Problem!')
 
+    def test_tensor_grid_chunks(self):
+        param = Parameter(distribution='uniform', lower=-1., upper=1., order=3)
+        param2 = Parameter(distribution='gaussian', shape_parameter_A=0., shape_parameter_B=1., order=2)
+        parameters = [param, param2, param, param2]
+        poly = Poly(parameters=parameters, basis=Basis('tensor-grid'), method='numerical-integration')
+        pts, wts = poly.get_points_and_weights()
+        chunks = list(get_tensor_grid_chunks(parameters, [3, 2, 3, 2], chunk_size=50))
+        self.assertEqual(len(chunks), int(np.ceil(len(wts) / 50.)))
+        np.testing.assert_array_equal(np.vstack([chunk[0] for chunk in chunks]), pts)
+        np.testing.assert_array_equal(np.hstack([chunk[1] for chunk in chunks]), wts)
+        # Streaming the grid through a model gives the same integral.
+        integral = 0.0
+        for points, weights in get_tensor_grid_chunks(parameters, [3, 2, 3, 2], chunk_size=17):
+            integral = integral + np.dot(weights, np.exp(0.1 * np.sum(points, axis=1)))
+        np.testing.assert_almost_equal(integral, np.dot(wts, np.exp(0.1 * np.sum(pts, axis=1))), decimal=12)
+
+    def test_sparse_grid_tensor_indices(self):
+        param = Parameter(distribution='uniform', lower=-1., upper=1., order=4)
+        param2 = Parameter(distribution='gaussian', shape_parameter_A=0., shape_parameter_B=1., order=4)
+        poly = Poly(parameters=[param, param2, param], basis=Basis('sparse-grid', level=3, growth_rule='linear'), \
+                    method='numerical-integration')
+        pts = poly.get_points()
+        self.assertEqual(len(np.unique(pts, axis=0)), len(pts))
+        for tensor, rows in zip(poly.quadrature.list, poly.quadrature.tensor_indices):
+            np.testing.assert_array_equal(pts[rows, :], tensor.points)
+
+    def test_nested_sparse_grids(self):
+        param = Parameter(distribution='uniform', lower=-1., upper=1., order=4)
+        p, w = param._get_nested_quadrature(3, 'gauss-patterson')
+        np.testing.assert_array_almost_equal(np.sort(p[:,0])[4:], [0.434243749346803, 0.774596669241483, 0.960491268708020], decimal=12)
+        param2 = Parameter(distribution='beta', shape_parameter_A=2., shape_parameter_B=2., lower=0., upper=1., order=4)
+        parameters = [param, param2, param]
+        reference = Poly(parameters=parameters, basis=Basis('tensor-grid', orders=[8, 8, 8]), method='numerical-integration')
+        reference.set_model(model3D)
+        mean, variance = reference.get_mean_and_variance()
+        for growth_rule in ['clenshaw-curtis', 'gauss-patterson', 'leja']:
+            previous_points = None
+            for level in [2, 3]:
+                poly = Poly(parameters=parameters, basis=Basis('sparse-grid', level=level, growth_rule=growth_rule), \
+                            method='numerical-integration')
+                pts = poly.get_points()
+                if previous_points is not None:
+                    # Every point of the previous level is reused.
+                    self.assertEqual(len(np.unique(np.vstack([previous_points, pts]), axis=0)), len(pts))
+                previous_points = pts
+            poly.set_model(model3D)
+            sparse_mean, sparse_variance = poly.get_mean_and_variance()
+            np.testing.assert_almost_equal(float(sparse_mean), float(mean), decimal=8)
+            np.testing.assert_almost_equal(float(sparse_variance), float(variance), decimal=6)
+
+    def test_sparse_grid_weights(self):
+        # The weight of a node shared by several tensor grids sums their combination-weighted contributions.
+        param = Parameter(distribution='uniform', lower=-1., upper=1., order=3)
+        model = lambda x: np.exp(x[0]) + x[1]**2
+        reference = Poly(parameters=[param, param], basis=Basis('tensor-grid', orders=[8, 8]), method='numerical-integration')
+        reference.set_model(model)
+        skewness, kurtosis = reference.get_skewness_and_kurtosis()
+        for growth_rule in ['linear', 'exponential', 'clenshaw-curtis', 'gauss-patterson', 'leja']:
+            poly = Poly(parameters=[param, param], basis=Basis('sparse-grid', level=3, growth_rule=growth_rule), method='numerical-integration')
+            np.testing.assert_almost_equal(np.sum(poly.get_weights()), 1.0, decimal=12)
+            poly.set_model(model)
+            np.testing.assert_almost_equal(poly.get_skewness_and_kurtosis()[1], kurtosis, decimal=1)
+
+    def test_adaptive_sparse_grid(self):
+        weights = np.array([1.0, 0.3, 0.05, 0.01])
+        calls = []
+        def anisotropic_model(x):
+            calls.append(x)
+            return np.exp(np.dot(weights, x))
+        param = Parameter(distribution='uniform', lower=-1., upper=1., order=4)
+        exact_mean = np.prod(np.sinh(weights) / weights)
+        for growth_rule in ['clenshaw-curtis', 'linear']:
+            del calls[:]
+            poly = Poly(parameters=[param] * 4, basis=Basis('sparse-grid', growth_rule=growth_rule), method='numerical-integration')
+            poly.set_model_adaptively(anisotropic_model, max_evaluations=150)
+            # The model is only evaluated once at each node, within the budget.
+            self.assertEqual(len(calls), len(poly.get_points()))
+            self.assertTrue(len(calls) <= 150)
+            mean, variance = poly.get_mean_and_variance()
+            np.testing.assert_almost_equal(float(mean), exact_mean, decimal=7)
+            np.testing.assert_almost_equal(np.dot(poly.get_weights(), poly.get_model_evaluations()[:,0]), exact_mean, decimal=7)
+            # The most important dimension is refined the most.
+            highest_levels = np.max(poly.adaptive_indices, axis=0)
+            self.assertEqual(np.argmax(highest_levels), 0)
+            self.assertTrue(highest_levels[0] > highest_levels[3])
+        poly.set_model_adaptively(anisotropic_model, tolerance=1e-6)
+        self.assertTrue(poly.error_estimate < 1e-6)
 if __name__== '__main__':
     unittest.main()
\ No newline at end of file
@@ -300,5 +300,27 @@ class Test_optimisation(TestCase):
         sol = Opt.optimise(x0)
         np.testing.assert_almost_equal(sol['x'].flatten(), np.array([0.16, 0.16]), decimal=2)
 
+    def test_poly_hessian(self):
+        n = 3
+        X = np.random.uniform(-1.0, 1.0, (60, n))
+        f = X[:,0]**2 * X[:,1] + X[:,1] * X[:,2]**3
+        param = eq.Parameter(distribution='uniform', lower=-1., upper=1., order=4)
+        poly = eq.Poly([param for i in range(n)], eq.Basis('total-order'), method='least-squares', sampling_args={'sample-points':X, 'sample-outputs':f})
+        poly.set_model()
+        x = np.random.uniform(-1.0, 1.0, (5, n))
+        H = poly.get_poly_hess(x)
+        self.assertEqual(H.shape, (n, n, poly.basis.cardinality, 5))
+        np.testing.assert_array_equal(H, np.transpose(H, (1, 0, 2, 3)))
+        exact = np.zeros((n, n, 5))
+        exact[0,0] = 2. * x[:,1]
+        exact[0,1] = exact[1,0] = 2. * x[:,0]
+        exact[1,2] = exact[2,1] = 3. * x[:,2]**2
+        exact[2,2] = 6. * x[:,1] * x[:,2]
+        np.testing.assert_array_almost_equal(poly.get_polyfit_hess(x), exact, decimal=8)
+        gradients = np.vstack([2. * x[:,0] * x[:,1], x[:,0]**2 + x[:,2]**3, 3. * x[:,1] * x[:,2]**2]).T
+        np.testing.assert_array_almost_equal(poly.get_polyfit_grad_matrix(x), gradients, decimal=8)
+        np.testing.assert_array_almost_equal(poly.get_polyfit_grad(x), gradients.T, decimal=8)
+        np.testing.assert_array_almost_equal(poly.get_polyfit_grad(x, dim_index=[1])[[0,2]], np.zeros((2, 5)), decimal=12)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,102 @@
+from unittest import TestCase
+import unittest
+from equadratures import *
+import numpy as np
+from equadratures.distributions.recurrence_utils import custom_recurrence_coefficients
+
+class TestParameter(TestCase):
+
+    def test_cached_recurrence_coefficients(self):
+        for param in [Parameter(distribution='uniform', lower=-1., upper=1., order=3), \
+                      Parameter(distribution='gaussian', shape_parameter_A=0., shape_parameter_B=1., order=3)]:
+            reference = Parameter(distribution=param.name, lower=param.lower, upper=param.upper, order=3, \
+                            shape_parameter_A=param.shape_parameter_A, shape_parameter_B=param.shape_parameter_B)
+            for order in [4, 2, 9, 30, 7]:
+                ab = param.get_recurrence_coefficients(order)
+                ab_reference = reference.distribution.get_recurrence_coefficients(order)
+                np.testing.assert_array_almost_equal(ab, ab_reference, decimal=12)
+                # Modifying the returned coefficients must not modify the cached ones.
+                ab[:] = 0.
+                self.assertFalse(np.all(param.get_recurrence_coefficients(order) == 0.))
+
+    def test_cached_quadrature_rules(self):
+        param = Parameter(distribution='uniform', lower=-1., upper=1., order=4, endpoints='both')
+        p, w = param._get_local_quadrature()
+        p[:] = 0.
+        p2, w2 = param._get_local_quadrature()
+        np.testing.assert_almost_equal(p2[0], -1.0, decimal=12)
+        np.testing.assert_almost_equal(np.sum(w2), 1.0, decimal=12)
+
+    def test_symmetric_quadrature_rules(self):
+        for param in [Parameter(distribution='uniform', lower=-2., upper=2., order=6), \
+                      Parameter(distribution='gaussian', shape_parameter_A=0., shape_parameter_B=1., order=7)]:
+            p, w = param._get_local_quadrature()
+            p = np.ravel(p)
+            np.testing.assert_array_equal(p, -p[::-1])
+            np.testing.assert_array_equal(w, w[::-1])
+
+    def test_recurrence_coefficients_moments(self):
+        for param in [Parameter(distribution='gaussian', shape_parameter_A=1., shape_parameter_B=2., order=6), \
+                      Parameter(distribution='gamma', shape_parameter_A=2.5, shape_parameter_B=1.5, order=6), \
+                      Parameter(distribution='exponential', shape_parameter_A=2., order=6), \
+                      Parameter(distribution='chi-squared', shape_parameter_A=3, order=6), \
+                      Parameter(distribution='weibull', shape_parameter_A=1.5, shape_parameter_B=2., order=6), \
+                      Parameter(distribution='chi', shape_parameter_A=3, order=6)]:
+            p, w = param._get_local_quadrature()
+            parent = param.distribution.parent
+            np.testing.assert_almost_equal(np.sum(w), 1.0, decimal=12)
+            np.testing.assert_almost_equal(np.dot(w, p), parent.mean(), decimal=8)
+            np.testing.assert_almost_equal(np.dot(w, (p - parent.mean())**3), parent.stats(moments='s') * parent.std()**3, decimal=6)
+
+    def test_unbounded_recurrence_coefficients_moments(self):
+        # These densities are discretised over their whole support, and not just over x_range_for_pdf.
+        for param in [Parameter(distribution='logistic', shape_parameter_A=1., shape_parameter_B=2., order=4), \
+                      Parameter(distribution='students-t', shape_parameter_A=30., order=4), \
+                      Parameter(distribution='pareto', shape_parameter_A=20., order=4), \
+                      Parameter(distribution='lognormal', shape_parameter_A=0.3, order=4), \
+                      Parameter(distribution='gumbel', shape_parameter_A=1., shape_parameter_B=2., order=4)]:
+            p, w = param._get_local_quadrature()
+            mean, variance, skewness, kurtosis = param.distribution.parent.stats(moments='mvsk')
+            np.testing.assert_almost_equal(np.sum(w), 1.0, decimal=12)
+            np.testing.assert_almost_equal(np.dot(w, p), mean, decimal=10)
+            np.testing.assert_almost_equal(np.dot(w, (p - mean)**2) / variance, 1.0, decimal=10)
+            np.testing.assert_almost_equal(np.dot(w, (p - mean)**3) / variance**1.5, skewness, decimal=10)
+            np.testing.assert_almost_equal(np.dot(w, (p - mean)**4) / variance**2, kurtosis + 3.0, decimal=9)
+
+    def test_orthogonal_polynomial_derivatives(self):
+        param = Parameter(distribution='uniform', lower=2., upper=3., order=4)
+        p, w = param._get_local_quadrature()
+        P, dP, d2P = param._get_orthogonal_polynomial(p)
+        np.testing.assert_array_almost_equal(np.dot(P * w, P.T), np.eye(5), decimal=12)
+        # Derivatives that are not requested are not computed.
+        P0, dP0, d2P0 = param._get_orthogonal_polynomial(p, grad_order=0)
+        self.assertIsNone(dP0)
+        self.assertIsNone(d2P0)
+        np.testing.assert_array_equal(P0, P)
+        P1, dP1, d2P1 = param._get_orthogonal_polynomial(p, grad_order=1)
+        self.assertIsNone(d2P1)
+        np.testing.assert_array_equal(P1, P)
+        np.testing.assert_array_equal(dP1, dP)
+        h = 1e-6
+        np.testing.assert_array_almost_equal(dP, (param._get_orthogonal_polynomial(p + h, grad_order=0)[0] - \
+                                                  param._get_orthogonal_polynomial(p - h, grad_order=0)[0]) / (2. * h), decimal=5)
+
+    def test_discrete_recurrence_coefficients(self):
+        # Discrete Chebyshev polynomials, orthogonal on {0, 1, ..., N-1}, have known recurrence coefficients.
+        N = 60
+        x = np.arange(N) * 1.0
+        w = np.ones(N)
+        k = np.arange(1, 11)
+        exact = N**2 * (1. - (k/float(N))**2) / (4. * (4. - 1./k**2))
+        for method in ['stieltjes', 'lanczos']:
+            ab = custom_recurrence_coefficients(x, w, 9, method)
+            np.testing.assert_array_almost_equal(ab[:,0], (N - 1.)/2. * np.ones(11), decimal=10)
+            np.testing.assert_array_almost_equal(ab[1:,1] / exact, np.ones(10), decimal=10)
+        # Lanczos remains accurate up to the number of support points.
+        k = np.arange(1, N)
+        exact = N**2 * (1. - (k/float(N))**2) / (4. * (4. - 1./k**2))
+        ab = custom_recurrence_coefficients(x, w, N-2, 'lanczos')
+        np.testing.assert_array_almost_equal(ab[1:,1] / exact, np.ones(N-1), decimal=10)
+
+if __name__== '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@ import unittest
 from equadratures import *
 import numpy as np
 import scipy.stats as st
+import pickle
 
 class TestC(TestCase):
 
@@ -23,5 +24,59 @@ class TestC(TestCase):
         true_coefficients = np.asarray([22.47470337, 17.50891379, 4.97964868])
         np.testing.assert_array_almost_equal(coefficients, true_coefficients, decimal=4, err_msg='Problem!')
 
+    def test_streamed_polyfit(self):
+        X = np.random.uniform(-1., 1., (80, 4))
+        y = np.exp(0.4 * X[:,0] - 0.3 * X[:,1] * X[:,3]) + X[:,2]**2
+        param = Parameter(distribution='uniform', lower=-1., upper=1., order=3)
+        param2 = Parameter(distribution='gaussian', shape_parameter_A=0., shape_parameter_B=1., order=2)
+        poly = Poly([param, param2, param, param2], Basis('total-order'), method='least-squares', sampling_args={'sample-points':X, 'sample-outputs':y})
+        poly.set_model()
+        x = np.random.uniform(-1., 1., (1000, 4))
+        reference = np.dot(poly.get_poly(x).T, poly.get_coefficients().reshape(-1, 1))
+        np.testing.assert_array_almost_equal(poly.get_polyfit(x), reference, decimal=12)
+        # A small memory budget only changes the number of chunks.
+        np.testing.assert_array_almost_equal(poly.get_polyfit(x, memory_budget=5000), reference, decimal=12)
+        np.testing.assert_array_almost_equal(poly.get_polyfit(x[0]), reference[0:1], decimal=12)
+
+    def test_predictor(self):
+        X = np.random.uniform(-1., 1., (60, 3))
+        y = np.exp(0.4 * X[:,0] - 0.3 * X[:,1] * X[:,2])
+        param = Parameter(distribution='uniform', lower=-1., upper=1., order=3)
+        param2 = Parameter(distribution='beta', shape_parameter_A=2., shape_parameter_B=3., lower=-1., upper=1., order=2)
+        poly = Poly([param, param2, param], Basis('total-order'), method='least-squares', sampling_args={'sample-points':X, 'sample-outputs':y})
+        poly.set_model()
+        poly.coefficients[3] = 0.
+        predictor = pickle.loads(pickle.dumps(poly.get_predictor()))
+        self.assertEqual(len(predictor.coefficients), poly.basis.cardinality - 1)
+        x = np.random.uniform(-1., 1., (50, 3))
+        np.testing.assert_array_almost_equal(predictor.get_polyfit(x), poly.get_polyfit(x), decimal=12)
+        np.testing.assert_array_almost_equal(predictor.get_polyfit_grad(x), poly.get_polyfit_grad(x), decimal=12)
+        np.testing.assert_array_almost_equal(predictor.get_polyfit_hess(x), poly.get_polyfit_hess(x), decimal=12)
+        # The predictor is frozen.
+        poly.coefficients = poly.coefficients * 2.
+        np.testing.assert_array_almost_equal(2. * predictor.get_polyfit(x), poly.get_polyfit(x), decimal=12)
+
+    def test_pruned_poly(self):
+        X = np.random.uniform(-1., 1., (400, 5))
+        y = np.exp(0.5 * X[:,0]) + 0.2 * X[:,2] * X[:,3]
+        param = Parameter(distribution='uniform', lower=-1., upper=1., order=4)
+        poly = Poly([param] * 5, Basis('total-order'), method='least-squares', sampling_args={'sample-points':X, 'sample-outputs':y})
+        poly.set_model()
+        mean, variance = poly.get_mean_and_variance()
+        x = np.random.uniform(-1., 1., (100, 5))
+        for reduced in [poly.get_pruned_poly(threshold=1e-5), poly.get_pruned_poly(energy_fraction=0.999999)]:
+            self.assertTrue(reduced.basis.cardinality <= 10)
+            self.assertEqual(len(reduced.get_coefficients()), reduced.basis.cardinality)
+            np.testing.assert_array_equal(reduced.basis.elements[0], np.zeros(5))
+            np.testing.assert_array_almost_equal(reduced.get_polyfit(x), poly.get_polyfit(x), decimal=3)
+            np.testing.assert_array_almost_equal(reduced.get_polyfit_grad(x), poly.get_polyfit_grad(x), decimal=2)
+            reduced_mean, reduced_variance = reduced.get_mean_and_variance()
+            np.testing.assert_almost_equal(reduced_mean, mean, decimal=12)
+            np.testing.assert_almost_equal(reduced_variance, variance, decimal=5)
+            np.testing.assert_array_almost_equal(reduced.get_total_sobol_indices(), poly.get_total_sobol_indices(), decimal=4)
+        # The original polynomial is left untouched.
+        self.assertEqual(poly.basis.cardinality, len(poly.get_coefficients()))
+        self.assertRaises(ValueError, poly.get_pruned_poly, energy_fraction=1.5)
+
 if __name__== '__main__':
     unittest.main()
\ No newline at end of file